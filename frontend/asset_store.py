@@ -0,0 +1,159 @@
+# asset_store.py
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing
+from workspace import workspace_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks, copies fall back to the slower paths
+    fcntl = None
+
+HASH_CHUNK_SIZE = 1024 * 1024
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+# Linux ioctl that makes the destination share the source's blocks (btrfs, XFS, bcachefs...)
+FICLONE = 0x40049409
+
+def content_digest(path):
+    """sha256 of the file, streamed"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def reflink(fin, fout):
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+        return True
+    except OSError:
+        return False
+
+def copy_file(src, dst):
+    """Copy src to dst as a reflink when the filesystem allows it, else in the kernel, else through Python"""
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        if reflink(fin, fout):
+            return
+        size = os.fstat(fin.fileno()).st_size
+        infd, outfd = fin.fileno(), fout.fileno()
+        offset = 0
+        try:
+            if hasattr(os, 'copy_file_range'):
+                # May itself reflink or copy server-side on NFS/SMB
+                while offset < size:
+                    copied = os.copy_file_range(infd, outfd, min(COPY_CHUNK_SIZE, size - offset), offset, offset)
+                    if copied == 0:
+                        break
+                    offset += copied
+                return
+            if hasattr(os, 'sendfile') and os.name == 'posix':
+                while offset < size:
+                    sent = os.sendfile(outfd, infd, offset, min(COPY_CHUNK_SIZE, size - offset))
+                    if sent == 0:
+                        break
+                    offset += sent
+                return
+        except OSError:
+            # Not supported between these filesystems; start over the slow way
+            offset = 0
+            fout.seek(0)
+            fout.truncate()
+        fin.seek(offset)
+        shutil.copyfileobj(fin, fout, COPY_CHUNK_SIZE)
+
+class AssetStore:
+    """Content-addressed store for embedded media, shared by every page and project.
+
+    Objects are named by the sha256 of their content plus the original
+    extension, so the same file embedded anywhere is stored once. Digests of
+    files already hashed are remembered by (path, size, mtime) in a small
+    SQLite table, which makes re-embedding a known file cost a stat and a lookup.
+    """
+
+    def __init__(self, root=None):
+        self.root = root
+        self.lock = threading.Lock()
+        self.hashing = {}   # path -> lock held while that file is being hashed
+
+    def directory(self):
+        if self.root is None:
+            self.root = workspace_dir('assets')
+        return self.root
+
+    def connect(self):
+        conn = sqlite3.connect(os.path.join(self.directory(), 'digests.sqlite'), timeout=30)
+        conn.execute('CREATE TABLE IF NOT EXISTS digests '
+                     '(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)')
+        return conn
+
+    def digest(self, path):
+        """Content digest of path, hashing it only if it changed since the last time"""
+        path = os.path.abspath(path)
+        with self.lock:
+            file_lock = self.hashing.setdefault(path, threading.Lock())
+        # Two workers asking for the same big file wait for one hash instead of reading it twice
+        with file_lock:
+            st = os.stat(path)
+            with self.lock, closing(self.connect()) as conn:
+                row = conn.execute('SELECT size, mtime_ns, digest FROM digests WHERE path = ?', (path,)).fetchone()
+            if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                return row[2]
+            digest = content_digest(path)
+            self.remember(path, st, digest)
+            return digest
+
+    def remember(self, path, st, digest):
+        with self.lock, closing(self.connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?)',
+                         (path, st.st_size, st.st_mtime_ns, digest))
+
+    def path(self, key):
+        return os.path.join(self.directory(), 'objects', key[:2], key)
+
+    def contains(self, key):
+        return os.path.exists(self.path(key))
+
+    def key_of(self, path):
+        """Key of path if it already lives in the store"""
+        objects = os.path.join(self.directory(), 'objects')
+        path = os.path.abspath(path)
+        if os.path.dirname(os.path.dirname(path)) == objects:
+            return os.path.basename(path)
+        return None
+
+    def put(self, path):
+        """Store the file at path and return its key; runs on a worker thread"""
+        key = self.key_of(path)
+        if key is not None:
+            return key
+        digest = self.digest(path)
+        key = digest + os.path.splitext(path)[1].lower()
+        target = self.path(key)
+        if os.path.exists(target) and os.path.getsize(target) == os.path.getsize(path):
+            return key
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        os.close(fd)
+        try:
+            copy_file(path, tmp_path)
+            os.replace(tmp_path, target)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.remember(target, os.stat(target), digest)
+        return key
+
+    def export(self, key, destination):
+        """Copy an object out of the store, e.g. for "Download" """
+        copy_file(self.path(key), destination)
+
+asset_store = AssetStore()
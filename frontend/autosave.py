@@ -0,0 +1,199 @@
+# autosave.py
+import hashlib
+import os
+import tempfile
+from tkinter import messagebox
+from workers import WorkerPool
+
+# Quiet period after the last edit before a page is written
+AUTOSAVE_DELAY_MS = 1500
+# Tk root -> the one thread writing and deleting page files for every window of the app
+page_writers = {}
+
+def atomic_write(path, data, encoding='utf-8'):
+    """Write data to path through a temp file, fsync and rename so readers never see half a file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data.encode(encoding) if isinstance(data, str) else data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Make the rename itself durable
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def page_writer(widget):
+    """Writer pool shared by all autosavers of an app, so a page's writes and its deletion stay in order"""
+    root = widget._root()
+    pool = page_writers.get(root)
+    if pool is None or pool.closed:
+        pool = page_writers[root] = WorkerPool(root, threads=1, name='page-writer')
+    return pool
+
+class Autosaver:
+    """Writes dirty Text widgets in the background once editing has paused for delay_ms.
+
+    Every edit restarts the wait. When a widget is tracked with a capture
+    function, timed saves copy it a slice at a time between events instead
+    of snapshotting it in one go; explicit saves still snapshot at once.
+    Content may be a function, run on the writer thread to build the text.
+    """
+
+    def __init__(self, widget, delay_ms=AUTOSAVE_DELAY_MS):
+        self.widget = widget
+        self.delay_ms = delay_ms
+        # A single writer thread keeps writes to the same file in order
+        self.writer = page_writer(widget)
+        self.sources = {}      # text widget -> snapshot() returning (path, content)
+        self.completions = {}  # text widget -> on_saved(ok), run on the main thread after each write
+        self.captures = {}     # text widget -> capture(ready), copying the widget in slices
+        self.capturing = {}    # text widget -> token of the capture in progress
+        self.hooks = {}        # text widget -> (edit listener list, listener restarting the wait)
+        self.scheduled = {}    # text widget -> pending after() id
+        self.written = {}      # path -> digest of the last content written (writer thread only)
+        self.failing = set()   # paths whose last write failed; the error is shown once until one succeeds
+        # Called as listener(path, content) on the writer thread after each write
+        self.listeners = []
+
+    def track(self, text_widget, snapshot, on_saved=None, capture=None, edit_listeners=None):
+        """Start autosaving text_widget.
+
+        snapshot() returns (path, content) on the main thread when a save is
+        due. capture(ready), if given, copies the widget incrementally and
+        calls ready(snapshot) with a function returning (path, content) for
+        the copy; it never calls ready if an edit abandons the copy.
+        edit_listeners is the editor's list of per-edit callbacks: the
+        <<Modified>> event only fires when the flag flips, not on every edit.
+        """
+        self.sources[text_widget] = snapshot
+        if on_saved is not None:
+            self.completions[text_widget] = on_saved
+        if capture is not None:
+            self.captures[text_widget] = capture
+        if edit_listeners is not None:
+            hook = lambda *args: self.on_modified(text_widget)
+            edit_listeners.append(hook)
+            self.hooks[text_widget] = (edit_listeners, hook)
+        text_widget.edit_modified(False)
+        text_widget.bind('<<Modified>>', lambda e: self.on_modified(text_widget), add='+')
+
+    def untrack(self, text_widget, save=True):
+        if save:
+            self.save(text_widget)
+        self.cancel(text_widget)
+        self.sources.pop(text_widget, None)
+        self.completions.pop(text_widget, None)
+        self.captures.pop(text_widget, None)
+        listeners, hook = self.hooks.pop(text_widget, (None, None))
+        if hook in (listeners or ()):
+            listeners.remove(hook)
+
+    def is_dirty(self, text_widget):
+        return text_widget in self.sources and bool(text_widget.edit_modified())
+
+    def on_modified(self, text_widget):
+        if not self.is_dirty(text_widget):
+            return
+        self.cancel(text_widget)
+        self.scheduled[text_widget] = self.widget.after(self.delay_ms, lambda: self.save_paused(text_widget))
+
+    def cancel(self, text_widget):
+        after_id = self.scheduled.pop(text_widget, None)
+        if after_id is not None:
+            self.widget.after_cancel(after_id)
+        self.capturing.pop(text_widget, None)
+
+    def save_paused(self, text_widget):
+        """Editing paused: capture the widget between events if it can be, else save it now"""
+        self.scheduled.pop(text_widget, None)
+        capture = self.captures.get(text_widget)
+        if capture is None:
+            self.save(text_widget)
+            return
+        if not self.is_dirty(text_widget):
+            return
+        token = object()
+        self.capturing[text_widget] = token
+        capture(lambda snapshot: self.captured(text_widget, token, snapshot))
+
+    def captured(self, text_widget, token, snapshot):
+        if self.capturing.get(text_widget) is not token:
+            return  # saved, edited or untracked since the capture began
+        del self.capturing[text_widget]
+        if self.is_dirty(text_widget):
+            self.submit(text_widget, *snapshot())
+
+    def save(self, text_widget, callback=None):
+        """Queue a write now if the widget is dirty; returns whether a write was queued"""
+        self.cancel(text_widget)
+        if not self.is_dirty(text_widget):
+            return False
+        path, content = self.sources[text_widget]()
+        self.submit(text_widget, path, content, callback)
+        return True
+
+    def submit(self, text_widget, path, content, callback=None):
+        text_widget.edit_modified(False)
+        done = self.completions.get(text_widget)
+
+        def written(result):
+            self.failing.discard(path)
+            if done:
+                done(True)
+            if callback:
+                callback(result)
+
+        def failed(error):
+            if done:
+                done(False)
+            tracked = text_widget in self.sources and text_widget.winfo_exists()
+            if tracked:
+                # Still unsaved: keep it dirty and try again after the next pause
+                text_widget.edit_modified(True)
+                self.on_modified(text_widget)
+            if path not in self.failing:
+                self.failing.add(path)
+                messagebox.showerror(
+                    "Autosave failed",
+                    f"Could not save {os.path.basename(path)}:\n{error}\n\n"
+                    + ("Saving will be retried." if tracked else "The latest changes were not saved."),
+                    parent=self.widget if self.widget.winfo_exists() else None)
+        self.writer.submit(self.write, path, content, callback=written, errback=failed)
+
+    def write(self, path, content):
+        if callable(content):
+            content = content()
+        digest = hashlib.blake2b(content.encode('utf-8')).digest()
+        if self.written.get(path) == digest and os.path.exists(path):
+            return False  # edited back to what is already on disk
+        atomic_write(path, content)
+        self.written[path] = digest
+        for listener in self.listeners:
+            try:
+                listener(path, content)
+            except Exception as e:
+                print(f"After saving {path}:", e)
+        return True
+
+    def flush(self):
+        """Save every dirty widget and wait until all writes have hit the disk"""
+        for text_widget in list(self.sources):
+            self.save(text_widget)
+        self.writer.wait()
+
+    def close(self):
+        # The writer is shared with other windows and outlives this one
+        self.flush()
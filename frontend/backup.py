@@ -0,0 +1,333 @@
+# backup.py
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from asset_store import asset_store
+from autosave import atomic_write
+from diary_vault import diary_vault
+from document import DOCUMENT_MAGIC, END_OF_HEADER
+from page_store import page_store, is_page_id
+from workspace import workspace_dir
+
+BACKUP_SUFFIX = '.tzbackup'
+MANIFEST = 'manifest.json'
+BACKUP_FORMAT = 1
+# Files are streamed into and out of archives this much at a time
+COPY_CHUNK_SIZE = 1024 * 1024
+# Remembers the newest archive so the next backup can be incremental
+LAST_BACKUP_FILE = 'last_backup.json'
+# Archive folders and the workspace folders they are restored into
+ROOTS = {
+    'pages': lambda: page_store.directory(),
+    'assets': lambda: asset_store.directory(),
+    'diary': lambda: diary_vault.directory(),
+}
+# The only member names the writer produces; restore refuses anything else
+MEMBER_NAMES = {
+    'pages': re.compile(r'pages/([0-9a-f]{2})/\1[0-9a-f]{30}\.tdoc'),
+    'assets': re.compile(r'assets/objects/([0-9a-f]{2})/\1[0-9a-f]{62}(\.[^./\\:]{1,32})?'),
+    'diary': re.compile(r'diary/(vault\.json|([0-9a-f]{2})/\2[0-9a-f]{30}\.entry|timeline/\d{4}/\d{2}\.month)'),
+}
+PROJECT_ID = re.compile(r'[0-9a-f]{32}')
+# Media is mostly compressed already; deflating it again only costs time
+STORED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.mp4', '.mkv', '.webm', '.mov', '.avi',
+                     '.mp3', '.ogg', '.pdf', '.docx', '.zip', '.entry', '.month'}
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def legacy_page_id(path):
+    """Stable id for a page still saved under its title, so incremental backups recognise it"""
+    return hashlib.blake2b(os.path.abspath(path).encode('utf-8'), digest_size=16).hexdigest()
+
+def page_assets(path):
+    """Asset keys embedded in a page, read from its header only"""
+    keys = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        if f.readline().rstrip('\n') != DOCUMENT_MAGIC:
+            return keys
+        for line in f:
+            line = line.rstrip('\n')
+            if line == END_OF_HEADER:
+                break
+            record = json.loads(line)
+            if record[0] == 'embed' and record[3].get('asset'):
+                keys.append(record[3]['asset'])
+    return keys
+
+def member_target(name):
+    """Workspace path an archive member restores to; ValueError for names the writer never produces"""
+    folder = name.split('/', 1)[0]
+    pattern = MEMBER_NAMES.get(folder)
+    if pattern is None or not pattern.fullmatch(name):
+        raise ValueError(f"Unexpected file in backup: {name!r}")
+    root = os.path.realpath(ROOTS[folder]())
+    target = os.path.realpath(os.path.join(root, *name.split('/')[1:]))
+    if os.path.commonpath([root, target]) != root:
+        raise ValueError(f"Unexpected file in backup: {name!r}")
+    return target
+
+def check_tree(folder):
+    """A restored project tree may only hold folders, flowcharts and page ids, never file paths"""
+    for name, value in folder.items():
+        if isinstance(value, dict):
+            check_tree(value)
+        elif not isinstance(name, str) or not (value == "flowchart" or isinstance(value, str) and is_page_id(value)):
+            raise ValueError(f"Unexpected page in backup: {name!r}")
+
+def read_manifest(path):
+    with zipfile.ZipFile(path) as archive:
+        return json.loads(archive.read(MANIFEST))
+
+def last_backup():
+    """Path of the newest archive written from this workspace, if it still exists"""
+    try:
+        with open(os.path.join(workspace_dir(), LAST_BACKUP_FILE), 'r', encoding='utf-8') as f:
+            path = json.load(f)['path']
+    except (OSError, ValueError, KeyError):
+        return None
+    return path if os.path.exists(path) else None
+
+def backed_up_pages():
+    """Ids of every page the last backup can restore; None if that backup cannot be read"""
+    path = last_backup()
+    if path is None:
+        return set()
+    try:
+        files = read_manifest(path)['files']
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+    return {name.rsplit('/', 1)[1][:-len('.tdoc')] for name in files if MEMBER_NAMES['pages'].fullmatch(name)}
+
+def backup_chain(path):
+    """Names of the archive at path and the earlier ones it builds on, newest first"""
+    folder = os.path.dirname(os.path.abspath(path))
+    names, name = [], os.path.basename(path)
+    while name and name not in names and os.path.exists(os.path.join(folder, name)):
+        names.append(name)
+        name = read_manifest(os.path.join(folder, name)).get('base')
+    return names
+
+class BackupWriter:
+    """Writes one archive: every project tree, the pages and media they use, and the diary.
+
+    Files are streamed into the zip in chunks, so memory stays flat however
+    large the workspace. Given the manifest of an earlier archive, files
+    whose content is unchanged are not stored again; the new manifest points
+    at the archive that holds them. Unchanged size and mtime skip rehashing.
+    """
+
+    def __init__(self, path, previous=None):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.previous = previous['files'] if previous else {}
+        self.base = previous['name'] if previous else None
+        self.files = {}
+        self.added = 0
+
+    def digest(self, name, source, st):
+        old = self.previous.get(name)
+        if name.startswith('assets/objects/'):
+            return os.path.basename(name).split('.')[0]  # content addressed already
+        if old and old['size'] == st.st_size and old['mtime_ns'] == st.st_mtime_ns:
+            return old['sha256']
+        return file_digest(source)
+
+    def add_file(self, archive, name, source):
+        """Store source as name unless the previous archive chain already has this content"""
+        if name in self.files:
+            return self.files[name]
+        try:
+            st = os.stat(source)
+        except FileNotFoundError:
+            return None
+        digest = self.digest(name, source, st)
+        old = self.previous.get(name)
+        entry = {'sha256': digest, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        # Content held by the archive being replaced has to be stored again
+        if old and old['sha256'] == digest and old['in'] != self.name:
+            entry['in'] = old['in']
+        else:
+            entry['in'] = self.name
+            stored = os.path.splitext(name)[1].lower() in STORED_EXTENSIONS
+            # Zip timestamps start in 1980
+            info = zipfile.ZipInfo(name, max(time.localtime(st.st_mtime)[:6], (1980, 1, 1, 0, 0, 0)))
+            info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+            with open(source, 'rb') as fin, archive.open(info, 'w', force_zip64=True) as fout:
+                shutil.copyfileobj(fin, fout, COPY_CHUNK_SIZE)
+            self.added += 1
+        if name.startswith('pages/'):
+            entry['assets'] = old['assets'] if old and old['sha256'] == digest and 'assets' in old \
+                else page_assets(source)
+        self.files[name] = entry
+        return entry
+
+    def add_project(self, archive, card):
+        """Store a project's pages; its tree is saved with page values rewritten to archive names"""
+        pages = []
+
+        def convert(folder):
+            converted = {}
+            for name, value in folder.items():
+                if isinstance(value, dict):
+                    converted[name] = convert(value)
+                elif isinstance(value, str) and value != "flowchart":
+                    page_id = value if is_page_id(value) else legacy_page_id(value)
+                    member = f"pages/{page_id[:2]}/{page_id}.tdoc"
+                    if self.add_file(archive, member, page_store.resolve(value)):
+                        pages.append(member)
+                    converted[name] = page_id
+                else:
+                    converted[name] = value
+            return converted
+
+        tree = convert(card['project_data'])
+        assets = sorted({key for member in pages for key in self.files[member]['assets']})
+        project = dict(card, project_data=tree, pages=pages,
+                       assets=[f"assets/objects/{key[:2]}/{key}" for key in assets])
+        archive.writestr(f"projects/{card['project_id']}.json", json.dumps(project, ensure_ascii=False))
+        return project
+
+    def add_tree(self, archive, prefix, root):
+        for directory, subdirs, files in os.walk(root):
+            subdirs.sort()
+            for name in sorted(files):
+                source = os.path.join(directory, name)
+                member = prefix + '/' + os.path.relpath(source, root).replace(os.sep, '/')
+                # Temporary and stray files are left out; restore would refuse them
+                if MEMBER_NAMES[prefix.split('/')[0]].fullmatch(member):
+                    self.add_file(archive, member, source)
+
+    def write(self, cards, progress=None):
+        """cards: [{project_id, title, description, project_data}] in dashboard order; for a worker thread"""
+        tmp_path = self.path + '.tmp'
+        with zipfile.ZipFile(tmp_path, 'w', allowZip64=True) as archive:
+            projects = []
+            for i, card in enumerate(cards, 1):
+                project = self.add_project(archive, card)
+                projects.append({'project_id': card['project_id'], 'title': card['title'],
+                                 'pages': len(project['pages'])})
+                if progress:
+                    progress(f"Project {i} of {len(cards)}")
+            if progress:
+                progress("Media")
+            self.add_tree(archive, 'assets/objects', os.path.join(asset_store.directory(), 'objects'))
+            if diary_vault.exists():
+                self.add_tree(archive, 'diary', diary_vault.directory())
+            manifest = {'format': BACKUP_FORMAT, 'name': self.name, 'created': time.time(), 'base': self.base,
+                        'projects': projects, 'files': self.files}
+            archive.writestr(MANIFEST, json.dumps(manifest, ensure_ascii=False))
+        os.replace(tmp_path, self.path)
+        atomic_write(os.path.join(workspace_dir(), LAST_BACKUP_FILE), json.dumps({'path': os.path.abspath(self.path)}))
+        return manifest
+
+def write_backup(path, cards, incremental=True, progress=None):
+    """Write an archive of the workspace; incremental against the last archive when there is one"""
+    previous = last_backup()
+    if previous and os.path.dirname(os.path.abspath(previous)) != os.path.dirname(os.path.abspath(path)):
+        previous = None  # a chain has to live in one folder to be restorable
+    if previous:
+        chain = backup_chain(previous)
+        if os.path.basename(path) in chain[1:]:
+            raise ValueError(f"'{os.path.basename(path)}' is still needed by the later backup '{chain[0]}'; "
+                             "choose another file name")
+    if not incremental:
+        previous = None
+    writer = BackupWriter(path, read_manifest(previous) if previous else None)
+    manifest = writer.write(cards, progress)
+    return manifest, writer.added
+
+class BackupReader:
+    """Restores from an archive, opening earlier archives of its chain only for the files they hold"""
+
+    def __init__(self, path):
+        self.folder = os.path.dirname(os.path.abspath(path))
+        self.path = path
+        self.archives = {}
+        self.manifest = json.loads(self.archive(os.path.basename(path)).read(MANIFEST))
+
+    def archive(self, name):
+        if not isinstance(name, str) or name in ('', '.', '..') or '/' in name or '\\' in name:
+            raise ValueError(f"Unexpected archive name in backup: {name!r}")
+        if name not in self.archives:
+            location = os.path.join(self.folder, name)
+            if not os.path.exists(location):
+                raise FileNotFoundError(f"This backup needs the earlier archive '{name}' in the same folder")
+            self.archives[name] = zipfile.ZipFile(location)
+        return self.archives[name]
+
+    def close(self):
+        for archive in self.archives.values():
+            archive.close()
+        self.archives = {}
+
+    def extract(self, name, overwrite=True):
+        """Stream one file of the chain to its place in the workspace; skips identical files"""
+        entry = self.manifest['files'][name]
+        target = member_target(name)
+        if os.path.exists(target) and (not overwrite or os.path.getsize(target) == entry['size']
+                                       and file_digest(target) == entry['sha256']):
+            return False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fout, self.archive(entry['in']).open(name) as fin:
+                shutil.copyfileobj(fin, fout, COPY_CHUNK_SIZE)
+            os.replace(tmp_path, target)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return True
+
+    def restore(self, project_ids=None, progress=None):
+        """Restore all projects (and the diary, if none exists here) or only project_ids.
+
+        Returns the restored cards as {project_id, title, description, project_data};
+        a single project reads just its own tree, pages and media.
+        """
+        cards = []
+        wanted = [p['project_id'] for p in self.manifest['projects']] if project_ids is None else project_ids
+        archive = self.archive(os.path.basename(self.path))
+        for i, project_id in enumerate(wanted, 1):
+            if not isinstance(project_id, str) or not PROJECT_ID.fullmatch(project_id):
+                raise ValueError(f"Unexpected project in backup: {project_id!r}")
+            project = json.loads(archive.read(f"projects/{project_id}.json"))
+            if project.get('project_id') != project_id:
+                raise ValueError(f"Unexpected project in backup: {project_id!r}")
+            check_tree(project['project_data'])
+            for name in project['pages']:
+                self.extract(name)
+            for name in project['assets']:
+                if name in self.manifest['files']:
+                    self.extract(name, overwrite=False)
+            cards.append({key: project[key] for key in ('project_id', 'title', 'description', 'project_data')})
+            if progress:
+                progress(f"Project {i} of {len(wanted)}")
+        if project_ids is None:
+            for name in self.manifest['files']:
+                if name.startswith('assets/'):
+                    self.extract(name, overwrite=False)
+            if not diary_vault.exists():
+                for name in self.manifest['files']:
+                    if name.startswith('diary/'):
+                        self.extract(name)
+        return cards
+
+def restore_backup(path, project_ids=None, progress=None):
+    reader = BackupReader(path)
+    try:
+        return reader.restore(project_ids, progress)
+    finally:
+        reader.close()
@@ -0,0 +1,300 @@
+# benchmarks.py
+# Manual performance checks; run e.g. `python benchmarks.py styles` from this folder.
+import random
+import sys
+import time
+import tkinter as tk
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"  {label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+    return result
+
+def bench_styles(lines=20000, formats=4000, edits=300):
+    """Typing speed in a heavily formatted page: stacked per-call tags vs interned style tags"""
+    from simple_text_editor import SimpleTextEditor
+    families = ['Consolas', 'Segoe UI', 'Arial', 'Courier', 'Times']
+    sizes = [10, 12, 14, 16, 18, 20, 24]
+    root = tk.Tk()
+    root.geometry("900x700")
+    for mode in ('stacked', 'interned'):
+        rng = random.Random(1)
+        frame = tk.Frame(root)
+        frame.pack(fill='both', expand=True)
+        editor = SimpleTextEditor(frame)
+        text_area = editor.text_area
+        text_area.insert('1.0', '\n'.join(f"line {i} " + 'lorem ipsum dolor sit amet ' * 3 for i in range(lines)))
+
+        def format_page():
+            for _ in range(formats):
+                line = rng.randint(1, lines)
+                start, end = f"{line}.{rng.randint(0, 40)}", f"{line + rng.randint(0, 3)}.{rng.randint(0, 80)}"
+                if text_area.compare(end, '<=', start):
+                    continue
+                family, size, bold = rng.choice(families), rng.choice(sizes), rng.random() < 0.5
+                if mode == 'stacked':
+                    # What change_font and make_bold used to do: a tag per call, freely overlapping
+                    tag = f"custom_font_{family}_{size}"
+                    text_area.tag_configure(tag, font=(family, size))
+                    text_area.tag_add(tag, start, end)
+                    if bold:
+                        text_area.tag_configure('bold', font=('Consolas', 12, 'bold'))
+                        text_area.tag_add('bold', start, end)
+                else:
+                    editor.style_registry.restyle(start, end, family=family, size=size,
+                                                  weight='bold' if bold else 'normal')
+            if mode == 'interned':
+                editor.compact_styles()
+            root.update()
+
+        def type_characters():
+            for _ in range(edits):
+                index = f"{rng.randint(1, lines)}.5"
+                text_area.see(index)
+                text_area.insert(index, 'x')
+                root.update_idletasks()
+
+        print(f"{mode}:")
+        timed(f"apply {formats} formatting changes", format_page)
+        print(f"  tags in use: {len(text_area.tag_names())}")
+        ranges = sum(len(text_area.tag_ranges(tag)) // 2 for tag in text_area.tag_names())
+        print(f"  tag ranges: {ranges}")
+        timed(f"type {edits} characters", type_characters)
+        frame.destroy()
+    root.destroy()
+
+def make_test_video(path, seconds, fps, size):
+    import cv2
+    import numpy as np
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    for i in range(int(seconds * fps)):
+        frame = np.zeros((size[1], size[0], 3), np.uint8)
+        frame[:, :, 0] = (i * 3) % 256
+        cv2.circle(frame, ((i * 12) % size[0], size[1] // 2), 80, (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+def bench_video(seconds=6, fps=60, size=(1920, 1080), window=(1280, 720)):
+    """Sustained playback FPS and dropped frames: old Tk-thread loop vs the threaded engine"""
+    import os
+    import tempfile
+    import cv2
+    from PIL import Image, ImageTk
+    from video_player import VideoPlayer
+    path = os.path.join(tempfile.mkdtemp(), 'bench.avi')
+    timed(f"write {seconds}s {size[0]}x{size[1]}@{fps} test video", make_test_video, path, seconds, fps, size)
+    root = tk.Tk()
+
+    print("tk-thread loop:")
+    # What play_video used to do: read, PIL resize and a new PhotoImage per frame, every 30 ms
+    win = tk.Toplevel(root)
+    win.geometry(f"{window[0]}x{window[1]}")
+    label = tk.Label(win)
+    label.pack(fill='both', expand=True)
+    cap = cv2.VideoCapture(path)
+    shown = 0
+    start = time.perf_counter()
+    done = []
+    def show_frame():
+        nonlocal shown
+        ret, frame = cap.read()
+        if not ret:
+            done.append(True)
+            return
+        img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).resize(window, Image.LANCZOS)
+        label.imgtk = ImageTk.PhotoImage(img)
+        label.config(image=label.imgtk)
+        shown += 1
+        win.after(30, show_frame)
+    show_frame()
+    while not done:
+        root.update()
+    elapsed = time.perf_counter() - start
+    cap.release()
+    win.destroy()
+    print(f"  {shown} frames in {elapsed:.1f} s for {seconds} s of video: {shown / elapsed:.1f} fps, "
+          f"finished {elapsed - seconds:+.1f} s off real time")
+
+    print("engine:")
+    player = VideoPlayer(root, path, size=window)
+    start = time.perf_counter()
+    while not player.finished:
+        root.update()
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    print(f"  {player.shown} frames in {elapsed:.1f} s for {seconds} s of video: {player.shown / elapsed:.1f} fps, "
+          f"{player.total_dropped} dropped ({player.engine.skipped} by the decoder)")
+    player.close()
+    root.destroy()
+
+def bench_search(pages=100000, words=300, queries=200):
+    """Ranked full-text queries with snippets over a large index of synthetic pages"""
+    import os
+    import tempfile
+    from search_index import SearchIndex
+    rng = random.Random(7)
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+                  for _ in range(20000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(os.path.join(tmp, 'search.sqlite'))
+        def fill():
+            conn = index.connection()
+            for i in range(pages):
+                body = ' '.join(rng.choice(vocabulary) for _ in range(words))
+                index.update(f'page:{i}', 'page', f"Page {i} {rng.choice(vocabulary)}", body,
+                             f"Project {i % 50}", str(i % 50), ['Folder', f"Page {i}"], (len(body), i), commit=False)
+                if i % 10000 == 9999:
+                    conn.commit()
+        timed(f"index {pages} pages", fill)
+        terms = [' '.join(rng.sample(vocabulary, rng.randint(1, 2))) for _ in range(queries)]
+        index.search(terms[0])
+        times = []
+        for term in terms:
+            results, seconds = index.search(term)
+            times.append(seconds)
+        times.sort()
+        print(f"  {queries} queries: median {times[len(times) // 2] * 1000:.2f} ms, "
+              f"p95 {times[int(len(times) * 0.95)] * 1000:.2f} ms, max {times[-1] * 1000:.2f} ms")
+        timed("prefix query", index.search, vocabulary[0][:3])
+        timed("update one page", index.update, 'page:5', 'page', "Page 5", "edited text", "Project 5", '5')
+
+def bench_quick_open(entries=100000, queries=300):
+    """Fuzzy name lookups as you type, over a large trigram index of page names"""
+    from quick_open import NameIndex
+    rng = random.Random(3)
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+                  for _ in range(5000)]
+    index = NameIndex()
+    def fill():
+        for project in range(50):
+            index.set_project(str(project), f"Project {rng.choice(vocabulary)}")
+        for i in range(entries):
+            index.add(str(i % 50), (f"Folder {i % 300}", f"{rng.choice(vocabulary)} {rng.choice(vocabulary)} {i}"), 'page')
+    timed(f"index {entries} names", fill)
+    times = []
+    for _ in range(queries):
+        # Every prefix of a word, the way a query grows while typing
+        word = rng.choice(vocabulary)
+        for end in range(1, len(word) + 1):
+            start = time.perf_counter()
+            index.search(word[:end])
+            times.append(time.perf_counter() - start)
+    times.sort()
+    print(f"  {len(times)} queries: median {times[len(times) // 2] * 1000:.2f} ms, "
+          f"p95 {times[int(len(times) * 0.95)] * 1000:.2f} ms, max {times[-1] * 1000:.2f} ms")
+    timed("search with a typo", index.search, vocabulary[0][:-2] + 'x' + vocabulary[0][-1:])
+    timed("rename a folder of 333 pages", index.rename, '3', ('Folder 3',), 'Renamed', {})
+
+def bench_pages(pages=100000, samples=200):
+    """Save and open times of single pages as the page store grows to many pages"""
+    import os
+    import tempfile
+    from autosave import atomic_write
+    from document import decode_document, encode_document
+    from page_store import PageStore, new_page_id
+    rng = random.Random(3)
+    body = encode_document("lorem ipsum dolor sit amet\n" * 200, {}, [], {})
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PageStore(tmp)
+        ids = []
+        for target in (1000, 10000, pages):
+            while len(ids) < target:
+                page_id = new_page_id()
+                atomic_write(store.path(page_id), body)
+                ids.append(page_id)
+            saves, opens = [], []
+            for page_id in rng.sample(ids, samples):
+                start = time.perf_counter()
+                atomic_write(store.path(page_id), body)
+                saves.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                with open(store.path(page_id), encoding='utf-8') as f:
+                    decode_document(f.read())
+                opens.append(time.perf_counter() - start)
+            saves.sort()
+            opens.sort()
+            print(f"  {target} pages: save median {saves[samples // 2] * 1000:.2f} ms, "
+                  f"open median {opens[samples // 2] * 1000:.2f} ms, open p95 {opens[int(samples * 0.95)] * 1000:.2f} ms")
+        live = set(ids[:len(ids) // 2])
+        timed(f"collect {pages - len(live)} orphans", store.collect, live, 0)
+
+def bench_history(lines=5000, edits=1000):
+    """Disk cost of many small saved edits to one page, and listing and reading versions back"""
+    import os
+    import tempfile
+    from history import PageHistory
+    rng = random.Random(5)
+    words = [''.join(rng.choice('abcdefghij') for _ in range(rng.randint(2, 9))) for _ in range(5000)]
+    text = '\n'.join(' '.join(rng.choice(words) for _ in range(10)) for _ in range(lines))
+    with tempfile.TemporaryDirectory() as tmp:
+        history = PageHistory(os.path.join(tmp, 'history.sqlite'))
+        raw = 0
+        start = time.perf_counter()
+        for _ in range(edits):
+            position = rng.randrange(len(text))
+            text = text[:position] + rng.choice(words) + ' ' + text[position:]
+            history.record('page', text)
+            raw += len(text)
+        print(f"  record {edits} versions of a {len(text) // 1024} KB page: "
+              f"{(time.perf_counter() - start) / edits * 1000:.2f} ms each")
+        history.connection().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        print(f"  stored {os.path.getsize(os.path.join(tmp, 'history.sqlite')) // 1024} KB "
+              f"for {raw // 1024} KB of versions")
+        timed("list versions", history.versions, 'page')
+        timed("read a version", history.content, 'page', edits // 2)
+
+def bench_diary(entries=10000, samples=300):
+    """Unlock time, single-entry open/append latency and timeline queries of an encrypted diary"""
+    import datetime
+    import tempfile
+    from diary_vault import DiaryVault
+    rng = random.Random(9)
+    paragraph = "Dear diary, today was long and the tram was late again. " * 40
+    with tempfile.TemporaryDirectory() as tmp:
+        vault = DiaryVault(tmp)
+        timed("create vault", vault.create, "correct horse battery staple")
+        def fill():
+            for i in range(entries):
+                day = datetime.date(2000, 1, 1) + datetime.timedelta(days=i * 3 // 4)
+                vault.new_entry(day.isoformat(), f"Entry {i}", paragraph * rng.randint(1, 4))
+        timed(f"write {entries} entries", fill)
+        vault.lock()
+        timed("unlock", vault.unlock, "correct horse battery staple")
+        months = vault.timeline.months()
+        timed(f"month view (day counts) after unlock", vault.timeline.day_counts, months[len(months) // 2])
+        timed(f"streaks over {len(months)} months", vault.timeline.streaks)
+        timed("entries in one year", vault.entries, "2010-01-01", "2010-12-31")
+        entries_list = vault.entries()
+        ids = [entry.id for entry in entries_list]
+        opens, appends = [], []
+        for entry_id in rng.sample(ids, samples):
+            start = time.perf_counter()
+            vault.read(entry_id)
+            opens.append(time.perf_counter() - start)
+        big = vault.write(entries_list[0], paragraph * 2000).id
+        for _ in range(samples // 10):
+            start = time.perf_counter()
+            vault.append_bytes(big, b"One more line.\n")
+            appends.append(time.perf_counter() - start)
+        opens.sort()
+        appends.sort()
+        print(f"  open entry: median {opens[samples // 2] * 1000:.2f} ms, p95 {opens[int(samples * 0.95)] * 1000:.2f} ms")
+        print(f"  append to a {len(paragraph) * 2000 // 1024} KB entry: median {appends[len(appends) // 2] * 1000:.2f} ms")
+        timed("read 100 bytes from its middle", vault.read_bytes, big, len(paragraph) * 1000, len(paragraph) * 1000 + 100)
+
+BENCHMARKS = {
+    'styles': bench_styles,
+    'video': bench_video,
+    'search': bench_search,
+    'quick_open': bench_quick_open,
+    'pages': bench_pages,
+    'history': bench_history,
+    'diary': bench_diary,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name}")
+        BENCHMARKS[name]()
@@ -0,0 +1,315 @@
+# diary_panel.py
+import calendar
+import datetime
+import tkinter as tk
+from tkinter import messagebox, simpledialog
+from autosave import AUTOSAVE_DELAY_MS
+from diary_vault import diary_vault
+from document import decode_document
+from journal import Journal
+from simple_text_editor import create_text_editor
+from workers import WorkerPool
+
+# Older months added to the timeline list each time it is scrolled near its end
+TIMELINE_BATCH_MONTHS = 6
+# Calendar cell colours by number of entries that day (the last one for more)
+DAY_COLOURS = ['#2a2a2a', '#0b4f7a', '#0a63a0', '#0078d4']
+
+BUTTON_STYLE = {
+    'bg': '#404040', 'fg': 'white', 'font': ('Segoe UI', 9), 'relief': 'flat',
+    'padx': 10, 'pady': 4, 'cursor': 'hand2', 'activebackground': '#505050', 'activeforeground': 'white'
+}
+
+class DiaryPanel:
+    """Diary window: unlock, then a month calendar and a timeline of entries next to an editor.
+
+    Everything but the open entry comes from the timeline partitions; an
+    entry's body is only decrypted when its day or row is opened.
+    """
+
+    def __init__(self, parent, vault=diary_vault):
+        self.vault = vault
+        self.win = tk.Toplevel(parent)
+        self.win.title("Diary")
+        self.win.geometry("1150x720")
+        self.win.configure(bg='#1a1a1a')
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+        self.unlocker = WorkerPool(self.win, threads=1, name='diary-unlock')
+        self.body = None
+        self.entry = None          # EntryInfo open in the editor
+        self.editor = None
+        self.save_job = None
+        if vault.unlocked:
+            self.show_diary()
+        else:
+            self.show_lock()
+
+    def clear(self):
+        if self.body is not None:
+            self.body.destroy()
+        self.body = tk.Frame(self.win, bg='#1a1a1a')
+        self.body.pack(fill='both', expand=True)
+
+    # Lock screen
+
+    def show_lock(self):
+        self.clear()
+        creating = not self.vault.exists()
+        box = tk.Frame(self.body, bg='#1a1a1a')
+        box.place(relx=0.5, rely=0.4, anchor='center')
+        tk.Label(box, text="Choose a password for your diary" if creating else "Your diary is locked",
+                 bg='#1a1a1a', fg='white', font=('Segoe UI', 14, 'bold')).pack(pady=(0, 12))
+        entry_style = {'show': '•', 'font': ('Segoe UI', 12), 'bg': '#2a2a2a', 'fg': 'white',
+                       'insertbackground': 'white', 'relief': 'flat', 'width': 30}
+        password = tk.Entry(box, **entry_style)
+        password.pack(ipady=4, pady=4)
+        confirm = tk.Entry(box, **entry_style) if creating else None
+        if confirm:
+            confirm.pack(ipady=4, pady=4)
+        status = tk.Label(box, text="It cannot be recovered if you forget it." if creating else "",
+                          bg='#1a1a1a', fg='#888888', font=('Segoe UI', 9))
+        status.pack(pady=6)
+
+        def submit(event=None):
+            if confirm and password.get() != confirm.get():
+                status.config(text="The passwords do not match.", fg='#ff6b6b')
+                return
+            if not password.get():
+                return
+            status.config(text="Unlocking…", fg='#888888')
+            button.config(state='disabled')
+            # scrypt takes about half a second; keep the window responsive meanwhile
+            work = self.vault.create if creating else self.vault.unlock
+            self.unlocker.submit(work, password.get(), callback=lambda result: self.show_diary(),
+                                 errback=failed)
+
+        def failed(error):
+            button.config(state='normal')
+            status.config(text=str(error), fg='#ff6b6b')
+            password.delete(0, 'end')
+            password.focus_set()
+
+        button = tk.Button(box, text="Create diary" if creating else "Unlock", command=submit, **BUTTON_STYLE)
+        button.pack(pady=4)
+        password.bind('<Return>', submit)
+        if confirm:
+            confirm.bind('<Return>', submit)
+        password.focus_set()
+
+    # Diary
+
+    def show_diary(self):
+        self.clear()
+        today = datetime.date.today()
+        self.month = (today.year, today.month)
+        self.selected_day = today
+
+        side = tk.Frame(self.body, bg='#2a2a2a', width=330)
+        side.pack(side='left', fill='y', padx=(10, 5), pady=10)
+        side.pack_propagate(False)
+
+        header = tk.Frame(side, bg='#2a2a2a')
+        header.pack(fill='x', padx=8, pady=(10, 4))
+        tk.Button(header, text="◀", command=lambda: self.step_month(-1), **BUTTON_STYLE).pack(side='left')
+        self.month_label = tk.Label(header, bg='#2a2a2a', fg='white', font=('Segoe UI', 12, 'bold'))
+        self.month_label.pack(side='left', expand=True)
+        tk.Button(header, text="▶", command=lambda: self.step_month(1), **BUTTON_STYLE).pack(side='right')
+
+        grid = tk.Frame(side, bg='#2a2a2a')
+        grid.pack(padx=8)
+        for column, name in enumerate(calendar.day_abbr):
+            tk.Label(grid, text=name[:2], bg='#2a2a2a', fg='#888888', font=('Segoe UI', 8),
+                     width=4).grid(row=0, column=column)
+        self.cells = []
+        for row in range(6):
+            for column in range(7):
+                cell = tk.Label(grid, width=4, height=2, bg='#2a2a2a', fg='#cccccc', font=('Segoe UI', 9),
+                                cursor='hand2', highlightthickness=1, highlightbackground='#2a2a2a')
+                cell.grid(row=row + 1, column=column, padx=1, pady=1)
+                self.cells.append(cell)
+
+        self.streak_label = tk.Label(side, bg='#2a2a2a', fg='#888888', font=('Segoe UI', 9))
+        self.streak_label.pack(pady=6)
+        actions = tk.Frame(side, bg='#2a2a2a')
+        actions.pack(fill='x', padx=8)
+        tk.Button(actions, text="+ New entry", command=self.new_entry, **BUTTON_STYLE).pack(side='left')
+        tk.Button(actions, text="🔒 Lock", command=self.lock, **BUTTON_STYLE).pack(side='right')
+
+        self.timeline = tk.Listbox(side, bg='#1a1a1a', fg='#cccccc', font=('Segoe UI', 9),
+                                   selectbackground='#0078d4', selectforeground='white',
+                                   relief='flat', highlightthickness=0, activestyle='none')
+        self.timeline.pack(fill='both', expand=True, padx=8, pady=8)
+        self.timeline.configure(yscrollcommand=self.on_timeline_scroll)
+        self.timeline.bind('<<ListboxSelect>>', lambda e: self.open_selected_row())
+
+        main = tk.Frame(self.body, bg='#1a1a1a')
+        main.pack(side='left', fill='both', expand=True, padx=(5, 10), pady=10)
+        self.entry_label = tk.Label(main, text="Pick a day or an entry", bg='#1a1a1a', fg='white',
+                                    font=('Segoe UI', 13, 'bold'), anchor='w', cursor='hand2')
+        self.entry_label.pack(fill='x', pady=(0, 6))
+        self.entry_label.bind('<Double-Button-1>', lambda e: self.rename_entry())
+        editor_frame = tk.Frame(main, bg='#1a1a1a')
+        editor_frame.pack(fill='both', expand=True)
+        self.editor = create_text_editor(parent=editor_frame)
+        # Attachments would be copied to the asset store in the clear
+        self.editor.allow_embeds = False
+        self.editor.text_area.configure(state='disabled')
+        self.editor.text_area.bind('<<Modified>>', lambda e: self.schedule_save(), add='+')
+        # <<Modified>> only fires when the flag flips; every edit pushes the save back
+        self.editor.edit_listeners.append(lambda *args: self.schedule_save())
+        self.editor.text_area.bind('<Control-s>', lambda e: self.save_entry() or 'break')
+        self.editor.text_area.bind('<FocusOut>', lambda e: self.save_entry(), add='+')
+
+        self.refresh_timeline()
+        self.show_month()
+
+    def show_month(self):
+        year, month = self.month
+        self.month_label.config(text=f"{calendar.month_name[month]} {year}")
+        counts = self.vault.timeline.day_counts(f"{year:04d}-{month:02d}")
+        today = datetime.date.today()
+        days = calendar.Calendar().itermonthdays(year, month)
+        for cell, day in zip(self.cells, list(days) + [0] * 42):
+            if day == 0:
+                cell.config(text='', bg='#2a2a2a', highlightbackground='#2a2a2a')
+                cell.unbind('<Button-1>')
+                continue
+            date = datetime.date(year, month, day)
+            count = counts.get(day, 0)
+            outline = '#ffffff' if date == self.selected_day else '#00bfff' if date == today else '#2a2a2a'
+            cell.config(text=str(day), bg=DAY_COLOURS[min(count, len(DAY_COLOURS) - 1)], highlightbackground=outline)
+            cell.bind('<Button-1>', lambda e, date=date: self.open_day(date))
+        current, longest = self.vault.timeline.streaks(today)
+        self.streak_label.config(text=f"Streak: {current} day{'s' if current != 1 else ''}   ·   "
+                                      f"Longest: {longest} day{'s' if longest != 1 else ''}")
+
+    def step_month(self, step):
+        year, month = self.month
+        month += step
+        self.month = (year + (month - 1) // 12, (month - 1) % 12 + 1)
+        self.show_month()
+
+    def refresh_timeline(self):
+        """List the newest months; older ones are added as the list is scrolled"""
+        self.timeline.delete(0, 'end')
+        self.rows = []             # ('month', 'YYYY-MM') or ('entry', EntryInfo) per list row
+        self.months_left = self.vault.timeline.months()
+        self.extend_timeline()
+
+    def extend_timeline(self):
+        batch = self.months_left[-TIMELINE_BATCH_MONTHS:]
+        del self.months_left[-TIMELINE_BATCH_MONTHS:]
+        items = []
+        for month in reversed(batch):
+            year, number = map(int, month.split('-'))
+            self.rows.append(('month', month))
+            items.append(f"{calendar.month_name[number]} {year}")
+            for entry in reversed(self.vault.timeline.month_entries(month)):
+                self.rows.append(('entry', entry))
+                items.append(f"   {entry.date[8:]}  {entry.title}  —  {entry.preview}")
+        if items:
+            self.timeline.insert('end', *items)
+            for i in range(len(self.rows) - len(items), len(self.rows)):
+                if self.rows[i][0] == 'month':
+                    self.timeline.itemconfig(i, fg='#888888')
+
+    def on_timeline_scroll(self, first, last):
+        if self.months_left and float(last) > 0.9:
+            self.extend_timeline()
+
+    def open_selected_row(self):
+        selection = self.timeline.curselection()
+        if selection and self.rows[selection[0]][0] == 'entry':
+            self.open_entry(self.rows[selection[0]][1])
+
+    def open_day(self, date):
+        self.selected_day = date
+        entries = self.vault.entries(date.isoformat(), date.isoformat())
+        if entries:
+            self.open_entry(entries[0])
+        elif messagebox.askyesno("Diary", f"No entry on {date:%A %d %B %Y}. Write one?", parent=self.win):
+            self.new_entry(date)
+        self.show_month()
+
+    def new_entry(self, date=None):
+        date = date or self.selected_day
+        title = simpledialog.askstring("New entry", f"Title for {date:%d %B %Y}:", parent=self.win,
+                                       initialvalue=f"{date:%A}")
+        if title is None:
+            return
+        self.save_entry()
+        entry = self.vault.new_entry(date.isoformat(), title)
+        self.refresh_timeline()
+        self.show_month()
+        self.open_entry(entry)
+
+    def open_entry(self, entry):
+        """Decrypt one entry into the editor, saving the one open before"""
+        self.save_entry()
+        text_area = self.editor.text_area
+        text_area.configure(state='normal')
+        self.editor.load_document(self.vault.read(entry.id))
+        # Undo only; a log on disk would hold the entry's text unencrypted
+        self.editor.journal = Journal(self.editor, None)
+        text_area.edit_modified(False)
+        self.entry = entry
+        self.entry_label.config(text=f"{entry.title}   ·   {datetime.date.fromisoformat(entry.date):%A %d %B %Y}")
+        text_area.focus_set()
+
+    def rename_entry(self):
+        if self.entry is None:
+            return
+        title = simpledialog.askstring("Rename entry", "Title:", parent=self.win, initialvalue=self.entry.title)
+        if title:
+            self.entry = self.vault.set_title(self.entry, title)
+            self.entry_label.config(text=f"{self.entry.title}   ·   {datetime.date.fromisoformat(self.entry.date):%A %d %B %Y}")
+            self.refresh_timeline()
+
+    def schedule_save(self):
+        if self.entry is None or not self.editor.text_area.edit_modified():
+            return
+        if self.save_job is not None:
+            self.win.after_cancel(self.save_job)
+        self.save_job = self.win.after(AUTOSAVE_DELAY_MS, self.save_paused)
+
+    def save_paused(self):
+        """Typing paused: copy the entry between events, then seal it"""
+        self.save_job = None
+        if self.entry is None or not self.editor.text_area.edit_modified():
+            return
+        entry_id = self.entry.id
+        self.editor.capture_document(lambda content, digest: self.save_captured(entry_id, content))
+
+    def save_captured(self, entry_id, content):
+        if self.entry is None or self.entry.id != entry_id or self.editor is None \
+                or not self.editor.text_area.edit_modified():
+            return  # saved, locked or switched while the copy was made
+        raw = content()
+        self.entry = self.vault.write(self.entry, raw, preview=decode_document(raw)[0])
+        self.editor.text_area.edit_modified(False)
+
+    def save_entry(self):
+        if self.save_job is not None:
+            self.win.after_cancel(self.save_job)
+            self.save_job = None
+        if self.entry is None or self.editor is None or not self.editor.text_area.edit_modified():
+            return
+        raw = self.editor.get_document()
+        self.entry = self.vault.write(self.entry, raw, preview=decode_document(raw)[0])
+        self.editor.text_area.edit_modified(False)
+
+    def lock(self):
+        self.save_entry()
+        self.entry = None
+        if self.editor.journal:
+            self.editor.journal.close()
+            self.editor.journal = None
+        self.editor = None
+        self.vault.lock()
+        self.show_lock()
+
+    def close(self):
+        if self.vault.unlocked:
+            self.save_entry()
+        self.unlocker.shutdown(wait=False)
+        self.win.destroy()
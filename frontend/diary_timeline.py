@@ -0,0 +1,143 @@
+# diary_timeline.py
+import datetime
+import json
+import os
+import re
+from collections import namedtuple
+
+TIMELINE_DIR = 'timeline'
+PARTITION_SUFFIX = '.month'
+# Short metadata kept per entry in its month partition; bodies are never read for the timeline
+TITLE_CHARS = 80
+PREVIEW_CHARS = 120
+MONTH_FILE = re.compile(r'(\d{2})' + re.escape(PARTITION_SUFFIX))
+
+EntryInfo = namedtuple('EntryInfo', 'id date title created size preview')
+
+def month_of(date):
+    """'YYYY-MM' partition of a 'YYYY-MM-DD' date"""
+    return date[:7]
+
+def short_preview(text):
+    return ' '.join(text[:PREVIEW_CHARS * 4].split())[:PREVIEW_CHARS]
+
+class Timeline:
+    """Date-partitioned index of diary entries: one small encrypted file per month.
+
+    Each partition maps entry ids to their date, title, size and a short
+    preview, so month views, day counts, streaks and date ranges are
+    answered from partitions alone. Years and months are plain directory
+    and file names; the partitions themselves are sealed like entries, so
+    only which months have entries is visible without the password.
+    Loaded partitions stay cached until the vault is locked.
+    """
+
+    def __init__(self, vault):
+        self.vault = vault
+        self.partitions = {}   # 'YYYY-MM' -> {entry id: meta}
+
+    def directory(self):
+        return os.path.join(self.vault.directory(), TIMELINE_DIR)
+
+    def path(self, month):
+        year, number = month.split('-')
+        return os.path.join(self.directory(), year, number + PARTITION_SUFFIX)
+
+    def clear(self):
+        self.partitions = {}
+
+    def months(self):
+        """Every 'YYYY-MM' holding entries, oldest first; a directory listing, nothing is decrypted"""
+        found = []
+        root = self.directory()
+        if not os.path.isdir(root):
+            return found
+        for year in os.scandir(root):
+            if year.is_dir() and year.name.isdigit():
+                for entry in os.scandir(year.path):
+                    match = MONTH_FILE.fullmatch(entry.name)
+                    if match:
+                        found.append(f"{year.name}-{match.group(1)}")
+        return sorted(found)
+
+    def load(self, month):
+        partition = self.partitions.get(month)
+        if partition is None:
+            path = self.path(month)
+            partition = json.loads(self.vault.read_bytes('timeline:' + month, path=path)) if os.path.exists(path) else {}
+            self.partitions[month] = partition
+        return partition
+
+    def save(self, month):
+        partition = self.partitions[month]
+        if partition:
+            self.vault.write_bytes('timeline:' + month, json.dumps(partition, ensure_ascii=False).encode('utf-8'),
+                                   path=self.path(month))
+        else:
+            try:
+                os.remove(self.path(month))
+            except FileNotFoundError:
+                pass
+
+    def put(self, entry_id, date, title, created, size, preview):
+        meta = self.load(month_of(date))[entry_id] = {'date': date, 'title': title[:TITLE_CHARS], 'created': created,
+                                                       'size': size, 'preview': preview}
+        self.save(month_of(date))
+        return EntryInfo(entry_id, **meta)
+
+    def update(self, entry, **changes):
+        meta = self.load(month_of(entry.date))[entry.id]
+        meta.update(changes)
+        if 'title' in changes:
+            meta['title'] = meta['title'][:TITLE_CHARS]
+        self.save(month_of(entry.date))
+        return EntryInfo(entry.id, **meta)
+
+    def remove(self, entry):
+        self.load(month_of(entry.date)).pop(entry.id, None)
+        self.save(month_of(entry.date))
+
+    def month_entries(self, month):
+        """Entries of one month, by date then creation"""
+        return sorted((EntryInfo(entry_id, **meta) for entry_id, meta in self.load(month).items()),
+                      key=lambda entry: (entry.date, entry.created))
+
+    def day_counts(self, month):
+        """{day of month: number of entries}"""
+        counts = {}
+        for meta in self.load(month).values():
+            day = int(meta['date'][8:10])
+            counts[day] = counts.get(day, 0) + 1
+        return counts
+
+    def between(self, first=None, last=None):
+        """Entries dated first..last inclusive ('YYYY-MM-DD', None for open ends); reads only the months in range"""
+        entries = []
+        for month in self.months():
+            if (first and month < month_of(first)) or (last and month > month_of(last)):
+                continue
+            entries.extend(entry for entry in self.month_entries(month)
+                           if (not first or entry.date >= first) and (not last or entry.date <= last))
+        return entries
+
+    def streaks(self, today=None):
+        """(current, longest) runs of consecutive days with at least one entry"""
+        today = today or datetime.date.today()
+        days = set()
+        for month in self.months():
+            year, number = map(int, month.split('-'))
+            days.update(datetime.date(year, number, day) for day in self.day_counts(month))
+        longest = 0
+        for day in days:
+            if day - datetime.timedelta(days=1) not in days:
+                length = 1
+                while day + datetime.timedelta(days=length) in days:
+                    length += 1
+                longest = max(longest, length)
+        # Today not written yet does not break the streak
+        day = today if today in days else today - datetime.timedelta(days=1)
+        current = 0
+        while day in days:
+            current += 1
+            day -= datetime.timedelta(days=1)
+        return current, longest
@@ -0,0 +1,215 @@
+# diary_vault.py
+import base64
+import hashlib
+import json
+import os
+import struct
+import time
+import unicodedata
+import uuid
+from autosave import atomic_write
+from diary_timeline import Timeline, short_preview
+from workspace import workspace_dir
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+except ImportError:  # the diary stays locked; everything else works without it
+    ChaCha20Poly1305 = None
+
+VAULT_FILE = 'vault.json'
+ENTRY_SUFFIX = '.entry'
+# scrypt cost: 128 MiB and about half a second, paid once per unlock
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 17, 8, 1
+SCRYPT_MAXMEM = 256 * 1024 * 1024
+SALT_BYTES = 16
+KEY_BYTES = 32
+NONCE_BYTES = 12
+TAG_BYTES = 16
+# Plaintext per encrypted chunk; reading or appending touches whole chunks only
+CHUNK_SIZE = 64 * 1024
+RECORD_SIZE = NONCE_BYTES + CHUNK_SIZE + TAG_BYTES
+ENTRY_MAGIC = b'TZDIARY1'
+CHECK_PLAINTEXT = b'tarizz diary'
+
+def b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+def chunk_aad(entry_id, number, final):
+    """Binds a chunk to its entry and position; the final flag makes truncation detectable"""
+    return struct.pack('>32sQ?', entry_id.encode('ascii'), number, final)
+
+class DiaryVault:
+    """Password-protected diary: every entry is its own file, encrypted in fixed-size chunks.
+
+    The master key comes from the password through scrypt once per unlock.
+    Each entry gets its own key from the master key through HKDF, and its
+    text is split into CHUNK_SIZE pieces sealed with ChaCha20-Poly1305
+    under fresh random nonces. Opening an entry decrypts that entry's
+    chunks only; appending re-seals just its last chunk and adds new ones.
+    Dates, titles and sizes live in the month partitions of the timeline.
+    """
+
+    def __init__(self, root=None):
+        self.root = root
+        self.master = None
+        self.timeline = Timeline(self)
+
+    def directory(self):
+        if self.root is None:
+            self.root = workspace_dir('diary')
+        return self.root
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.directory(), VAULT_FILE))
+
+    @property
+    def unlocked(self):
+        return self.master is not None
+
+    # Keys
+
+    def derive_master(self, password, settings):
+        if ChaCha20Poly1305 is None:
+            raise RuntimeError("The diary needs the 'cryptography' package (pip install cryptography)")
+        secret = unicodedata.normalize('NFKC', password).encode('utf-8')
+        return hashlib.scrypt(secret, salt=base64.b64decode(settings['salt']), n=settings['n'],
+                              r=settings['r'], p=settings['p'], maxmem=SCRYPT_MAXMEM, dklen=KEY_BYTES)
+
+    def subkey(self, purpose):
+        return HKDF(algorithm=hashes.SHA256(), length=KEY_BYTES, salt=None,
+                    info=b'tarizz-diary:' + purpose.encode('ascii')).derive(self.master)
+
+    def cipher(self, entry_id):
+        return ChaCha20Poly1305(self.subkey('entry:' + entry_id))
+
+    def create(self, password):
+        """Set up an empty vault protected by password"""
+        if self.exists():
+            raise FileExistsError("A diary already exists")
+        settings = {'version': 1, 'salt': b64(os.urandom(SALT_BYTES)), 'n': SCRYPT_N, 'r': SCRYPT_R, 'p': SCRYPT_P}
+        self.master = self.derive_master(password, settings)
+        nonce = os.urandom(NONCE_BYTES)
+        check = ChaCha20Poly1305(self.subkey('check')).encrypt(nonce, CHECK_PLAINTEXT, None)
+        settings['check'] = b64(nonce + check)
+        self.timeline.clear()
+        atomic_write(os.path.join(self.directory(), VAULT_FILE), json.dumps(settings, indent=1))
+
+    def unlock(self, password):
+        """Derive the master key; raises ValueError for a wrong password"""
+        with open(os.path.join(self.directory(), VAULT_FILE), 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+        self.master = self.derive_master(password, settings)
+        check = base64.b64decode(settings['check'])
+        try:
+            ChaCha20Poly1305(self.subkey('check')).decrypt(check[:NONCE_BYTES], check[NONCE_BYTES:], None)
+        except InvalidTag:
+            self.master = None
+            raise ValueError("Wrong password")
+        self.timeline.clear()
+
+    def lock(self):
+        self.master = None
+        self.timeline.clear()
+
+    # Entry files
+
+    def path(self, entry_id):
+        return os.path.join(self.directory(), entry_id[:2], entry_id + ENTRY_SUFFIX)
+
+    def seal(self, cipher, entry_id, data, first_number=0):
+        """Encrypted records for data split into chunks, numbered from first_number; the last is final"""
+        pieces = [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)] or [b'']
+        records = []
+        for i, piece in enumerate(pieces):
+            nonce = os.urandom(NONCE_BYTES)
+            aad = chunk_aad(entry_id, first_number + i, i == len(pieces) - 1)
+            records.append(nonce + cipher.encrypt(nonce, piece, aad))
+        return records
+
+    def open_record(self, cipher, entry_id, number, record, final):
+        try:
+            return cipher.decrypt(record[:NONCE_BYTES], record[NONCE_BYTES:], chunk_aad(entry_id, number, final))
+        except InvalidTag:
+            raise ValueError(f"Diary entry {entry_id} is damaged or was tampered with")
+
+    def write_bytes(self, entry_id, data, path=None):
+        records = self.seal(self.cipher(entry_id), entry_id, data)
+        atomic_write(path or self.path(entry_id), ENTRY_MAGIC + b''.join(records))
+
+    def read_bytes(self, entry_id, start=0, end=None, path=None):
+        """Plaintext bytes [start, end) of an entry, decrypting only the chunks that hold them"""
+        cipher = self.cipher(entry_id)
+        with open(path or self.path(entry_id), 'rb') as f:
+            if f.read(len(ENTRY_MAGIC)) != ENTRY_MAGIC:
+                raise ValueError(f"Diary entry {entry_id} is not an encrypted entry")
+            total = os.fstat(f.fileno()).st_size - len(ENTRY_MAGIC)
+            count = max(1, -(-total // RECORD_SIZE))
+            first = start // CHUNK_SIZE
+            last = count - 1 if end is None else min(count - 1, max(first, (end - 1) // CHUNK_SIZE))
+            f.seek(len(ENTRY_MAGIC) + first * RECORD_SIZE)
+            parts = []
+            for number in range(first, last + 1):
+                parts.append(self.open_record(cipher, entry_id, number, f.read(RECORD_SIZE), number == count - 1))
+        data = b''.join(parts)
+        offset = first * CHUNK_SIZE
+        return data[start - offset:None if end is None else end - offset]
+
+    def append_bytes(self, entry_id, data):
+        """Add data to the end of an entry, re-sealing only its last chunk.
+
+        The earlier records are copied as they are into a new file that
+        replaces the entry, so a crash leaves either the old or the new one.
+        """
+        cipher = self.cipher(entry_id)
+        path = self.path(entry_id)
+        with open(path, 'rb') as f:
+            total = os.fstat(f.fileno()).st_size - len(ENTRY_MAGIC)
+            last = max(0, -(-total // RECORD_SIZE) - 1)
+            head = f.read(len(ENTRY_MAGIC) + last * RECORD_SIZE)
+            if head[:len(ENTRY_MAGIC)] != ENTRY_MAGIC:
+                raise ValueError(f"Diary entry {entry_id} is not an encrypted entry")
+            tail = self.open_record(cipher, entry_id, last, f.read(), True)
+        records = self.seal(cipher, entry_id, tail + data, first_number=last)
+        atomic_write(path, head + b''.join(records))
+
+    # Entries
+
+    def entries(self, first=None, last=None):
+        """Entries dated first..last ('YYYY-MM-DD', inclusive), oldest first"""
+        return self.timeline.between(first, last)
+
+    def new_entry(self, date, title, text=''):
+        """Create an entry for a date ("YYYY-MM-DD"); returns its EntryInfo"""
+        entry_id = uuid.uuid4().hex
+        data = text.encode('utf-8')
+        self.write_bytes(entry_id, data)
+        return self.timeline.put(entry_id, date, title, time.time(), len(data), short_preview(text))
+
+    def read(self, entry_id):
+        return self.read_bytes(entry_id).decode('utf-8')
+
+    def write(self, entry, text, preview=None):
+        """Replace an entry's text; preview is the plain text to show in the timeline, if text is markup"""
+        data = text.encode('utf-8')
+        self.write_bytes(entry.id, data)
+        return self.timeline.update(entry, size=len(data), preview=short_preview(text if preview is None else preview))
+
+    def append(self, entry, text):
+        data = text.encode('utf-8')
+        self.append_bytes(entry.id, data)
+        return self.timeline.update(entry, size=entry.size + len(data))
+
+    def set_title(self, entry, title):
+        return self.timeline.update(entry, title=title)
+
+    def delete(self, entry):
+        self.timeline.remove(entry)
+        try:
+            os.remove(self.path(entry.id))
+        except FileNotFoundError:
+            pass
+
+diary_vault = DiaryVault()
@@ -0,0 +1,85 @@
+# document.py
+import bisect
+import json
+
+# A document is a small line-oriented header followed by the raw page text:
+#
+#   %TARIZZ-DOC 1
+#   ["style", "style_3", ["Arial", 14, "bold", "roman", false]]
+#   ["tag", "style_3", ["1.0", "1.5", "3.2", "3.9"]]
+#   ["embed", "4.0", "image", {"path": "/home/me/cat.png"}]
+#   %%
+#   <text exactly as Text.get('1.0', 'end-1c') returns it>
+#
+# Tag ranges and embeds use Tk "line.col" indices so the loader can hand
+# them straight back to the Text widget; long range lists are split over
+# several "tag" lines. Files without the magic line are plain text.
+DOCUMENT_MAGIC = '%TARIZZ-DOC 1'
+END_OF_HEADER = '%%'
+INDICES_PER_LINE = 512
+
+def encode_document(text, tags=None, embeds=None, styles=None):
+    """Serialize text plus {tag: [start, end, ...]}, [(index, kind, attrs)] and {tag: style}"""
+    lines = [DOCUMENT_MAGIC]
+    for name, style in (styles or {}).items():
+        lines.append(json.dumps(['style', name, style], ensure_ascii=False))
+    for name, indices in (tags or {}).items():
+        for i in range(0, len(indices), INDICES_PER_LINE):
+            lines.append(json.dumps(['tag', name, indices[i:i + INDICES_PER_LINE]], ensure_ascii=False))
+    for index, kind, attrs in embeds or []:
+        lines.append(json.dumps(['embed', index, kind, attrs], ensure_ascii=False))
+    lines.append(END_OF_HEADER)
+    lines.append(text)
+    return '\n'.join(lines)
+
+def decode_document(raw):
+    """Return (text, tags, embeds, styles); plain text comes back without formatting"""
+    tags, embeds, styles = {}, [], {}
+    if not raw.startswith(DOCUMENT_MAGIC + '\n'):
+        return raw, tags, embeds, styles
+    start = len(DOCUMENT_MAGIC) + 1
+    marker = END_OF_HEADER + '\n'
+    if raw.startswith(marker, start):
+        end = start
+    else:
+        end = raw.find('\n' + marker, start)
+        if end < 0:
+            raise ValueError("Document header is not terminated")
+        header = raw[start:end]
+        end += 1
+        for line in header.split('\n'):
+            record = json.loads(line)
+            if record[0] == 'style':
+                styles[record[1]] = record[2]
+            elif record[0] == 'tag':
+                tags.setdefault(record[1], []).extend(record[2])
+            elif record[0] == 'embed':
+                embeds.append((record[1], record[2], record[3]))
+    return raw[end + len(marker):], tags, embeds, styles
+
+def index_key(index):
+    """Sort key for a Tk "line.col" index"""
+    line, col = index.split('.')
+    return int(line), int(col)
+
+def embed_offsets(text_area, start='1.0', end='end-1c'):
+    """Offsets in text_area.get(start, end) of the images and windows embedded there.
+
+    get() leaves embeds out, but each still takes up one index position,
+    so offsets into its copy need these to become Tk indices again.
+    """
+    offsets, offset, previous = [], 0, start
+    for key, value, index in text_area.dump(start, end, image=True, window=True):
+        offset += int(text_area.tk.call(text_area._w, 'count', '-chars', previous, index) or 0)
+        offsets.append(offset)
+        previous = index
+    return offsets
+
+def text_index(line_start, origin, offset, embeds, end=False):
+    """Tk index of offset in a get() copy whose character at origin starts the line at line_start.
+
+    Embeds before offset are stepped over; an end offset stops before an
+    embed sitting right at it, so a range never swallows a neighbouring image.
+    """
+    before = (bisect.bisect_left if end else bisect.bisect_right)(embeds, offset)
+    return f"{line_start}+{offset - origin + before - bisect.bisect_left(embeds, origin)} indices"
@@ -0,0 +1,142 @@
+# extraction.py
+import json
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+import fitz
+from asset_store import asset_store
+from autosave import atomic_write
+from thumbnails import pdf_lock
+from workspace import workspace_dir
+
+# Bump when the extracted layout changes so cached results are rebuilt
+EXTRACTION_VERSION = 1
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+DC_TITLE = '{http://purl.org/dc/elements/1.1/}title'
+HEADING_STYLE = re.compile(r'(?i)^(heading\s*\d*|title|subtitle)$')
+
+EXTRACTORS = {}
+
+def extractor(*extensions):
+    def register(func):
+        for extension in extensions:
+            EXTRACTORS[extension] = func
+        return func
+    return register
+
+def can_extract(path):
+    return os.path.splitext(path)[1].lower() in EXTRACTORS
+
+@extractor('.pdf')
+def extract_pdf(path):
+    """Text of every page plus the document outline.
+
+    fitz is not thread-safe, so every call goes through pdf_lock, but the
+    lock is taken per page: thumbnails and the PDF viewer get a turn
+    between pages instead of waiting for the whole document.
+    """
+    with pdf_lock:
+        doc = fitz.open(path)
+    try:
+        with pdf_lock:
+            outline = [[level, title, page] for level, title, page in doc.get_toc(simple=True)]
+            title = (doc.metadata or {}).get('title') or ''
+            count = doc.page_count
+        pages = []
+        for i in range(count):
+            with pdf_lock:
+                text = doc.load_page(i).get_text('text')
+            pages.append({'number': i + 1, 'text': text, 'headings': []})
+    finally:
+        with pdf_lock:
+            doc.close()
+    for level, heading, page in outline:
+        if 1 <= page <= len(pages):
+            pages[page - 1]['headings'].append(heading)
+    return {'kind': 'pdf', 'title': title, 'pages': pages, 'outline': outline}
+
+def paragraph_text(paragraph):
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == W + 't' and node.text:
+            parts.append(node.text)
+        elif node.tag == W + 'tab':
+            parts.append('\t')
+        elif node.tag in (W + 'br', W + 'cr') and node.get(W + 'type') != 'page':
+            parts.append('\n')
+    return ''.join(parts)
+
+def starts_page(paragraph):
+    """Explicit page breaks and the breaks Word recorded when it last laid the file out"""
+    for node in paragraph.iter():
+        if node.tag == W + 'lastRenderedPageBreak' or (node.tag == W + 'br' and node.get(W + 'type') == 'page'):
+            return True
+    return False
+
+@extractor('.docx')
+def extract_docx(path):
+    """Paragraph text of word/document.xml, split into pages where Word broke them"""
+    pages = [{'number': 1, 'text': [], 'headings': []}]
+    outline = []
+    with zipfile.ZipFile(path) as archive:
+        with archive.open('word/document.xml') as f:
+            # Streamed so large documents never build the whole tree
+            for event, node in ET.iterparse(f, events=('end',)):
+                if node.tag != W + 'p':
+                    continue
+                page = pages[-1]
+                if starts_page(node) and page['text']:
+                    page = {'number': len(pages) + 1, 'text': [], 'headings': []}
+                    pages.append(page)
+                text = paragraph_text(node)
+                page['text'].append(text)
+                style = node.find(f"{W}pPr/{W}pStyle")
+                if style is not None and text.strip() and HEADING_STYLE.match(style.get(W + 'val', '')):
+                    page['headings'].append(text.strip())
+                    digits = re.sub(r'\D', '', style.get(W + 'val', ''))
+                    outline.append([int(digits) if digits else 1, text.strip(), page['number']])
+                node.clear()
+        title = ''
+        if 'docProps/core.xml' in archive.namelist():
+            core = ET.fromstring(archive.read('docProps/core.xml'))
+            title = core.findtext(DC_TITLE) or ''
+    for page in pages:
+        page['text'] = '\n'.join(page['text'])
+    return {'kind': 'docx', 'title': title, 'pages': pages, 'outline': outline}
+
+def cache_path(digest):
+    return os.path.join(workspace_dir('extracted', digest[:2]), digest + '.json')
+
+def load_extraction(path):
+    """Extracted text and structure of an attachment, cached by content hash; runs on a worker thread.
+
+    Nothing is extracted up front: callers ask for it when they need the text.
+    """
+    func = EXTRACTORS.get(os.path.splitext(path)[1].lower())
+    if func is None:
+        raise ValueError(f"No text extractor for {os.path.basename(path)}")
+    cached = cache_path(asset_store.digest(path))
+    try:
+        with open(cached, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        if result.get('version') == EXTRACTION_VERSION:
+            return result
+    except (OSError, ValueError):
+        pass
+    result = func(path)
+    result['version'] = EXTRACTION_VERSION
+    atomic_write(cached, json.dumps(result, ensure_ascii=False))
+    return result
+
+def extraction_text(result):
+    """All page text of an extraction as one string"""
+    return '\n\n'.join(page['text'] for page in result['pages'])
+
+def preview_text(result, limit=400):
+    """Title and the start of the text, for showing an attachment inline"""
+    text = re.sub(r'\s+', ' ', extraction_text(result)).strip()
+    if len(text) > limit:
+        text = text[:limit].rsplit(' ', 1)[0] + '…'
+    return f"{result['title']}\n{text}" if result.get('title') else text
@@ -0,0 +1,396 @@
+# find_replace.py
+import bisect
+import re
+import time
+import tkinter as tk
+from document import embed_offsets, index_key, text_index
+from large_file import WINDOW_LINES
+
+# Lines above and below the viewport whose matches are tagged
+FIND_MARGIN_LINES = 100
+# Quiet period after typing in the find box, and after editing the page, before searching again
+FIND_DELAY_MS = 120
+RECOUNT_DELAY_MS = 500
+# Time spent counting regex matches per idle callback on big pages
+COUNT_SLICE_MS = 15
+# Indices per tag_add call when tagging the visible matches
+TAG_BATCH = 1000
+# Backwards search looks at windows this size before the cursor, growing each miss
+BACKWARD_WINDOW = 64 * 1024
+
+def search_before(pattern, text, pos, floor=0):
+    """Last match starting before pos (and at or after floor), scanning windows backwards from it"""
+    step = BACKWARD_WINDOW
+    end = pos
+    while end > floor:
+        start = max(floor, end - step)
+        last = None
+        for match in pattern.finditer(text, start, pos):
+            last = match
+        if last is not None and last.start() < pos:
+            return last
+        end = start
+        step *= 4
+    return None
+
+class FindBar:
+    """Find/replace bar of one editor.
+
+    Searches run against a Python copy of the buffer (or the memory-mapped
+    file of a windowed view), so counting and jumping never walk the Text
+    widget. Only matches near the viewport are tagged, and they are retagged
+    as the view scrolls.
+    """
+
+    def __init__(self, editor):
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.pattern = None       # compiled str pattern, None while the query is empty or invalid
+        self.byte_pattern = None  # the same pattern for the bytes of a windowed file
+        self.mirror = None        # copy of the buffer text; None when it must be re-read
+        self.embeds = []          # offsets in the mirror of embedded images and windows
+        self.folded = None        # lowercased mirror for counting case-insensitive plain text
+        self.count = 0
+        self.counter = None       # match iterator being counted in slices
+        self.count_job = None
+        self.search_pending = None
+        self.recount_pending = None
+        self.tag_pending = None
+
+        self.frame = tk.Frame(editor.root, bg='#222222')
+        entry = dict(bg='#2a2a2a', fg='white', insertbackground='white', relief='flat',
+                     font=('Segoe UI', 10), highlightthickness=1, highlightcolor='#0078d4', width=28)
+        button = dict(bg='#222222', fg='#cccccc', activebackground='#333333', activeforeground='white',
+                      relief='flat', bd=0, font=('Segoe UI', 9), cursor='hand2', padx=6)
+        check = dict(bg='#222222', fg='#cccccc', selectcolor='#333333', activebackground='#222222',
+                     activeforeground='white', font=('Segoe UI', 9))
+        self.query = tk.StringVar()
+        self.replacement = tk.StringVar()
+        self.regex = tk.BooleanVar(value=False)
+        self.match_case = tk.BooleanVar(value=False)
+
+        find_row = tk.Frame(self.frame, bg='#222222')
+        find_row.pack(fill='x', padx=6, pady=(4, 2))
+        self.find_entry = tk.Entry(find_row, textvariable=self.query, **entry)
+        self.find_entry.pack(side='left', ipady=2)
+        tk.Button(find_row, text="↑", command=self.find_previous, **button).pack(side='left')
+        tk.Button(find_row, text="↓", command=self.find_next, **button).pack(side='left')
+        tk.Checkbutton(find_row, text=".*", variable=self.regex, command=self.schedule_search, **check).pack(side='left')
+        tk.Checkbutton(find_row, text="Aa", variable=self.match_case, command=self.schedule_search, **check).pack(side='left')
+        self.status = tk.Label(find_row, text="", bg='#222222', fg='#888888', font=('Segoe UI', 9))
+        self.status.pack(side='left', padx=8)
+        tk.Button(find_row, text="✕", command=self.hide, **button).pack(side='right')
+
+        self.replace_row = tk.Frame(self.frame, bg='#222222')
+        self.replace_entry = tk.Entry(self.replace_row, textvariable=self.replacement, **entry)
+        self.replace_entry.pack(side='left', ipady=2)
+        tk.Button(self.replace_row, text="Replace", command=self.replace_current, **button).pack(side='left')
+        tk.Button(self.replace_row, text="Replace all", command=self.replace_all, **button).pack(side='left')
+
+        self.text_area.tag_configure('find_match', background='#5c4a00')
+        self.text_area.tag_configure('find_current', background='#d18f00', foreground='#000000')
+
+        self.query.trace_add('write', lambda *a: self.schedule_search())
+        for widget in (self.find_entry, self.replace_entry):
+            widget.bind('<Escape>', lambda e: self.hide())
+        self.find_entry.bind('<Return>', lambda e: self.find_next())
+        self.find_entry.bind('<Shift-Return>', lambda e: self.find_previous())
+        self.replace_entry.bind('<Return>', lambda e: self.replace_current())
+        editor.edit_listeners.append(self.on_edit)
+        editor.scroll_listeners.append(self.on_scroll)
+
+    @property
+    def visible(self):
+        return bool(self.frame.winfo_ismapped())
+
+    def show(self, replace=False):
+        if not self.frame.winfo_ismapped():
+            self.frame.pack(side='top', fill='x', before=self.text_area)
+        if replace:
+            self.replace_row.pack(fill='x', padx=6, pady=(0, 4))
+        try:
+            selected = self.text_area.get('sel.first', 'sel.last')
+        except tk.TclError:
+            selected = ''
+        if selected and '\n' not in selected:
+            self.query.set(re.escape(selected) if self.regex.get() else selected)
+        self.find_entry.focus_set()
+        self.find_entry.select_range(0, 'end')
+        self.schedule_search()
+
+    def hide(self):
+        self.cancel_count()
+        for after_id in (self.search_pending, self.recount_pending, self.tag_pending):
+            if after_id is not None:
+                self.text_area.after_cancel(after_id)
+        self.search_pending = self.recount_pending = self.tag_pending = None
+        self.text_area.tag_remove('find_match', '1.0', 'end')
+        self.text_area.tag_remove('find_current', '1.0', 'end')
+        self.replace_row.pack_forget()
+        self.frame.pack_forget()
+        self.mirror = None
+        self.text_area.focus_set()
+
+    # Buffer copy
+
+    def haystack(self):
+        """Text searched by count and navigation: the buffer copy, or the mapped file when windowed"""
+        windowed = self.editor.windowed
+        if windowed:
+            return windowed.mm
+        if self.mirror is None:
+            self.mirror = self.text_area.get('1.0', 'end-1c')
+            self.embeds = embed_offsets(self.text_area)
+            self.folded = None
+        return self.mirror
+
+    def base(self):
+        """Where the searched text starts; a windowed file's document header is skipped"""
+        return self.editor.windowed.offsets[0] if self.editor.windowed else 0
+
+    def on_edit(self, op, start, end, chars):
+        if not self.visible:
+            return
+        self.schedule_tagging()
+        if self.editor.windowed:
+            return  # the window moved; the file itself never changes
+        self.mirror = None
+        if self.recount_pending is not None:
+            self.text_area.after_cancel(self.recount_pending)
+        self.recount_pending = self.text_area.after(RECOUNT_DELAY_MS, self.recount)
+
+    def on_scroll(self, first, last):
+        if self.visible and self.pattern is not None:
+            self.schedule_tagging()
+
+    # Searching
+
+    def schedule_search(self):
+        if self.search_pending is not None:
+            self.text_area.after_cancel(self.search_pending)
+        self.search_pending = self.text_area.after(FIND_DELAY_MS, self.search)
+
+    def compile(self):
+        query = self.query.get()
+        self.pattern = self.byte_pattern = None
+        if not query:
+            return True
+        flags = 0 if self.match_case.get() else re.IGNORECASE
+        source = query if self.regex.get() else re.escape(query)
+        try:
+            self.pattern = re.compile(source, flags | re.MULTILINE)
+            self.byte_pattern = re.compile(source.encode('utf-8'), flags | re.MULTILINE)
+        except (re.error, UnicodeEncodeError) as e:
+            self.pattern = self.byte_pattern = None
+            self.status.config(text=f"Invalid pattern: {e}", fg='#ff6666')
+            return False
+        return True
+
+    def search(self):
+        """The query changed: recount, retag the viewport and jump to the first match after the cursor"""
+        self.search_pending = None
+        if not self.compile():
+            self.cancel_count()
+            self.text_area.tag_remove('find_match', '1.0', 'end')
+            return
+        self.recount()
+        self.tag_visible()
+        if self.pattern is not None:
+            self.find_next(from_selection=False)
+
+    def recount(self):
+        self.recount_pending = None
+        self.cancel_count()
+        if self.pattern is None:
+            self.status.config(text="", fg='#888888')
+            return
+        text = self.haystack()
+        if isinstance(text, str) and not self.regex.get():
+            # Plain text: str.count runs in C over the whole page at once
+            if self.match_case.get():
+                self.count = text.count(self.query.get())
+            else:
+                if self.folded is None:
+                    self.folded = text.lower()
+                self.count = self.folded.count(self.query.get().lower())
+            self.show_count(done=True)
+            return
+        self.count = 0
+        pattern = self.pattern if isinstance(text, str) else self.byte_pattern
+        self.counter = pattern.finditer(text, self.base())
+        self.count_step()
+
+    def count_step(self):
+        """Count matches for COUNT_SLICE_MS, then let Tk run before continuing"""
+        self.count_job = None
+        deadline = time.perf_counter() + COUNT_SLICE_MS / 1000
+        for match in self.counter:
+            self.count += 1
+            if self.count % 512 == 0 and time.perf_counter() > deadline:
+                self.show_count(done=False)
+                self.count_job = self.text_area.after(1, self.count_step)
+                return
+        self.counter = None
+        self.show_count(done=True)
+
+    def cancel_count(self):
+        if self.count_job is not None:
+            self.text_area.after_cancel(self.count_job)
+        self.count_job = None
+        self.counter = None
+
+    def show_count(self, done):
+        if done:
+            text = "No results" if self.count == 0 else f"{self.count:,} match{'es' if self.count != 1 else ''}"
+        else:
+            text = f"{self.count:,}+ matches…"
+        self.status.config(text=text, fg='#888888' if self.count or not done else '#ff6666')
+
+    # Tagging
+
+    def schedule_tagging(self):
+        if self.tag_pending is None:
+            self.tag_pending = self.text_area.after_idle(self.tag_visible)
+
+    def tag_visible(self):
+        """Tag the matches on the lines around the viewport and nowhere else"""
+        self.tag_pending = None
+        text_area = self.text_area
+        text_area.tag_remove('find_match', '1.0', 'end')
+        if self.pattern is None:
+            return
+        top = max(1, index_key(text_area.index('@0,0'))[0] - FIND_MARGIN_LINES)
+        bottom = index_key(text_area.index(f"@0,{text_area.winfo_height()}"))[0] + FIND_MARGIN_LINES
+        start, end = f"{top}.0", f"{bottom}.0 lineend"
+        embeds = embed_offsets(text_area, start, end)
+        indices = []
+        for match in self.pattern.finditer(text_area.get(start, end)):
+            if match.end() > match.start():
+                indices.extend((text_index(start, 0, match.start(), embeds),
+                                text_index(start, 0, match.end(), embeds, end=True)))
+        for i in range(0, len(indices), TAG_BATCH):
+            text_area.tag_add('find_match', *indices[i:i + TAG_BATCH])
+        text_area.tag_raise('find_match')
+        text_area.tag_raise('find_current')
+        text_area.tag_raise('sel')
+
+    # Navigation
+
+    def offset_of(self, index):
+        """Offset in the haystack of a Tk index"""
+        text_area = self.text_area
+        windowed = self.editor.windowed
+        line, col = index_key(text_area.index(index))
+        if windowed:
+            prefix = text_area.get(f"{line}.0", index)
+            return windowed.offsets[windowed.top + line - 1] + len(prefix.encode('utf-8'))
+        # Tk counts characters without embedded images, exactly like the copy made by get()
+        return int(text_area.tk.call(text_area._w, 'count', '-chars', '1.0', index) or 0)
+
+    def find_next(self, from_selection=True):
+        if self.pattern is None:
+            return 'break'
+        text = self.haystack()
+        pattern = self.pattern if isinstance(text, str) else self.byte_pattern
+        current = from_selection and self.text_area.tag_ranges('find_current')
+        pos = self.offset_of('find_current.last' if current else 'insert')
+        match = pattern.search(text, pos) or pattern.search(text, self.base())
+        if match is not None and match.end() == match.start() and match.start() == pos:
+            match = pattern.search(text, pos + 1) or pattern.search(text, self.base())
+        self.select_match(match)
+        return 'break'
+
+    def find_previous(self):
+        if self.pattern is None:
+            return 'break'
+        text = self.haystack()
+        pattern = self.pattern if isinstance(text, str) else self.byte_pattern
+        current = self.text_area.tag_ranges('find_current')
+        pos = self.offset_of('find_current.first' if current else 'insert')
+        base = self.base()
+        match = search_before(pattern, text, pos, base) or search_before(pattern, text, len(text), base)
+        self.select_match(match)
+        return 'break'
+
+    def match_indices(self, match):
+        """Tk indices of a haystack match, shifting a windowed view onto it first; None if not reachable yet"""
+        windowed = self.editor.windowed
+        if not windowed:
+            return (text_index('1.0', 0, match.start(), self.embeds),
+                    text_index('1.0', 0, match.end(), self.embeds, end=True))
+        if not windowed.indexed and match.start() >= windowed.offsets[-1]:
+            self.status.config(text="Still indexing this file…", fg='#888888')
+            return None
+        line = bisect.bisect_right(windowed.offsets, match.start()) - 1
+        if not windowed.top <= line < windowed.top + windowed.shown:
+            windowed.load_window(line - WINDOW_LINES // 2, keep_line=line)
+        mm = windowed.mm
+        col = len(mm[windowed.offsets[line]:match.start()].decode('utf-8', errors='replace'))
+        length = len(mm[match.start():match.end()].decode('utf-8', errors='replace'))
+        start = f"{line - windowed.top + 1}.{col}"
+        return start, f"{start}+{length}c"
+
+    def select_match(self, match):
+        text_area = self.text_area
+        text_area.tag_remove('find_current', '1.0', 'end')
+        indices = self.match_indices(match) if match is not None else None
+        if indices is None:
+            return
+        start, end = indices
+        text_area.tag_add('find_current', start, end)
+        text_area.mark_set('insert', end)
+        text_area.see(start)
+        self.schedule_tagging()
+
+    # Replacing
+
+    def expand(self, match):
+        if self.regex.get():
+            return match.expand(self.replacement.get())
+        return self.replacement.get()
+
+    def replace_current(self):
+        if self.editor.windowed:
+            self.status.config(text="Read-only view", fg='#ff6666')
+            return 'break'
+        ranges = self.text_area.tag_ranges('find_current')
+        if ranges and self.pattern is not None:
+            start, end = str(ranges[0]), str(ranges[1])
+            match = self.pattern.fullmatch(self.text_area.get(start, end))
+            if match is not None:
+                replacement = self.expand(match)
+                self.text_area.replace(start, end, replacement)
+                self.text_area.mark_set('insert', f"{start}+{len(replacement)}c")
+                self.text_area.tag_remove('find_current', '1.0', 'end')
+        self.find_next(from_selection=False)
+        return 'break'
+
+    def replace_all(self):
+        """Replace every match as one batched edit and undo step, from the end so earlier indices stay valid"""
+        if self.editor.windowed:
+            self.status.config(text="Read-only view", fg='#ff6666')
+            return 'break'
+        if self.pattern is None:
+            return 'break'
+        self.cancel_count()
+        text = self.haystack()
+        edits = []
+        line, scanned = 1, 0
+        for match in self.pattern.finditer(text):
+            if match.end() == match.start():
+                continue
+            # Running line count, so converting every match to line.col stays linear
+            line += text.count('\n', scanned, match.start())
+            scanned = match.start()
+            line_start = text.rfind('\n', 0, match.start()) + 1
+            edits.append((text_index(f"{line}.0", line_start, match.start(), self.embeds),
+                          text_index(f"{line}.0", line_start, match.end(), self.embeds, end=True),
+                          self.expand(match)))
+        with self.editor.batch_edit():
+            for start, end, replacement in reversed(edits):
+                self.text_area.replace(start, end, replacement)
+        self.text_area.tag_remove('find_current', '1.0', 'end')
+        self.mirror = None
+        self.status.config(text=f"Replaced {len(edits):,}", fg='#888888')
+        self.schedule_tagging()
+        return 'break'
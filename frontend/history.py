@@ -0,0 +1,141 @@
+# history.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+from workspace import workspace_dir
+
+HISTORY_DB = 'history.sqlite'
+# Chunks end after a line whose CRC has these low bits clear: about one cut per
+# 32 lines, at the same places however much text is inserted before them
+CHUNK_MASK = 0x1F
+MIN_CHUNK_BYTES = 512
+MAX_CHUNK_BYTES = 64 * 1024
+DIGEST_SIZE = 16
+COMPRESS_LEVEL = 6
+# Chunk lookups per query; SQLite limits the number of bound parameters
+LOOKUP_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (digest BLOB PRIMARY KEY, data BLOB) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    page TEXT, number INTEGER, saved REAL, size INTEGER, chunks BLOB,
+    PRIMARY KEY (page, number)) WITHOUT ROWID;
+"""
+
+Version = namedtuple('Version', 'number saved size')
+
+def split_chunks(data):
+    """Cut bytes into content-defined chunks at line ends.
+
+    An edit only changes the chunk it falls in (and at most its neighbour),
+    so the other chunks of the new version are already stored.
+    """
+    chunks = []
+    start = 0
+    pos = 0
+    end = len(data)
+    while pos < end:
+        newline = data.find(b'\n', pos)
+        line_end = end if newline < 0 else newline + 1
+        if line_end - start > MAX_CHUNK_BYTES:
+            # Close the chunk before this line, or cut a single huge line at the limit
+            cut = pos if pos > start else start + MAX_CHUNK_BYTES
+            chunks.append(data[start:cut])
+            start = pos = cut
+            continue
+        if line_end - start >= MIN_CHUNK_BYTES and zlib.crc32(data[pos:line_end]) & CHUNK_MASK == 0:
+            chunks.append(data[start:line_end])
+            start = line_end
+        pos = line_end
+    if start < end:
+        chunks.append(data[start:])
+    return chunks
+
+def chunk_digest(chunk):
+    return hashlib.blake2b(chunk, digest_size=DIGEST_SIZE).digest()
+
+class PageHistory:
+    """Every saved version of every page, deduplicated into shared chunks.
+
+    A version is the list of digests of its content-defined chunks; chunk
+    data is stored once, compressed, however many versions contain it. A
+    small edit to a large page therefore adds one or two chunks plus a row.
+    Like the search index each thread gets its own SQLite connection, so
+    the autosave writer records versions while the UI lists and reads them.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            if self.path is None:
+                self.path = os.path.join(workspace_dir(), HISTORY_DB)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self.local.conn = conn
+        return conn
+
+    def existing(self, digests):
+        conn = self.connection()
+        found = set()
+        for i in range(0, len(digests), LOOKUP_BATCH):
+            batch = digests[i:i + LOOKUP_BATCH]
+            rows = conn.execute(f"SELECT digest FROM chunks WHERE digest IN ({','.join('?' * len(batch))})", batch)
+            found.update(row[0] for row in rows)
+        return found
+
+    def record(self, page, content):
+        """Store content as the next version of page; returns its number, or None if nothing changed"""
+        data = content.encode('utf-8')
+        chunks = split_chunks(data)
+        digests = [chunk_digest(chunk) for chunk in chunks]
+        listing = b''.join(digests)
+        conn = self.connection()
+        last = conn.execute('SELECT number, chunks FROM versions WHERE page = ? ORDER BY number DESC LIMIT 1',
+                            (page,)).fetchone()
+        if last and last[1] == listing:
+            return None
+        known = self.existing(digests)
+        number = last[0] + 1 if last else 1
+        with conn:
+            for digest, chunk in zip(digests, chunks):
+                if digest not in known:
+                    known.add(digest)
+                    conn.execute('INSERT OR IGNORE INTO chunks VALUES (?, ?)',
+                                 (digest, zlib.compress(chunk, COMPRESS_LEVEL)))
+            conn.execute('INSERT INTO versions VALUES (?, ?, ?, ?, ?)',
+                         (page, number, time.time(), len(data), listing))
+        return number
+
+    def versions(self, page):
+        """Versions of a page, newest first"""
+        rows = self.connection().execute('SELECT number, saved, size FROM versions WHERE page = ? '
+                                         'ORDER BY number DESC', (page,))
+        return [Version(*row) for row in rows]
+
+    def content(self, page, number):
+        """Text of one version, reassembled from its chunks"""
+        conn = self.connection()
+        row = conn.execute('SELECT chunks FROM versions WHERE page = ? AND number = ?', (page, number)).fetchone()
+        if row is None:
+            raise KeyError(f"{page} has no version {number}")
+        listing = row[0]
+        digests = [listing[i:i + DIGEST_SIZE] for i in range(0, len(listing), DIGEST_SIZE)]
+        data = {}
+        unique = list(set(digests))
+        for i in range(0, len(unique), LOOKUP_BATCH):
+            batch = unique[i:i + LOOKUP_BATCH]
+            rows = conn.execute(f"SELECT digest, data FROM chunks WHERE digest IN ({','.join('?' * len(batch))})", batch)
+            data.update((digest, zlib.decompress(blob)) for digest, blob in rows)
+        return b''.join(data[digest] for digest in digests).decode('utf-8')
+
+page_history = PageHistory()
@@ -0,0 +1,159 @@
+# history_panel.py
+import difflib
+import time
+import tkinter as tk
+from document import decode_document
+from history import page_history
+from workers import WorkerPool
+
+def diff_rows(old, new):
+    """Side-by-side rows (left, right, kind) of two texts; blank fillers keep changed blocks aligned"""
+    a, b = old.split('\n'), new.split('\n')
+    rows = []
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if op == 'equal':
+            rows.extend((line, line, 'same') for line in a[i1:i2])
+            continue
+        left, right = a[i1:i2], b[j1:j2]
+        for k in range(max(len(left), len(right))):
+            rows.append((left[k] if k < len(left) else None, right[k] if k < len(right) else None, op))
+    return rows
+
+def format_size(size):
+    return f"{size / 1024:.1f} KB" if size >= 1024 else f"{size} B"
+
+class HistoryPanel:
+    """Saved versions of one page; picking one shows it next to the current text with changes marked"""
+
+    def __init__(self, parent, page, title, current, on_restore):
+        self.page = page
+        self.current = decode_document(current)[0]
+        self.on_restore = on_restore
+        self.versions = []
+        self.serial = 0        # newest selection; diffs arriving late are dropped
+        self.selected = None
+        self.win = tk.Toplevel(parent)
+        self.win.title(f"History - {title}")
+        self.win.geometry("1100x620")
+        self.win.configure(bg='#1a1a1a')
+
+        side = tk.Frame(self.win, bg='#1a1a1a')
+        side.pack(side='left', fill='y', padx=(10, 0), pady=10)
+        self.listbox = tk.Listbox(side, width=30, bg='#2a2a2a', fg='#cccccc', font=('Segoe UI', 9),
+                                  selectbackground='#0078d4', selectforeground='white',
+                                  relief='flat', highlightthickness=0, activestyle='none')
+        self.listbox.pack(fill='both', expand=True)
+        self.restore_btn = tk.Button(side, text="Restore this version", command=self.restore, state='disabled',
+                                     bg='#222222', fg='#cccccc', activebackground='#333333',
+                                     activeforeground='#ffffff', relief='flat', bd=0, padx=12, pady=6)
+        self.restore_btn.pack(fill='x', pady=(6, 0))
+
+        main = tk.Frame(self.win, bg='#1a1a1a')
+        main.pack(side='left', fill='both', expand=True, padx=10, pady=10)
+        self.status = tk.Label(main, text="Loading versions…", bg='#1a1a1a', fg='#888888',
+                               font=('Segoe UI', 8), anchor='w')
+        self.status.pack(fill='x')
+        panes = tk.Frame(main, bg='#1a1a1a')
+        panes.pack(fill='both', expand=True)
+        self.scrollbar = tk.Scrollbar(panes, command=self.yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.left = self.make_pane(panes)
+        self.right = self.make_pane(panes)
+
+        self.loader = WorkerPool(self.win, threads=1, name='history')
+        self.listbox.bind('<<ListboxSelect>>', lambda e: self.on_select())
+        self.win.bind('<Escape>', lambda e: self.close())
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+        self.loader.submit(page_history.versions, page, callback=self.show_versions,
+                           errback=lambda e: self.status.config(text=f"Could not read history: {e}"))
+
+    def make_pane(self, parent):
+        pane = tk.Text(parent, bg='#1e1e1e', fg='#d4d4d4', font=('Consolas', 10), wrap='none',
+                       relief='flat', highlightthickness=0, padx=6, yscrollcommand=self.on_scroll)
+        pane.pack(side='left', fill='both', expand=True, padx=(0, 4))
+        pane.tag_configure('delete', background='#4b1818')
+        pane.tag_configure('insert', background='#1e4620')
+        pane.tag_configure('replace', background='#4a3c12')
+        pane.tag_configure('filler', background='#262626')
+        pane.configure(state='disabled')
+        return pane
+
+    def yview(self, *args):
+        # Both panes hold the same number of rows, so they scroll as one
+        self.left.yview(*args)
+        self.right.yview(*args)
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        for pane in (self.left, self.right):
+            if pane.yview()[0] != float(first):
+                pane.yview_moveto(first)
+
+    def show_versions(self, versions):
+        self.versions = versions
+        for version in versions:
+            saved = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(version.saved))
+            self.listbox.insert('end', f"#{version.number}   {saved}   {format_size(version.size)}")
+        if versions:
+            self.status.config(text=f"{len(versions)} saved version{'s' if len(versions) != 1 else ''}")
+            self.listbox.selection_set(0)
+            self.on_select()
+        else:
+            self.status.config(text="No saved versions yet")
+
+    def on_select(self):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        version = self.versions[selection[0]]
+        self.selected = None
+        self.restore_btn.config(state='disabled')
+        self.serial += 1
+        serial = self.serial
+        self.status.config(text=f"Comparing version #{version.number} with the current page…")
+        self.loader.cancel()
+        # The diff is only computed for the version being looked at
+        self.loader.submit(self.compare, version.number,
+                           callback=lambda result: self.show_diff(serial, version, *result),
+                           errback=lambda e: self.status.config(text=f"Could not read version: {e}"))
+
+    def compare(self, number):
+        raw = page_history.content(self.page, number)
+        start = time.perf_counter()
+        rows = diff_rows(decode_document(raw)[0], self.current)
+        return raw, rows, time.perf_counter() - start
+
+    def show_diff(self, serial, version, raw, rows, seconds):
+        if serial != self.serial:
+            return
+        self.selected = raw
+        self.restore_btn.config(state='normal')
+        for pane, side in ((self.left, 0), (self.right, 1)):
+            pane.configure(state='normal')
+            pane.delete('1.0', 'end')
+            lines, tags = [], []
+            for row in rows:
+                line = row[side]
+                lines.append('' if line is None else line)
+                tags.append('filler' if line is None else row[2])
+            pane.insert('1.0', '\n'.join(lines))
+            # One tag_add per tag over all its rows
+            ranges = {}
+            for i, tag in enumerate(tags, 1):
+                if tag != 'same':
+                    ranges.setdefault(tag, []).extend((f"{i}.0", f"{i + 1}.0"))
+            for tag, indices in ranges.items():
+                pane.tag_add(tag, *indices)
+            pane.configure(state='disabled')
+        changed = sum(1 for row in rows if row[2] != 'same')
+        self.status.config(text=f"Version #{version.number} (left) against the current page (right): "
+                                f"{changed} changed line{'s' if changed != 1 else ''}, diffed in {seconds * 1000:.0f} ms")
+
+    def restore(self):
+        if self.selected is not None:
+            self.on_restore(self.selected)
+            self.close()
+
+    def close(self):
+        self.loader.shutdown(wait=False)
+        self.win.destroy()
@@ -0,0 +1,128 @@
+# image_embeds.py
+import tkinter as tk
+from PIL import ImageTk
+from thumbnails import load_thumbnail
+
+# Pixel memory (4 bytes per pixel in Tk) one editor may hold in live images
+IMAGE_MEMORY_BUDGET = 48 * 1024 * 1024
+# Lines above and below the viewport whose images are kept decoded
+IMAGE_MARGIN_LINES = 40
+# Footprint of an image whose thumbnail is still being decoded
+LOADING_SIZE = (160, 120)
+
+class ImageEmbed:
+    def __init__(self, path, width, height, photo):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.photo = photo   # None while loading or evicted
+        self.job = None      # background decode in flight
+        self.failed = False
+
+    @property
+    def cost(self):
+        return self.width * self.height * 4
+
+class ImageEmbeds:
+    """Embedded images of one editor, decoding only those near the viewport within a memory budget"""
+
+    def __init__(self, editor, budget=IMAGE_MEMORY_BUDGET):
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.budget = budget
+        self.entries = {}   # image name in the Text widget -> ImageEmbed
+        self.used = 0
+        self.pending = None
+        # Stands in for evicted images; padding keeps their footprint so the layout does not jump
+        self.placeholder = tk.PhotoImage(master=self.text_area, width=1, height=1)
+        editor.scroll_listeners.append(lambda first, last: self.schedule_refresh())
+
+    def insert(self, path, index):
+        """Embed a placeholder right away; refresh decodes it once it is near the view"""
+        width, height = LOADING_SIZE
+        name = self.text_area.image_create(index, image=self.placeholder, padx=width // 2, pady=height // 2)
+        self.entries[name] = ImageEmbed(path, width, height, None)
+        self.schedule_refresh()
+        return name
+
+    def load(self, name, entry):
+        entry.job = self.editor.media_workers().submit(
+            load_thumbnail, 'image', entry.path, owner=self,
+            callback=lambda img: self.on_loaded(name, entry, img),
+            errback=lambda error: self.on_failed(entry, error))
+
+    def on_loaded(self, name, entry, img):
+        entry.job = None
+        if self.entries.get(name) is not entry:
+            return
+        photo = ImageTk.PhotoImage(img, master=self.text_area)
+        try:
+            self.text_area.image_configure(name, image=photo, padx=0, pady=0)
+        except tk.TclError:
+            del self.entries[name]  # deleted while it was decoding
+            return
+        entry.photo = photo
+        entry.width, entry.height = img.width, img.height
+        self.used += entry.cost
+        if self.used > self.budget:
+            self.schedule_refresh()
+
+    def on_failed(self, entry, error):
+        entry.job = None
+        entry.failed = True
+        print(f"Could not load image {entry.path}:", error)
+
+    def clear(self):
+        for entry in self.entries.values():
+            if entry.job:
+                entry.job.cancel()
+        self.entries = {}
+        self.used = 0
+
+    def schedule_refresh(self):
+        if self.pending is None:
+            self.pending = self.text_area.after_idle(self.refresh)
+
+    def visible_lines(self):
+        text_area = self.text_area
+        top = int(text_area.index('@0,0').split('.')[0]) - IMAGE_MARGIN_LINES
+        bottom = int(text_area.index(f"@0,{text_area.winfo_height()}").split('.')[0]) + IMAGE_MARGIN_LINES
+        return top, bottom
+
+    def refresh(self):
+        """Restore images scrolled near the view, then evict the farthest ones while over budget"""
+        self.pending = None
+        text_area = self.text_area
+        try:
+            top, bottom = self.visible_lines()
+            live = set(text_area.image_names())
+        except tk.TclError:
+            return
+        distances = []
+        for name, entry in list(self.entries.items()):
+            if name not in live:
+                # Deleted from the text along with its line
+                if entry.photo is not None:
+                    self.used -= entry.cost
+                if entry.job:
+                    entry.job.cancel()
+                del self.entries[name]
+                continue
+            line = int(text_area.index(name).split('.')[0])
+            if top <= line <= bottom:
+                if entry.photo is None and entry.job is None and not entry.failed:
+                    self.load(name, entry)
+            elif entry.photo is not None:
+                distances.append((top - line if line < top else line - bottom, name))
+        if self.used <= self.budget:
+            return
+        for distance, name in sorted(distances, reverse=True):
+            self.evict(name, self.entries[name])
+            if self.used <= self.budget:
+                break
+
+    def evict(self, name, entry):
+        self.text_area.image_configure(name, image=self.placeholder,
+                                       padx=entry.width // 2, pady=entry.height // 2)
+        entry.photo = None
+        self.used -= entry.cost
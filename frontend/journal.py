@@ -0,0 +1,351 @@
+# journal.py
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+from workspace import workspace_dir
+
+# Text of old undo steps beyond this many characters is dropped from memory
+# and read back from the journal log when those steps are undone
+UNDO_MEMORY_CHARS = 4 * 1024 * 1024
+# Typing pauses longer than this start a new undo step
+UNDO_GROUP_SECONDS = 1.0
+# Buffered log lines are written this often; a crash loses at most this much typing
+JOURNAL_FLUSH_MS = 300
+LOG_PATTERN = '*.log'
+
+def text_digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+class StateDigest:
+    """Digest of the buffer text and where images and windows sit in it, fed a slice of text at a time"""
+
+    def __init__(self):
+        self.hash = hashlib.blake2b(digest_size=16)
+
+    def add_text(self, text):
+        self.hash.update(text.encode('utf-8'))
+
+    def finish(self, embeds):
+        self.hash.update(('\0' + ' '.join(embeds)).encode('utf-8'))
+        return self.hash.hexdigest()
+
+def state_digest(text_area):
+    """Logged edits only fit the exact state with this digest"""
+    digest = StateDigest()
+    digest.add_text(text_area.get('1.0', 'end-1c'))
+    return digest.finish([index for key, value, index in text_area.dump('1.0', 'end-1c', image=True, window=True)])
+
+def journal_dir(page_path):
+    key = hashlib.blake2b(os.path.abspath(page_path).encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(workspace_dir('journal'), key)
+
+def log_files(directory):
+    return sorted(glob.glob(os.path.join(directory, LOG_PATTERN)))
+
+def read_log(path):
+    """(kind, base digest, [(op, index, text)]) of a log; a torn last line from a crash is ignored.
+
+    kind is 'base' for a log that continues the one before it, and 'reset'
+    for one started after the buffer changed in a way the log cannot
+    replay (an image or window added or deleted, a version restored).
+    """
+    edits = []
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            kind, base = json.loads(f.readline())
+        except ValueError:
+            return None, None, []
+        for line in f:
+            try:
+                op, index, text = json.loads(line)
+            except ValueError:
+                break
+            edits.append((op, index, text))
+    return kind, base, edits
+
+def pending_edits(page_path, digest):
+    """Logged edits not yet in the saved page, and the logs they were read from.
+
+    digest is the state_digest of the loaded page. Each log continues where
+    the previous one stopped, so everything from the newest log based on
+    exactly this state is replayed, up to the first reset log.
+    """
+    logs = log_files(journal_dir(page_path))
+    contents = [read_log(path) for path in logs]
+    starts = [i for i, (kind, base, edits) in enumerate(contents) if base == digest]
+    if not starts:
+        return [], logs
+    pending = list(contents[starts[-1]][2])
+    for kind, base, edits in contents[starts[-1] + 1:]:
+        if kind != 'base':
+            break
+        pending.extend(edits)
+    return pending, logs
+
+class Edit:
+    """One insert or delete; its text may be dropped from memory and reloaded from the log"""
+    __slots__ = ('op', 'index', 'text', 'log', 'offset')
+
+    def __init__(self, op, index, text, log, offset):
+        self.op = op
+        self.index = index
+        self.text = text
+        self.log = log        # log file holding the text, and the line offset in it
+        self.offset = offset
+
+class Journal:
+    """Edit journal of one page: undo/redo groups plus an append-only recovery log.
+
+    Every edit is just (op, index, text), never a copy of the document,
+    and typing is coalesced into one step per word or pause. Each edit is
+    also appended to a log in the workspace; logs start with the digest of
+    the state they apply to, so after a crash the edits made since the last
+    save can be replayed onto the saved page. Images and windows are not
+    journaled: adding or deleting one clears the undo steps and starts a
+    reset log, since indices recorded before it no longer line up.
+
+    With page_path None nothing is written to disk (the diary, whose text
+    must not leave its vault): undo still works, but every step's text is
+    kept in memory and there is nothing to recover after a crash.
+    """
+
+    def __init__(self, editor, page_path):
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.directory = journal_dir(page_path) if page_path else None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self.undo_stack = []   # groups (lists of Edit) in order
+        self.redo_stack = []
+        self.memory = 0        # characters of edit text held in memory
+        self.last_edit = 0.0
+        self.applying = False  # undo/redo/replay edits go to the log only
+        self.replayed = None   # logged edits of a replay in progress, for its undo group
+        self.pending = []      # log lines not written yet
+        self.flush_job = None
+        self.log = None
+        self.log_size = 0
+        self.dirty = False     # edits not covered by a save
+        self.saving = 0        # checkpoints whose write has not finished
+        self.closed = False
+        self.transaction = None  # edits of a batch being gathered into one undo step
+        self.start_log(state_digest(self.text_area))
+
+    # Log
+
+    def start_log(self, base, kind='base'):
+        """Begin a new log for edits on top of the state with digest base"""
+        self.flush()
+        if self.directory is None:
+            return
+        existing = log_files(self.directory)
+        number = int(os.path.basename(existing[-1])[:-4]) + 1 if existing else 1
+        self.log = os.path.join(self.directory, f"{number:08d}.log")
+        self.log_size = 0
+        self.append([kind, base])
+
+    def append(self, entry):
+        if self.log is None:
+            return 0
+        line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+        offset = self.log_size
+        self.pending.append(line)
+        self.log_size += len(line)
+        if self.flush_job is None and not self.closed:
+            self.flush_job = self.text_area.after(JOURNAL_FLUSH_MS, self.flush)
+        return offset
+
+    def flush(self):
+        if self.flush_job is not None:
+            try:
+                self.text_area.after_cancel(self.flush_job)
+            except Exception:
+                pass  # widget already gone
+            self.flush_job = None
+        if not self.pending or self.log is None:
+            return
+        with open(self.log, 'ab') as f:
+            f.write(b''.join(self.pending))
+        self.pending = []
+
+    def reload(self, edit):
+        """Text of an edit whose copy was dropped from memory"""
+        if edit.log == self.log:
+            self.flush()
+        with open(edit.log, 'rb') as f:
+            f.seek(edit.offset)
+            return json.loads(f.readline())[2]
+
+    # Recording
+
+    def record(self, op, index, text):
+        """Called by the editor for every insert and delete, before listeners run"""
+        if self.closed or not text:
+            return
+        edit = Edit(op, index, text, self.log, self.append([op, index, text]))
+        self.dirty = True
+        if self.applying:
+            if self.replayed is not None:
+                self.replayed.append(edit)
+            return
+        self.redo_stack = []
+        self.memory += len(text)
+        if self.transaction is not None:
+            self.transaction.append(edit)
+            return
+        now = time.monotonic()
+        group = self.undo_stack[-1] if self.undo_stack else None
+        if group and now - self.last_edit < UNDO_GROUP_SECONDS and self.extends(group[-1], edit):
+            group.append(edit)
+        else:
+            self.undo_stack.append([edit])
+        self.last_edit = now
+        self.trim()
+
+    def begin(self):
+        """Edits until end() are undone and redone as one step"""
+        self.transaction = []
+
+    def end(self):
+        group, self.transaction = self.transaction, None
+        if group:
+            self.undo_stack.append(group)
+            self.last_edit = 0.0
+            self.trim()
+
+    def extends(self, previous, edit):
+        """Whether edit continues the same run of typing or deleting; a new word starts a new step"""
+        if previous.op != edit.op or previous.text is None:
+            return False
+        if edit.op == 'insert':
+            if previous.text[-1].isspace() and not edit.text[0].isspace():
+                return False
+            return self.text_area.compare(edit.index, '==', f"{previous.index}+{len(previous.text)}c")
+        # Backspacing towards the start, or Delete eating forwards
+        return self.text_area.compare(f"{edit.index}+{len(edit.text)}c", '==', previous.index) or \
+            self.text_area.compare(edit.index, '==', previous.index)
+
+    def trim(self):
+        """Drop the text of the oldest edits from memory; it stays in the logs"""
+        if self.directory is None:
+            return
+        for group in self.undo_stack:
+            if self.memory <= UNDO_MEMORY_CHARS:
+                return
+            for edit in group:
+                if edit.text is not None:
+                    self.memory -= len(edit.text)
+                    edit.text = None
+
+    # Undo / redo
+
+    def apply(self, op, index, text):
+        text_area = self.text_area
+        if op == 'insert':
+            text_area.insert(index, text)
+            text_area.mark_set('insert', f"{index}+{len(text)}c")
+        else:
+            text_area.delete(index, f"{index}+{len(text)}c")
+            text_area.mark_set('insert', index)
+
+    def undo(self):
+        if not self.undo_stack:
+            return 'break'
+        group = self.undo_stack.pop()
+        self.replay_group(group, reverse=True)
+        self.redo_stack.append(group)
+        return 'break'
+
+    def redo(self):
+        if not self.redo_stack:
+            return 'break'
+        group = self.redo_stack.pop()
+        self.replay_group(group, reverse=False)
+        self.undo_stack.append(group)
+        return 'break'
+
+    def replay_group(self, group, reverse):
+        self.applying = True
+        try:
+            with self.editor.batch_edit():
+                for edit in (reversed(group) if reverse else group):
+                    text = edit.text if edit.text is not None else self.reload(edit)
+                    if reverse:
+                        self.apply('delete' if edit.op == 'insert' else 'insert', edit.index, text)
+                    else:
+                        self.apply(edit.op, edit.index, text)
+        finally:
+            self.applying = False
+        self.last_edit = 0.0
+        self.text_area.see('insert')
+
+    def recover(self, edits, logs):
+        """Apply edits recovered from older logs as one undoable step; they now live in the current log"""
+        if edits:
+            self.replay(edits)
+        self.flush()
+        for path in logs:
+            if path != self.log:
+                os.remove(path)
+
+    def replay(self, edits):
+        # The edits are logged again as they are applied, so trimmed text can be read back like any other
+        self.replayed = group = []
+        self.applying = True
+        try:
+            with self.editor.batch_edit():
+                for op, index, text in edits:
+                    self.apply(op, index, text)
+        finally:
+            self.applying = False
+            self.replayed = None
+        self.undo_stack.append(group)
+        self.memory += sum(len(edit.text) for edit in group)
+        self.trim()
+
+    def reset(self):
+        """The buffer changed in a way undo cannot replay (a version restored, an image or window
+        added or deleted): forget undo steps and log on top of the new state"""
+        self.undo_stack = []
+        self.redo_stack = []
+        if self.transaction is not None:
+            self.transaction = []
+        self.memory = 0
+        self.start_log(state_digest(self.text_area), kind='reset')
+        self.dirty = True
+
+    # Saving
+
+    def checkpoint(self, digest=None):
+        """The page is being saved: later edits go to a new log based on the saved state.
+
+        digest is the state's digest when the caller already worked it out.
+        Older logs are kept, undo may still read text back from them; they
+        are never replayed since recovery starts at the newest matching log.
+        """
+        self.start_log(digest or state_digest(self.text_area))
+        self.dirty = False
+        self.saving += 1
+
+    def saved(self, ok):
+        """The write queued by the last checkpoint finished (or failed)"""
+        self.saving -= 1
+        if not ok:
+            self.dirty = True  # the page file is behind, keep the logs
+        if self.closed and not self.dirty and not self.saving:
+            self.discard()
+
+    def close(self, discard=False):
+        """Stop journaling; logs stay on disk until everything in them has been saved"""
+        self.flush()
+        self.closed = True
+        if discard or not (self.dirty or self.saving):
+            self.discard()
+
+    def discard(self):
+        self.pending = []
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
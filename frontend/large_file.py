@@ -0,0 +1,199 @@
+# large_file.py
+import codecs
+import io
+import mmap
+import os
+import re
+from array import array
+import tkinter as tk
+from document import DOCUMENT_MAGIC, END_OF_HEADER, decode_document
+
+# Files above this size are inserted chunk by chunk from idle callbacks
+STREAM_THRESHOLD = 1 * 1024 * 1024
+# Files above this size are shown read-only through a window of lines
+WINDOWED_THRESHOLD = 32 * 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+# Lines kept in the Text widget in windowed mode, and how close to either
+# edge of that window the view may get before it is shifted
+WINDOW_LINES = 3000
+WINDOW_EDGE = 0.15
+INDEX_CHUNK_SIZE = 4 * 1024 * 1024
+
+def read_markup(f):
+    """Read a document header from a binary file; returns (tags, embeds, styles) or None"""
+    first = f.readline()
+    if first.rstrip(b'\r\n') != DOCUMENT_MAGIC.encode('ascii'):
+        f.seek(0)
+        return None
+    header = [first.decode('utf-8').rstrip('\r\n')]
+    for line in f:
+        line = line.decode('utf-8').rstrip('\r\n')
+        header.append(line)
+        if line == END_OF_HEADER:
+            break
+    text, tags, embeds, styles = decode_document('\n'.join(header) + '\n')
+    return tags, embeds, styles
+
+class ChunkedLoader:
+    """Inserts a file into an editor a chunk per idle callback, reporting progress"""
+
+    def __init__(self, editor, path, on_done=None):
+        self.editor = editor
+        self.on_done = on_done
+        self.cancelled = False
+        self.f = open(path, 'rb')
+        self.size = max(os.fstat(self.f.fileno()).st_size, 1)
+        self.markup = read_markup(self.f)
+        self.decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(errors='replace'), translate=True)
+        editor.show_progress(f"Loading {os.path.basename(path)}", 0.0)
+        editor.text_area.after_idle(self.step)
+
+    def cancel(self):
+        self.cancelled = True
+        self.f.close()
+
+    def step(self):
+        if self.cancelled:
+            return
+        try:
+            data = self.f.read(CHUNK_SIZE)
+            text = self.decoder.decode(data, final=not data)
+            if text:
+                self.editor.text_area.insert('end-1c', text)
+        except (OSError, tk.TclError):
+            self.cancel()
+            return
+        if data:
+            self.editor.show_progress(None, self.f.tell() / self.size)
+            self.editor.text_area.after_idle(self.step)
+            return
+        self.f.close()
+        if self.markup:
+            self.editor.apply_markup(*self.markup)
+        self.editor.hide_progress()
+        if self.on_done:
+            self.on_done()
+
+class WindowedView:
+    """Read-only view of a huge file; only the lines around the viewport live in the Text widget"""
+
+    def __init__(self, editor, path):
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.f = open(path, 'rb')
+        self.size = os.fstat(self.f.fileno()).st_size
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        read_markup(self.f)  # formatting is not shown in windowed mode, only skipped
+        # Byte offset of the start of every line, filled in by idle-time indexing
+        self.offsets = array('Q', [self.f.tell()])
+        self.index_position = self.f.tell()
+        self.indexed = False
+        self.top = 0          # file line shown on the first line of the widget
+        self.shown = 0        # number of file lines currently in the widget
+        self.shifting = False
+        self.shift_pending = False
+
+        self.scrollbar = tk.Scrollbar(editor.root, orient='vertical', command=self.on_scrollbar,
+                                      bg='#222222', troughcolor='#333333')
+        self.scrollbar.pack(side='right', fill='y', before=self.text_area)
+        editor.scroll_listeners.append(self.on_text_scroll)
+        editor.show_progress(f"Indexing {os.path.basename(path)}", 0.0)
+        self.index_step()
+
+    @property
+    def line_count(self):
+        return len(self.offsets) if self.indexed else len(self.offsets) - 1
+
+    def index_step(self):
+        """Record line offsets for the next slice of the file, then yield to the UI"""
+        if self.mm.closed:
+            return
+        start = self.index_position
+        end = min(start + INDEX_CHUNK_SIZE, self.size)
+        self.offsets.extend(m.end() + start for m in re.finditer(b'\n', self.mm[start:end]))
+        self.index_position = end
+        if end >= self.size:
+            if self.offsets[-1] == self.size:
+                self.offsets.pop()  # trailing newline does not start another line
+            self.indexed = True
+            self.editor.hide_progress()
+        else:
+            self.editor.show_progress(None, end / max(self.size, 1))
+            self.text_area.after_idle(self.index_step)
+        if self.shown < WINDOW_LINES and self.line_count > self.shown:
+            self.load_window(self.top)
+        self.update_scrollbar()
+
+    def line_text(self, first, last):
+        start = self.offsets[first]
+        end = self.offsets[last] if last < len(self.offsets) else self.size
+        return self.mm[start:end].decode('utf-8', errors='replace').replace('\r\n', '\n')
+
+    def load_window(self, top, keep_line=None):
+        """Fill the widget with WINDOW_LINES lines starting at file line top"""
+        count = self.line_count
+        top = max(0, min(top, count - WINDOW_LINES))
+        last = min(count, top + WINDOW_LINES)
+        self.shifting = True
+        text_area = self.text_area
+        text_area.configure(state='normal')
+        text_area.delete('1.0', 'end')
+        text_area.insert('1.0', self.line_text(top, last).rstrip('\n'))
+        text_area.configure(state='disabled')
+        text_area.edit_modified(False)
+        self.top, self.shown = top, last - top
+        if keep_line is not None:
+            text_area.yview(f"{keep_line - top + 1}.0")
+        self.shifting = False
+        self.update_scrollbar()
+
+    def first_visible_line(self):
+        return self.top + int(self.text_area.index('@0,0').split('.')[0]) - 1
+
+    def on_text_scroll(self, first, last):
+        """Shift the window once the view gets close to one of its edges"""
+        if self.shifting or not self.shown:
+            return
+        first, last = float(first), float(last)
+        near_top = first < WINDOW_EDGE and self.top > 0
+        near_bottom = last > 1 - WINDOW_EDGE and self.top + self.shown < self.line_count
+        if near_top or near_bottom:
+            if not self.shift_pending:
+                self.shift_pending = True
+                self.text_area.after_idle(self.shift_window)
+        else:
+            self.update_scrollbar()
+
+    def shift_window(self):
+        self.shift_pending = False
+        if self.mm.closed:
+            return
+        line = self.first_visible_line()
+        self.load_window(line - WINDOW_LINES // 2, keep_line=line)
+
+    def update_scrollbar(self):
+        count = max(self.line_count, 1)
+        try:
+            first = self.first_visible_line()
+            last = self.top + int(self.text_area.index(f"@0,{self.text_area.winfo_height()}").split('.')[0])
+        except tk.TclError:
+            return
+        self.scrollbar.set(first / count, min(last / count, 1.0))
+
+    def on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            line = int(float(args[1]) * self.line_count)
+            margin = int(WINDOW_LINES * WINDOW_EDGE)
+            if self.top + margin <= line < self.top + self.shown - margin or (self.top == 0 and line < self.shown):
+                self.text_area.yview(f"{line - self.top + 1}.0")
+            else:
+                self.load_window(line - WINDOW_LINES // 2, keep_line=line)
+        else:
+            self.text_area.yview(*args)
+
+    def close(self):
+        self.mm.close()
+        self.f.close()
+        self.scrollbar.destroy()
+        if self.on_text_scroll in self.editor.scroll_listeners:
+            self.editor.scroll_listeners.remove(self.on_text_scroll)
@@ -1,14 +1,26 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog, messagebox
+import json
 import math
-from project_manager import create_project_manager  # <-- Import the function
+import os
+import uuid
+from project_manager import create_project_manager, page_entries  # <-- Import the function
+from search_index import search_index
+from search_panel import SearchPanel
+from quick_open import QuickOpen, name_index
+from page_store import page_store, page_ids
+from diary_panel import DiaryPanel
+from backup import BACKUP_SUFFIX, write_backup, restore_backup, read_manifest, last_backup, backed_up_pages
+from autosave import page_writer
+from workers import WorkerPool
 
 class EditableLabel:
     """Custom editable label that switches to entry on click"""
     
-    def __init__(self, parent, text, font, fg='white', bg='#3a3a3a'):
+    def __init__(self, parent, text, font, fg='white', bg='#3a3a3a', on_change=None):
         self.parent = parent
         self.text = text
+        self.on_change = on_change
         self.font = font
         self.fg = fg
         self.bg = bg
@@ -57,8 +69,11 @@ class EditableLabel:
             
         new_text = self.entry.get().strip()
         if new_text:
+            changed = new_text != self.text
             self.text = new_text
             self.label.config(text=new_text)
+            if changed and self.on_change:
+                self.on_change(new_text)
         
         self.entry.destroy()
         self.label.pack(fill='both', expand=True)
@@ -81,10 +96,17 @@ class EditableLabel:
         """Get current text"""
         return self.text
 
+    def set_text(self, text):
+        """Replace the text, e.g. when a project is restored"""
+        self.cancel_edit()
+        self.text = text
+        self.label.config(text=text)
+
 class ProjectCard:
     """Draggable project card with editable content"""
     
-    def __init__(self, dashboard, title="New Project", description="Click to edit description"):
+    def __init__(self, dashboard, title="New Project", description="Click to edit description",
+                 project_id=None, project_data=None):
         self.dashboard = dashboard
         self.is_dragging = False
         self.drag_start_x = 0
@@ -92,7 +114,9 @@ class ProjectCard:
         self.original_index = 0
         self.current_index = 0
 
-        self.project_data = {}  # Unique project data for this card
+        self.project_data = project_data if project_data is not None else {}  # Unique project data for this card
+        self.project_id = project_id or uuid.uuid4().hex  # Ties search results to this card
+        self.manager = None  # Open project manager, if any
 
         # Create card frame with rounded appearance
         self.frame = tk.Frame(
@@ -130,7 +154,7 @@ class ProjectCard:
         self.title_editor = EditableLabel(
             self.title_container, title, 
             font=('Segoe UI', 12, 'bold'), 
-            fg='white', bg='#3a3a3a'
+            fg='white', bg='#3a3a3a', on_change=lambda text: self.dashboard.index_card(self)
         )
         self.title_editor.pack(fill='both', expand=True)
         
@@ -138,7 +162,7 @@ class ProjectCard:
         self.desc_editor = EditableLabel(
             self.desc_container, description,
             font=('Segoe UI', 9),
-            fg='#cccccc', bg='#3a3a3a'
+            fg='#cccccc', bg='#3a3a3a', on_change=lambda text: self.dashboard.index_card(self)
         )
         self.desc_editor.pack(fill='both', expand=True)
         
@@ -183,11 +207,16 @@ class ProjectCard:
         self.original_index = self.dashboard.get_card_index(self)
         
     def open_project_manager(self):
-        """Open the project manager UI for this card in a new window"""
+        """Open the project manager UI for this card in a new window, or raise the one already open"""
+        if self.manager is not None and self.manager.root.winfo_exists():
+            self.manager.root.winfo_toplevel().lift()
+            return self.manager
         win = tk.Toplevel(self.dashboard.root)
         win.title(f"Project Manager - {self.get_title()}")
         win.geometry("900x600")
-        create_project_manager(win, self.project_data)
+        frame = create_project_manager(win, self.project_data, self.get_title(), self.project_id)
+        self.manager = frame.project_manager
+        return self.manager
 
     def on_title_click(self, event):
         """Handle title click for editing"""
@@ -326,6 +355,13 @@ class ProjectDashboard:
         self.root = tk.Tk()
         self.cards = []
         self.selected_card = None
+        self.indexer = WorkerPool(self.root, threads=1, name='card-index')
+        # Cards only live for this session; forget the cards and pages indexed by earlier runs,
+        # whose projects can never be opened again
+        self.indexer.submit(search_index.remove_kind, 'card')
+        self.indexer.submit(search_index.remove_kind, 'page')
+        self.backups = WorkerPool(self.root, threads=1, name='backup')
+        self.diary = None  # DiaryPanel while one is open
         
         self.setup_window()
         self.create_sidebar()
@@ -338,6 +374,16 @@ class ProjectDashboard:
         self.root.geometry("1200x700")
         self.root.configure(bg='#1a1a1a')
         self.root.minsize(900, 600)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+    def on_close(self):
+        """Save open pages and the open diary entry before quitting; writer threads die with the app"""
+        for card in self.cards:
+            if card.manager is not None and card.manager.root.winfo_exists():
+                card.manager.on_close()
+        if self.diary is not None and self.diary.win.winfo_exists():
+            self.diary.close()
+        self.root.destroy()
         
     def create_sidebar(self):
         """Create left sidebar with controls"""
@@ -375,7 +421,36 @@ class ProjectDashboard:
             command=self.delete_selected_project,
             state='disabled', **btn_style
         )
-        self.delete_btn.pack(pady=(0, 20))
+        self.delete_btn.pack(pady=(0, 10))
+        
+        # Search button
+        self.search_btn = tk.Button(
+            self.sidebar, text="🔍 Search",
+            command=self.open_search, **btn_style
+        )
+        self.search_btn.pack(pady=(0, 10))
+        
+        # Diary button
+        self.diary_btn = tk.Button(
+            self.sidebar, text="📔 Diary",
+            command=self.open_diary, **btn_style
+        )
+        self.diary_btn.pack(pady=(0, 10))
+        
+        # Backup / restore buttons
+        self.backup_btn = tk.Button(
+            self.sidebar, text="💾 Backup",
+            command=self.backup_workspace, **btn_style
+        )
+        self.backup_btn.pack(pady=(0, 10))
+        self.restore_btn = tk.Button(
+            self.sidebar, text="📥 Restore",
+            command=self.restore_workspace, **btn_style
+        )
+        self.restore_btn.pack(pady=(0, 20))
+        self.root.bind('<Control-F>', lambda e: self.open_search())
+        # From every window of the app, project managers included
+        self.root.bind_all('<Control-p>', self.open_quick_open)
         
         # Info label
         self.info_label = tk.Label(
@@ -409,21 +484,180 @@ class ProjectDashboard:
         """Add a new empty project card"""
         self.add_card("New Project", "Click to edit description")
         
-    def add_card(self, title="New Project", description="Click to edit"):
+    def add_card(self, title="New Project", description="Click to edit", project_id=None, project_data=None):
         """Add a card to the dashboard"""
-        card = ProjectCard(self, title, description)
+        card = ProjectCard(self, title, description, project_id, project_data)
         self.cards.append(card)
+        self.index_card(card)
         self.arrange_cards()
         
     def delete_selected_project(self):
         """Delete the currently selected card"""
         if self.selected_card and self.selected_card in self.cards:
+            self.indexer.submit(search_index.remove, 'card:' + self.selected_card.project_id)
+            self.indexer.submit(search_index.remove_project, self.selected_card.project_id)
+            name_index.remove_project(self.selected_card.project_id)
+            self.remove_pages(self.selected_card)
             self.selected_card.destroy()
             self.cards.remove(self.selected_card)
             self.selected_card = None
             self.update_selection_ui()
             self.arrange_cards()
     
+    def remove_pages(self, card):
+        """Delete the page bodies of a removed project, then bodies nothing can reach anymore.
+
+        Cards are not kept between runs, so a body is only kept if an open
+        project or the last backup refers to it, or it changed recently and
+        may belong to another window sharing the workspace.
+        """
+        if card.manager is not None and card.manager.root.winfo_exists():
+            card.manager.on_close()
+        removed = list(page_ids(card.project_data))
+        live = {page_id for other in self.cards if other is not card for page_id in page_ids(other.project_data)}
+        def remove():
+            for page_id in removed:
+                page_store.remove(page_id)
+            backed_up = backed_up_pages()
+            if backed_up is None:
+                return 0  # the last backup is unreadable: nothing is known to be unreachable
+            return page_store.collect(live | backed_up)
+        # On the page writer, behind every save still queued
+        page_writer(self.root).submit(remove)
+
+    def open_diary(self):
+        """Open the diary window, or raise the one already open"""
+        if self.diary is not None and self.diary.win.winfo_exists():
+            self.diary.win.lift()
+            return
+        self.diary = DiaryPanel(self.root)
+
+    def backup_workspace(self):
+        """Write every project, its pages and media, and the diary to one archive"""
+        path = filedialog.asksaveasfilename(parent=self.root, defaultextension=BACKUP_SUFFIX,
+                                            filetypes=[("Tarizz backups", f"*{BACKUP_SUFFIX}")])
+        if not path:
+            return
+        incremental = False
+        previous = last_backup()
+        if previous and os.path.abspath(previous) != os.path.abspath(path):
+            incremental = messagebox.askyesnocancel(
+                "Backup", f"Only store what changed since '{os.path.basename(previous)}'?\n"
+                          "Restoring will then also need that archive (and the ones before it) in the same folder.",
+                parent=self.root)
+            if incremental is None:
+                return
+        for card in self.cards:
+            if card.manager is not None and card.manager.root.winfo_exists():
+                card.manager.autosaver.flush()
+        # Copies, so editing can go on while the archive is written
+        cards = [{'project_id': card.project_id, 'title': card.get_title(), 'description': card.get_description(),
+                  'project_data': json.loads(json.dumps(card.project_data))} for card in self.cards]
+        self.info_label.config(text="Backing up…")
+        self.backups.submit(write_backup, path, cards, incremental,
+                            callback=lambda result: self.info_label.config(
+                                text=f"Backed up {len(cards)} projects ({result[1]} files stored)"),
+                            errback=lambda e: messagebox.showerror("Backup failed", str(e), parent=self.root))
+
+    def restore_workspace(self):
+        """Restore everything from an archive, or pick one project to restore"""
+        path = filedialog.askopenfilename(parent=self.root, filetypes=[("Tarizz backups", f"*{BACKUP_SUFFIX}")])
+        if not path:
+            return
+        try:
+            manifest = read_manifest(path)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Restore failed", f"Not a readable backup:\n{e}", parent=self.root)
+            return
+        picker = tk.Toplevel(self.root)
+        picker.title("Restore")
+        picker.configure(bg='#2a2a2a')
+        picker.transient(self.root)
+        tk.Label(picker, text="Restore everything, or a single project:", bg='#2a2a2a', fg='white',
+                 font=('Segoe UI', 10)).pack(padx=12, pady=(12, 6), anchor='w')
+        listbox = tk.Listbox(picker, width=50, height=12, bg='#1a1a1a', fg='#cccccc', relief='flat',
+                             selectbackground='#0078d4', highlightthickness=0, activestyle='none')
+        listbox.pack(padx=12, fill='both', expand=True)
+        listbox.insert('end', "Everything")
+        for project in manifest['projects']:
+            listbox.insert('end', f"{project['title']}   ({project['pages']} pages)")
+        listbox.selection_set(0)
+
+        def start():
+            selection = listbox.curselection()
+            picker.destroy()
+            if not selection:
+                return
+            ids = None if selection[0] == 0 else [manifest['projects'][selection[0] - 1]['project_id']]
+            for card in self.cards:
+                # Open editors would write over the restored pages
+                if (ids is None or card.project_id in ids) and card.manager is not None \
+                        and card.manager.root.winfo_exists():
+                    card.manager.on_close()
+            self.info_label.config(text="Restoring…")
+            self.backups.submit(restore_backup, path, ids, callback=self.restored,
+                                errback=lambda e: messagebox.showerror("Restore failed", str(e), parent=self.root))
+
+        tk.Button(picker, text="Restore", command=start, bg='#404040', fg='white', relief='flat',
+                  activebackground='#505050', activeforeground='white', padx=20, pady=6).pack(pady=12)
+        listbox.bind('<Double-Button-1>', lambda e: start())
+
+    def restored(self, cards):
+        """Put restored projects on the dashboard, replacing projects that are still here"""
+        for restored in cards:
+            card = next((c for c in self.cards if c.project_id == restored['project_id']), None)
+            if card is None:
+                self.add_card(restored['title'], restored['description'],
+                              restored['project_id'], restored['project_data'])
+                card = self.cards[-1]
+            else:
+                card.title_editor.set_text(restored['title'])
+                card.desc_editor.set_text(restored['description'])
+                card.project_data.clear()
+                card.project_data.update(restored['project_data'])
+                name_index.remove_project(card.project_id)
+                self.indexer.submit(search_index.remove_project, card.project_id)
+                self.index_card(card)
+            # Quick open and search learn the restored folders and pages without opening the project
+            name_index.add_tree(card.project_id, (), card.project_data)
+            self.indexer.submit(search_index.index_pages,
+                                list(page_entries(card.get_title(), card.project_id, card.project_data)))
+        self.info_label.config(text=f"Restored {len(cards)} project{'s' if len(cards) != 1 else ''}")
+
+    def index_card(self, card):
+        """Put a card's title and description in the search index and its title in quick open"""
+        name_index.set_project(card.project_id, card.get_title())
+        self.indexer.submit(search_index.update, 'card:' + card.project_id, 'card',
+                            card.get_title(), card.get_description(), "Dashboard", card.project_id)
+        
+    def open_search(self):
+        """Search every project's cards and pages"""
+        SearchPanel(self.root, self.open_result)
+        
+    def open_result(self, result):
+        """Select the card of a search result and open the page it points at"""
+        card = next((c for c in self.cards if c.project_id == result.project), None)
+        if card is None:
+            return  # project was deleted, or belongs to an earlier session
+        self.select_card(card)
+        if result.kind == 'page':
+            card.open_project_manager().reveal_path(result.target)
+        
+    def open_quick_open(self, event=None):
+        """Jump to any project, folder, page or flowchart by typing part of its name"""
+        parent = event.widget.winfo_toplevel() if event is not None else self.root
+        QuickOpen(parent, self.open_quick_result)
+        return "break"
+        
+    def open_quick_result(self, result):
+        card = next((c for c in self.cards if c.project_id == result.project), None)
+        if card is None:
+            return
+        self.select_card(card)
+        manager = card.open_project_manager()
+        if result.names:
+            manager.reveal_path(result.names)
+        
     def get_columns(self):
         """Calculate number of columns based on canvas width"""
         canvas_width = self.canvas_frame.winfo_width()
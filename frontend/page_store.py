@@ -0,0 +1,118 @@
+# page_store.py
+import os
+import re
+import tempfile
+import time
+import uuid
+from asset_store import copy_file
+from workspace import workspace_dir
+
+PAGE_SUFFIX = '.tdoc'
+# Hex digits of the id naming the shard directory: 256 shards keep 100k pages at ~400 files each
+SHARD_CHARS = 2
+# Unreferenced bodies younger than this survive collection: they may belong
+# to another window sharing the workspace that has not saved its tree anywhere
+GC_GRACE_SECONDS = 24 * 60 * 60
+PAGE_ID = re.compile(r'[0-9a-f]{32}')
+
+def new_page_id():
+    return uuid.uuid4().hex
+
+def is_page_id(value):
+    return isinstance(value, str) and PAGE_ID.fullmatch(value) is not None
+
+def assign_page_ids(data):
+    """Give every page of a project_data dict that has no body yet (None) a fresh id"""
+    stack = [data]
+    while stack:
+        folder = stack.pop()
+        for name, value in folder.items():
+            if isinstance(value, dict):
+                stack.append(value)
+            elif value is None:
+                folder[name] = new_page_id()
+
+def page_ids(data):
+    """Ids of every page in a project_data dict and below"""
+    stack = [data]
+    while stack:
+        for value in stack.pop().values():
+            if isinstance(value, dict):
+                stack.append(value)
+            elif is_page_id(value):
+                yield value
+
+class PageStore:
+    """Page bodies keyed by stable ids, in directories sharded by the id's first hex digits.
+
+    project_data holds a page's id rather than a file name, so pages with
+    the same title never collide and renaming or moving a page only changes
+    the tree. Ids are random, which spreads pages evenly over the shards and
+    keeps every directory small however many pages there are.
+    """
+
+    def __init__(self, root=None):
+        self.root = root
+
+    def directory(self):
+        if self.root is None:
+            self.root = workspace_dir('pages')
+        return self.root
+
+    def path(self, page_id):
+        return os.path.join(self.directory(), page_id[:SHARD_CHARS], page_id + PAGE_SUFFIX)
+
+    def resolve(self, value):
+        """File of a page value: the body of an id, or the file itself for pages saved by older versions"""
+        return self.path(value) if is_page_id(value) else value
+
+    def adopt(self, path):
+        """Move a page saved under its title (path, possibly None or missing) into the store; returns its id"""
+        page_id = new_page_id()
+        if path and os.path.exists(path):
+            target = self.path(page_id)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+            os.close(fd)
+            try:
+                copy_file(path, tmp_path)
+                os.replace(tmp_path, target)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        return page_id
+
+    def remove(self, page_id):
+        try:
+            os.remove(self.path(page_id))
+        except FileNotFoundError:
+            pass
+
+    def stored(self):
+        """(id, mtime) of every body in the store"""
+        root = self.directory()
+        if not os.path.isdir(root):
+            return
+        for shard in os.scandir(root):
+            if not shard.is_dir() or len(shard.name) != SHARD_CHARS:
+                continue
+            for entry in os.scandir(shard.path):
+                page_id = entry.name[:-len(PAGE_SUFFIX)]
+                if entry.name.endswith(PAGE_SUFFIX) and is_page_id(page_id):
+                    yield page_id, entry.stat().st_mtime
+
+    def collect(self, keep_ids, grace=GC_GRACE_SECONDS):
+        """Delete bodies not in keep_ids and untouched for grace seconds; for the page writer thread.
+
+        keep_ids has to hold every page of every open project and of the
+        last backup. Returns how many bodies went.
+        """
+        cutoff = time.time() - grace
+        removed = 0
+        for page_id, mtime in list(self.stored()):
+            if page_id not in keep_ids and mtime < cutoff:
+                self.remove(page_id)
+                removed += 1
+        return removed
+
+page_store = PageStore()
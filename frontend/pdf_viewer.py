@@ -0,0 +1,277 @@
+# pdf_viewer.py
+import bisect
+import math
+import os
+import tkinter as tk
+from collections import OrderedDict
+import fitz
+from PIL import Image, ImageTk
+from thumbnails import pdf_lock
+from workers import WorkerPool
+
+# Square tiles, in screen pixels at the current zoom, that pages are rendered in
+TILE_SIZE = 512
+PAGE_GAP = 12
+PAGE_MARGIN = 16
+# Rendered tiles kept across scrolling and zoom changes, per viewer
+TILE_CACHE_BYTES = 160 * 1024 * 1024
+# Tiles rendered ahead above and below the viewport, in screen pixels
+PREFETCH_PIXELS = 600
+ZOOM_STEP = 1.25
+MIN_ZOOM, MAX_ZOOM = 0.1, 8.0
+
+class TileCache:
+    """LRU of rendered tiles (PIL images) bounded by their pixel memory"""
+
+    def __init__(self, max_bytes=TILE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        img = self.entries.get(key)
+        if img is not None:
+            self.entries.move_to_end(key)
+        return img
+
+    def put(self, key, img):
+        if key in self.entries:
+            self.total -= self.size_of(self.entries.pop(key))
+        self.entries[key] = img
+        self.total += self.size_of(img)
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            self.total -= self.size_of(self.entries.popitem(last=False)[1])
+
+    @staticmethod
+    def size_of(img):
+        return img.width * img.height * 3
+
+class PdfDocument:
+    """A fitz document used only from the viewer's render thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self.doc = None
+
+    def open(self):
+        """Page rectangles, in points; the lock is released between pages so
+        thumbnails and extraction are not stuck behind a long document"""
+        with pdf_lock:
+            self.doc = fitz.open(self.path)
+            count = self.doc.page_count
+        rects = []
+        for i in range(count):
+            with pdf_lock:
+                rects.append(tuple(self.doc.load_page(i).rect))
+        return rects
+
+    def render_tile(self, page_number, zoom, tx, ty):
+        with pdf_lock:
+            page = self.doc.load_page(page_number)
+            rect = page.rect
+            x0 = rect.x0 + tx * TILE_SIZE / zoom
+            y0 = rect.y0 + ty * TILE_SIZE / zoom
+            clip = fitz.Rect(x0, y0, min(x0 + TILE_SIZE / zoom, rect.x1), min(y0 + TILE_SIZE / zoom, rect.y1))
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+            return Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+
+    def close(self):
+        with pdf_lock:
+            if self.doc is not None:
+                self.doc.close()
+
+class PdfViewer:
+    """Scrollable viewer that renders only the tiles of pages near the viewport, in the background"""
+
+    def __init__(self, parent, path, open_external=None):
+        self.path = path
+        self.win = tk.Toplevel(parent)
+        self.win.title(f"PDF Viewer - {os.path.basename(path)}")
+        self.win.geometry("1000x900")
+        self.win.configure(bg='#1a1a1a')
+
+        toolbar = tk.Frame(self.win, bg='#222222')
+        toolbar.pack(side='top', fill='x')
+        button = dict(bg='#222222', fg='#00bfff', relief='flat', font=('Segoe UI', 10), cursor='hand2')
+        tk.Button(toolbar, text="−", command=lambda: self.set_zoom(self.zoom / ZOOM_STEP), **button).pack(side='left', padx=2)
+        tk.Button(toolbar, text="+", command=lambda: self.set_zoom(self.zoom * ZOOM_STEP), **button).pack(side='left', padx=2)
+        tk.Button(toolbar, text="Fit width", command=self.fit_width, **button).pack(side='left', padx=2)
+        self.page_label = tk.Label(toolbar, text="Loading…", bg='#222222', fg='#cccccc', font=('Segoe UI', 9))
+        self.page_label.pack(side='left', padx=10)
+        if open_external:
+            tk.Button(toolbar, text="Open externally", command=lambda: open_external(path),
+                      **button).pack(side='right', padx=4)
+
+        self.canvas = tk.Canvas(self.win, bg='#1a1a1a', highlightthickness=0)
+        scrollbar = tk.Scrollbar(self.win, orient='vertical', command=self.canvas.yview,
+                                 bg='#222222', troughcolor='#333333')
+        hscrollbar = tk.Scrollbar(self.win, orient='horizontal', command=self.canvas.xview,
+                                  bg='#222222', troughcolor='#333333')
+        self.canvas.configure(yscrollcommand=lambda *a: (scrollbar.set(*a), self.schedule_update()),
+                              xscrollcommand=lambda *a: (hscrollbar.set(*a), self.schedule_update()))
+        scrollbar.pack(side='right', fill='y')
+        hscrollbar.pack(side='bottom', fill='x')
+        self.canvas.pack(side='left', fill='both', expand=True)
+
+        self.pages = []        # (x0, y0, x1, y1) in points per page
+        self.offsets = []      # canvas y of every page top at the current zoom
+        self.zoom = None
+        self.width = 0
+        self.tiles = TileCache()
+        self.shown = {}        # (page, tx, ty) -> (canvas item, PhotoImage) at the current zoom
+        self.jobs = {}         # (page, zoom, tx, ty) -> render job
+        self.update_pending = None
+
+        self.canvas.bind('<Configure>', lambda e: self.schedule_update())
+        self.canvas.bind('<MouseWheel>', self.on_wheel)
+        self.canvas.bind('<Button-4>', lambda e: self.canvas.yview_scroll(-3, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self.canvas.yview_scroll(3, 'units'))
+        self.canvas.bind('<Control-MouseWheel>', lambda e: self.set_zoom(self.zoom * (ZOOM_STEP if e.delta > 0 else 1 / ZOOM_STEP)))
+        self.win.bind('<Prior>', lambda e: self.canvas.yview_scroll(-1, 'pages'))
+        self.win.bind('<Next>', lambda e: self.canvas.yview_scroll(1, 'pages'))
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        # One thread: it owns the fitz document, so pages load in order and never concurrently
+        self.document = PdfDocument(path)
+        self.renderer = WorkerPool(self.win, threads=1, name='pdf-render')
+        self.renderer.submit(self.document.open, callback=self.on_open,
+                             errback=lambda e: self.page_label.config(text=f"Could not open PDF: {e}"))
+
+    def on_open(self, pages):
+        self.pages = pages
+        if not pages:
+            self.page_label.config(text="Empty document")
+            return
+        self.fit_width()
+
+    def fit_width(self):
+        if not self.pages:
+            return
+        widest = max(x1 - x0 for x0, y0, x1, y1 in self.pages)
+        self.set_zoom((max(self.canvas.winfo_width(), 200) - 2 * PAGE_MARGIN) / widest)
+
+    def set_zoom(self, zoom):
+        """Lay the pages out again at zoom, keeping the same relative scroll position"""
+        if not self.pages:
+            return
+        zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+        if zoom == self.zoom:
+            return
+        fraction = self.canvas.yview()[0]
+        self.zoom = zoom
+        self.offsets = []
+        y = PAGE_MARGIN
+        for x0, y0, x1, y1 in self.pages:
+            self.offsets.append(y)
+            y += math.ceil((y1 - y0) * zoom) + PAGE_GAP
+        self.width = max(math.ceil((x1 - x0) * zoom) for x0, y0, x1, y1 in self.pages) + 2 * PAGE_MARGIN
+        self.canvas.delete('all')
+        self.shown = {}
+        self.cancel_jobs(keep=set())
+        self.canvas.configure(scrollregion=(0, 0, self.width, y + PAGE_MARGIN))
+        self.canvas.yview_moveto(fraction)
+        self.schedule_update()
+
+    def page_size(self, number):
+        x0, y0, x1, y1 = self.pages[number]
+        return math.ceil((x1 - x0) * self.zoom), math.ceil((y1 - y0) * self.zoom)
+
+    def visible_pages(self, top, bottom):
+        """Page numbers overlapping the canvas y range, found by bisecting the page offsets"""
+        first = max(bisect.bisect_right(self.offsets, top) - 1, 0)
+        last = bisect.bisect_right(self.offsets, bottom)
+        return range(first, min(last, len(self.pages)))
+
+    def schedule_update(self):
+        if self.update_pending is None:
+            self.update_pending = self.win.after_idle(self.update_view)
+
+    def update_view(self):
+        """Show cached tiles near the viewport, queue renders for missing ones and drop the rest"""
+        self.update_pending = None
+        if not self.offsets:
+            return
+        canvas = self.canvas
+        top = canvas.canvasy(0) - PREFETCH_PIXELS
+        bottom = canvas.canvasy(canvas.winfo_height()) + PREFETCH_PIXELS
+        left = canvas.canvasx(0)
+        right = canvas.canvasx(canvas.winfo_width())
+        wanted = set()
+        jobs = set()
+        for number in self.visible_pages(top, bottom):
+            width, height = self.page_size(number)
+            page_x = (self.width - width) // 2
+            page_y = self.offsets[number]
+            if ('page', number) not in self.shown:
+                item = canvas.create_rectangle(page_x, page_y, page_x + width, page_y + height,
+                                               fill='#ffffff', outline='#444444')
+                canvas.tag_lower(item)
+                self.shown[('page', number)] = (item, None)
+            wanted.add(('page', number))
+            for ty in range(max(0, int((top - page_y) // TILE_SIZE)),
+                            min(math.ceil(height / TILE_SIZE), int((bottom - page_y) // TILE_SIZE) + 1)):
+                for tx in range(max(0, int((left - page_x) // TILE_SIZE)),
+                                min(math.ceil(width / TILE_SIZE), int((right - page_x) // TILE_SIZE) + 1)):
+                    key = (number, tx, ty)
+                    wanted.add(key)
+                    if key in self.shown:
+                        continue
+                    img = self.tiles.get((number, self.zoom, tx, ty))
+                    if img is not None:
+                        self.show_tile(key, img)
+                    else:
+                        jobs.add(self.request_tile(number, tx, ty))
+        for key in list(self.shown):
+            if key not in wanted:
+                canvas.delete(self.shown.pop(key)[0])
+        self.cancel_jobs(keep=jobs)
+        pages = self.visible_pages(canvas.canvasy(0), canvas.canvasy(canvas.winfo_height()))
+        if len(pages):
+            self.page_label.config(text=f"Page {pages[0] + 1} of {len(self.pages)}  ·  {round(self.zoom * 100)}%")
+
+    def request_tile(self, number, tx, ty):
+        job_key = (number, self.zoom, tx, ty)
+        if job_key not in self.jobs:
+            self.jobs[job_key] = self.renderer.submit(
+                self.document.render_tile, number, self.zoom, tx, ty,
+                callback=lambda img, k=job_key: self.on_rendered(k, img),
+                errback=lambda e, k=job_key: self.on_failed(k, e))
+        return job_key
+
+    def on_rendered(self, job_key, img):
+        self.jobs.pop(job_key, None)
+        self.tiles.put(job_key, img)
+        number, zoom, tx, ty = job_key
+        if zoom == self.zoom and (number, tx, ty) not in self.shown:
+            self.schedule_update()
+
+    def on_failed(self, job_key, error):
+        self.jobs.pop(job_key, None)
+        print(f"Could not render page {job_key[0] + 1}:", error)
+
+    def cancel_jobs(self, keep):
+        """Renders for tiles that scrolled away are not needed any more"""
+        for job_key in list(self.jobs):
+            if job_key not in keep:
+                self.jobs.pop(job_key).cancel()
+
+    def show_tile(self, key, img):
+        number, tx, ty = key
+        width, height = self.page_size(number)
+        x = (self.width - width) // 2 + tx * TILE_SIZE
+        y = self.offsets[number] + ty * TILE_SIZE
+        photo = ImageTk.PhotoImage(img, master=self.win)
+        item = self.canvas.create_image(x, y, image=photo, anchor='nw')
+        self.shown[key] = (item, photo)
+
+    def on_wheel(self, event):
+        self.canvas.yview_scroll(-1 if event.delta > 0 else 1, 'units')
+
+    def close(self):
+        if self.update_pending is not None:
+            self.win.after_cancel(self.update_pending)
+        self.cancel_jobs(keep=set())
+        # Closing the document is queued behind any render already running
+        self.renderer.submit(self.document.close)
+        self.renderer.shutdown(wait=False, cancel=False)
+        self.win.destroy()
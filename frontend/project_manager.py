@@ -2,30 +2,50 @@
 import tkinter as tk
 from tkinter import ttk, simpledialog, messagebox
 from simple_text_editor import create_text_editor
-import fitz
 import webbrowser
-import subprocess
-import os
-import platform
-import cv2
-from PIL import Image, ImageTk
-import shutil
-import io
+from collections import OrderedDict
 from flowchart import FlowchartEditor
-
-def open_file_with_default_app(filepath):
-    if platform.system() == "Windows":
-        os.startfile(filepath)
-    elif platform.system() == "Darwin":
-        os.system(f'open "{filepath}"')
-    else:
-        os.system(f'xdg-open "{filepath}"')
-
-def create_project_manager(parent, project_data=None):
+from autosave import Autosaver
+from journal import Journal, pending_edits, state_digest
+from document import decode_document
+from search_index import search_index, page_key
+from search_panel import SearchPanel
+from quick_open import name_index
+from history import page_history
+from history_panel import HistoryPanel
+from page_store import page_store, assign_page_ids, page_ids, is_page_id, new_page_id
+from workers import WorkerPool
+
+# Children are inserted into the tree lazily, this many per idle callback
+TREE_BATCH_SIZE = 200
+TREE_PLACEHOLDER = 'Loading…'
+# Recently visited pages are kept alive and just raised when revisited
+EDITOR_POOL_SIZE = 8
+
+def page_entry(project_name, project_id, folder_names, name, value):
+    """(path, title, location, project, target) of a page, as the search index takes it"""
+    path = page_store.resolve(value) or f"{name}.tdoc"
+    location = ' / '.join([project_name] + folder_names)
+    return path, name, location, project_id, folder_names + [name]
+
+def page_entries(project_name, project_id, data, folder_names=()):
+    """Search entries of every page (not flowchart) in a folder dict and below"""
+    stack = [(data, list(folder_names))]
+    while stack:
+        data, names = stack.pop()
+        for name, value in data.items():
+            if isinstance(value, dict):
+                stack.append((value, names + [name]))
+            elif value != "flowchart":
+                yield page_entry(project_name, project_id, names, name, value)
+
+def create_project_manager(parent, project_data=None, project_name="Projects", project_id=''):
     class ProjectManager:
         def __init__(self, parent, project_data):
             self.root = parent
             self.project_data = project_data if project_data is not None else {}
+            self.project_name = project_name
+            self.project_id = project_id
 
             # Sidebar
             self.sidebar = ttk.Frame(self.root, width=250)
@@ -46,6 +66,8 @@ def create_project_manager(parent, project_data=None):
             self.tree = ttk.Treeview(self.sidebar, style='Sidebar.Treeview', show='tree')
             self.tree.pack(fill='both', expand=True)
             self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
+            self.tree.bind("<<TreeviewOpen>>", self.on_tree_open)
+            self.tree.bind("<<TreeviewClose>>", self.on_tree_close)
 
             btn_style = {
                 'bg': '#222222',
@@ -69,15 +91,112 @@ def create_project_manager(parent, project_data=None):
             tk.Button(btn_frame, text="Add Flowchart", command=self.add_flowchart, **btn_style).pack(fill='x', pady=2)
             tk.Button(btn_frame, text="Rename", command=self.rename_item, **btn_style).pack(fill='x', pady=2)
             tk.Button(btn_frame, text="Delete", command=self.delete, **btn_style).pack(fill='x', pady=2)
+            tk.Button(btn_frame, text="🔍 Search", command=self.open_search, **btn_style).pack(fill='x', pady=2)
 
             # Editor container
             self.editor_container = ttk.Frame(self.root)
             self.editor_container.pack(side='left', fill='both', expand=True)
 
+            self.create_toolbar()
+            self.pages_container = tk.Frame(self.editor_container, bg='#222222')
+            self.pages_container.pack(side='top', fill='both', expand=True)
+            self.pages_container.grid_rowconfigure(0, weight=1)
+            self.pages_container.grid_columnconfigure(0, weight=1)
+
             self.current_editor = None
             self.current_editor_frame = None  # Track the editor frame
             self.current_page = None
+            # (id(folder_data), name) -> (frame, editor, page) in LRU order
+            self.editor_pool = OrderedDict()
+            self.autosaver = Autosaver(self.root)
+            # Pages are reindexed on the writer thread right after they are saved
+            self.autosaver.listeners.append(self.index_written)
+            # ...and every write becomes a version in the page's history
+            self.autosaver.listeners.append(page_history.record)
+            self.page_meta = {}      # saved page path -> (title, location, target), read by the writer thread
+            self.folder_paths = {}   # id(folder dict) -> names from the project root, rebuilt when folders change
+            self.indexer = WorkerPool(self.root, threads=1, name='search-index')
+            self.root.winfo_toplevel().protocol("WM_DELETE_WINDOW", self.on_close)
             self.root_node = self.tree.insert("", "end", text="Projects", open=True)
+            # Tree items whose children have been (or are being) inserted,
+            # mapped to the token of the batch run filling them
+            self.populated = {}
+            self.reveal_token = None   # newest reveal_path walk; older ones stop at their next step
+            assign_page_ids(self.project_data)
+            self.populate_node(self.root_node)
+            self.indexer.submit(search_index.index_pages, list(self.page_entries(self.project_data, [])))
+            name_index.add_tree(self.project_id, (), self.project_data)
+
+        def insert_node(self, parent_id, name, value, **kwargs):
+            """Insert one tree item; non-empty folders get a placeholder child until expanded."""
+            item_id = self.tree.insert(parent_id, "end", text=name, **kwargs)
+            if isinstance(value, dict):
+                if value:
+                    self.tree.insert(item_id, "end", text=TREE_PLACEHOLDER, tags=('placeholder',))
+                else:
+                    self.populated[item_id] = None
+            return item_id
+
+        def populate_node(self, item_id):
+            """Insert the children of a folder in batches spread across idle callbacks."""
+            if item_id in self.populated:
+                return
+            data = self.get_node_data(item_id)
+            if not isinstance(data, dict):
+                return
+            token = self.populated[item_id] = object()
+            if not data:
+                return
+            if not self.tree.get_children(item_id):
+                self.tree.insert(item_id, "end", text=TREE_PLACEHOLDER, tags=('placeholder',))
+            self.populate_batch(item_id, token, list(data), 0)
+
+        def populate_batch(self, item_id, token, names, start):
+            if not self.tree.exists(item_id) or self.populated.get(item_id) is not token:
+                return  # folder was collapsed or deleted meanwhile
+            data = self.get_node_data(item_id)
+            if data is None:
+                return
+            for name in names[start:start + TREE_BATCH_SIZE]:
+                if name in data:
+                    self.insert_node(item_id, name, data[name])
+            start += TREE_BATCH_SIZE
+            if start < len(names):
+                self.root.after_idle(lambda: self.populate_batch(item_id, token, names, start))
+            else:
+                for child in self.tree.get_children(item_id):
+                    if 'placeholder' in self.tree.item(child, 'tags'):
+                        self.tree.delete(child)
+
+        def on_tree_open(self, event):
+            self.populate_node(self.tree.focus())
+
+        def on_tree_close(self, event):
+            """Drop the children of a collapsed folder so memory follows what is expanded."""
+            item_id = self.tree.focus()
+            if item_id == self.root_node or item_id not in self.populated:
+                return
+            data = self.get_node_data(item_id)
+            if not data:
+                return  # empty folder, nothing to unload
+            self.forget_subtree(item_id)
+            self.tree.delete(*self.tree.get_children(item_id))
+            self.tree.insert(item_id, "end", text=TREE_PLACEHOLDER, tags=('placeholder',))
+
+        def forget_subtree(self, item_id):
+            stack = [item_id]
+            while stack:
+                node = stack.pop()
+                self.populated.pop(node, None)
+                stack.extend(self.tree.get_children(node))
+
+        def add_node(self, parent_id, name, value, **kwargs):
+            """Show a freshly added child, loading its parent first if it was never expanded."""
+            if parent_id in self.populated:
+                self.insert_node(parent_id, name, value, **kwargs)
+            else:
+                self.tree.item(parent_id, open=True)
+                self.populate_node(parent_id)
 
         def get_node_data(self, item_id):
             """Return the dict in project_data for the given tree item."""
@@ -105,7 +224,8 @@ def create_project_manager(parent, project_data=None):
             name = simpledialog.askstring("Folder Name","Enter folder name:")
             if name and name not in parent_data:
                 parent_data[name] = {}  # folder is a dict
-                self.tree.insert(parent_id, "end", text=name, open=True)
+                self.add_node(parent_id, name, parent_data[name], open=True)
+                name_index.add(self.project_id, self.folder_names(parent_data) + [name], 'folder')
 
         def add_subpage(self):
             selected = self.tree.selection()
@@ -119,8 +239,11 @@ def create_project_manager(parent, project_data=None):
                 if name in parent_data:
                     messagebox.showerror("Error", f"Subpage '{name}' already exists in this folder.")
                     return
-                parent_data[name] = None  # subpage is None or file path
-                self.tree.insert(parent_id, "end", text=name)
+                parent_data[name] = new_page_id()  # subpage is the id of its body in the page store
+                self.add_node(parent_id, name, parent_data[name])
+                name_index.add(self.project_id, self.folder_names(parent_data) + [name], 'page')
+                self.indexer.submit(search_index.index_pages,
+                                    list(self.page_entries({name: parent_data[name]}, self.folder_names(parent_data))))
 
         def add_flowchart(self):
             selected = self.tree.selection()
@@ -135,7 +258,8 @@ def create_project_manager(parent, project_data=None):
                     messagebox.showerror("Error", f"Flowchart '{name}' already exists in this folder.")
                     return
                 parent_data[name] = "flowchart"  # Flowchart is None or file path
-                self.tree.insert(parent_id, "end", text=name)
+                self.add_node(parent_id, name, "flowchart")
+                name_index.add(self.project_id, self.folder_names(parent_data) + [name], 'flowchart')
 
         def delete(self):
             selected = self.tree.selection()
@@ -145,7 +269,28 @@ def create_project_manager(parent, project_data=None):
             parent_id = self.tree.parent(item_id)
             parent_data = self.get_node_data(parent_id)
             if parent_data and item_text in parent_data:
-                del parent_data[item_text]
+                removed = parent_data.pop(item_text)
+                folders = [parent_data] if not isinstance(removed, dict) else [removed]
+                stack = [removed] if isinstance(removed, dict) else []
+                while stack:
+                    for child in stack.pop().values():
+                        if isinstance(child, dict):
+                            folders.append(child)
+                            stack.append(child)
+                self.drop_pooled(folders, None if isinstance(removed, dict) else item_text)
+                entries = self.page_entries({item_text: removed}, self.folder_names(parent_data))
+                keys = [page_key(path) for path, *meta in entries]
+                bodies = list(page_ids({item_text: removed}))
+                def forget():
+                    for key in keys:
+                        search_index.remove(key)
+                    for page_id in bodies:
+                        page_store.remove(page_id)
+                # On the page writer, so a save of these pages queued before this cannot bring them back
+                self.autosaver.writer.submit(forget)
+                name_index.remove_tree(self.project_id, self.folder_names(parent_data) + [item_text])
+                self.folder_paths.clear()
+            self.forget_subtree(item_id)
             self.tree.delete(item_id)
 
         # Inside your ProjectManager class, add this method:
@@ -168,8 +313,11 @@ def create_project_manager(parent, project_data=None):
                 messagebox.showerror("Error", f"An item named '{new_name}' already exists here.")
                 return
             
-            # Preserve existing value (subpage None, flowchart None, folder dict)
-            parent_data[new_name] = parent_data.pop(old_name)
+            # Preserve existing value (page id, flowchart, folder dict): a rename never touches page files
+            value = parent_data.pop(old_name)
+            parent_data[new_name] = value
+            self.rename_pooled(parent_data, old_name, new_name)
+            self.reindex_renamed(parent_data, old_name, new_name, value)
             
             # Update tree text
             self.tree.item(item_id, text=new_name)
@@ -179,6 +327,7 @@ def create_project_manager(parent, project_data=None):
             selected = self.tree.selection()
             if not selected: return
             item_id = selected[0]
+            if 'placeholder' in self.tree.item(item_id, 'tags'): return
             item_text = self.tree.item(item_id)['text']
             parent_id = self.tree.parent(item_id)
             parent_data = self.get_node_data(parent_id)
@@ -188,364 +337,328 @@ def create_project_manager(parent, project_data=None):
             if isinstance(node_data, dict):
                 return  # folder
             elif node_data == "flowchart":
-                self.open_flowchart_editor(item_text)  # pass the name
+                self.open_flowchart_editor(item_text, parent_data)  # pass the name
             else:
                 self.open_editor(parent_data, item_text)         
 
                 
-        def open_flowchart_editor(self, flowchart_data):
-            if self.current_editor_frame:
-                self.current_editor_frame.destroy()
-            self.current_editor_frame = ttk.Frame(self.editor_container)
-            self.current_editor_frame.pack(fill="both", expand=True)
-            self.current_editor = FlowchartEditor(self.current_editor_frame)
-            self.current_editor.pack(fill="both", expand=True)
+        def create_toolbar(self):
+            """Build the formatting toolbar once; its commands act on whichever editor is active."""
+            self.toolbar = tk.Frame(self.editor_container, bg='#222222')
 
-        def open_editor(self, folder_data, page):
-            # Ensure 'Projects' key exists in folder_data
-            if 'Projects' not in folder_data:
-                folder_data['Projects'] = {}
-
-            if page in folder_data:
-                file_path = folder_data[page]
-                if self.current_editor_frame:
-                    self.current_editor_frame.destroy()
-                    self.current_editor_frame = None
-                self.current_editor = None
-
-                frame = tk.Frame(self.editor_container, bg='#222222')
-                frame.pack(fill='both', expand=True)
-                self.current_editor_frame = frame
-
-                toolbar = tk.Frame(frame, bg='#222222')
-                toolbar.pack(fill='x', padx=8, pady=8, side='top')
+            btn_style = {
+                'bg': '#222222',
+                'fg': '#cccccc',
+                'activebackground': '#333333',
+                'activeforeground': '#ffffff',
+                'relief': 'flat',
+                'bd': 0,
+                'font': ('Segoe UI', 10),
+                'highlightthickness': 0,
+                'padx': 12,
+                'pady': 6,
+                'cursor': 'hand2'
+            }
 
-                editor = create_text_editor(parent=frame)
-                self.current_editor = editor
-
-
-
-                btn_style = {
-                    'bg': '#222222',
-                    'fg': '#cccccc',
-                    'activebackground': '#333333',
-                    'activeforeground': '#ffffff',
-                    'relief': 'flat',
-                    'bd': 0,
-                    'font': ('Segoe UI', 10),
-                    'highlightthickness': 0,
-                    'padx': 12,
-                    'pady': 6,
-                    'cursor': 'hand2'
-                }
-
-                heading_btn = tk.Button(toolbar, text="Heading", command=editor.make_heading, **btn_style)
-                heading_btn.pack(side='left', padx=(0, 4))
-                subheading_btn = tk.Button(toolbar, text="Subheading", command=editor.make_subheading, **btn_style)
-                subheading_btn.pack(side='left', padx=4)
-                normal_btn = tk.Button(toolbar, text="Normal", command=editor.make_normal, **btn_style)
-                normal_btn.pack(side='left', padx=4)
-
-                font_families = ['Consolas', 'Segoe UI', 'Arial', 'Courier', 'Times']
-                font_family_var = tk.StringVar(value='Consolas')
-                def on_font_family_change(value):
-                    editor.change_font(font_family=value, font_size=font_size_var.get())
-                font_family_menu = tk.OptionMenu(toolbar, font_family_var, *font_families, command=on_font_family_change)
-                font_family_menu.config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10), relief='flat', bd=0, highlightthickness=0, activebackground='#333333', activeforeground='#ffffff')
-                font_family_menu['menu'].config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10))
-                font_family_menu.pack(side='left', padx=4)
-
-                font_size_var = tk.IntVar(value=12)
-                def on_font_size_change(value):
-                    editor.change_font(font_family=font_family_var.get(), font_size=int(value))
-                font_size_menu = tk.OptionMenu(toolbar, font_size_var, *[10, 12, 14, 16, 18, 20, 24, 32 , 38, 42 , 47, 50], command=on_font_size_change)
-                font_size_menu.config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10), relief='flat', bd=0, highlightthickness=0, activebackground='#333333', activeforeground='#ffffff')
-                font_size_menu['menu'].config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10))
-                font_size_menu.pack(side='left', padx=4)
-
-                insert_img_btn = tk.Button(toolbar, text="Insert Image", command=editor.upload_image, **btn_style)
-                insert_img_btn.pack(side='left', padx=4)
-
-                def insert_video_embed():
-                    file_path = tk.filedialog.askopenfilename(
-                        filetypes=[("Video files", "*.mp4 *.avi *.mov *.mkv *.webm"), ("All files", "*.*")]
-                    )
-                    if file_path:
-                        # Try to get a thumbnail from the video
-                        try:
-                            cap = cv2.VideoCapture(file_path)
-                            ret, frame = cap.read()
-                            cap.release()
-                            if ret:
-                                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                                img = Image.fromarray(frame)
-                                img.thumbnail((360, 240))
-                                img_tk = ImageTk.PhotoImage(img)
-                            else:
-                                img_tk = None
-                        except Exception:
-                            img_tk = None
-
-                        # Create a frame for the embedded video widget
-                        video_frame = tk.Frame(editor.text_area, bg='#222222', bd=0)
-                        # Thumbnail or fallback
-                        if img_tk:
-                            thumb_label = tk.Label(video_frame, image=img_tk, bg='#222222')
-                            thumb_label.image = img_tk  # Keep reference
-                            thumb_label.pack(side='left')
-                        else:
-                            thumb_label = tk.Label(video_frame, text="No Preview", bg='#222222', fg='#cccccc', width=66, height=21)
-                            thumb_label.pack(side='left')
-
-                        # Play button
-                        play_btn = tk.Button(video_frame, text="▶ Play", bg='#00bfff', fg='white', relief='flat', font=('Segoe UI', 10, 'bold'), cursor='hand2')
-                        play_btn.pack(side='left', padx=8)
-
-                        # Download button
-                        download_btn = tk.Button(video_frame, text="⬇ Download", bg='#222222', fg='#00bfff', relief='flat', font=('Segoe UI', 10), cursor='hand2')
-                        download_btn.pack(side='left', padx=4)
-
-                        def play_video():
-                            # Open a simple player window using OpenCV
-                            win = tk.Toplevel(editor.text_area)
-                            win.title("Video Player")
-                            win.geometry("1920x800")
-                            label = tk.Label(win)
-                            label.pack(fill='both', expand=True)
-                            cap = cv2.VideoCapture(file_path)
-
-                            vid_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                            vid_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                            aspect_ratio = vid_width / vid_height
-
-                            target_width, target_height = 1920, 1800
-                            # Calculate new size keeping aspect ratio
-                            if target_width / target_height > aspect_ratio:
-                                # window is wider → fit by height
-                                new_height = target_height
-                                new_width = int(target_height * aspect_ratio)
-                            else:
-                                # window is taller → fit by width
-                                new_width = target_width
-                                new_height = int(target_width / aspect_ratio)                            
-                            def show_frame():
-                                ret, frame = cap.read()
-                                if ret:
-                                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                                    img = Image.fromarray(frame)
-                                    img = img.resize((new_width, new_height), Image.LANCZOS , Image.ANTIALIAS)
-                                    img_tk = ImageTk.PhotoImage(img)
-                                    label.imgtk = img_tk
-                                    label.config(image=img_tk)
-                                    win.after(30, show_frame)
-                                else:
-                                    cap.release()
-                            show_frame()
-                            win.protocol("WM_DELETE_WINDOW", lambda: (cap.release(), win.destroy()))
-
-                        def download_video():
-                            save_path = tk.filedialog.asksaveasfilename(defaultextension=".mp4", filetypes=[("Video files", "*.mp4 *.avi *.mov *.mkv *.webm"), ("All files", "*.*")])
-                            if save_path:
-                                shutil.copy(file_path, save_path)
-                                messagebox.showinfo("Download", f"Video saved to:\n{save_path}")
-
-                        play_btn.config(command=play_video)
-                        download_btn.config(command=download_video)
-
-                        editor.text_area.window_create(tk.INSERT, window=video_frame)
-
-                # Replace previous Insert Video button with embedded version
-                insert_video_btn = tk.Button(
-                    toolbar, text="Insert Video",
-                    command=insert_video_embed,
-                    **btn_style
-                )
-                insert_video_btn.pack(side='left', padx=4)
+            def editor_command(name, *args):
+                def command():
+                    if self.current_editor is not None:
+                        getattr(self.current_editor, name)(*args)
+                return command
+
+            heading_btn = tk.Button(self.toolbar, text="Heading", command=editor_command('make_heading'), **btn_style)
+            heading_btn.pack(side='left', padx=(0, 4))
+            subheading_btn = tk.Button(self.toolbar, text="Subheading", command=editor_command('make_subheading'), **btn_style)
+            subheading_btn.pack(side='left', padx=4)
+            normal_btn = tk.Button(self.toolbar, text="Normal", command=editor_command('make_normal'), **btn_style)
+            normal_btn.pack(side='left', padx=4)
+
+            font_families = ['Consolas', 'Segoe UI', 'Arial', 'Courier', 'Times']
+            self.font_family_var = tk.StringVar(value='Consolas')
+            self.font_size_var = tk.IntVar(value=12)
+            def on_font_family_change(value):
+                if self.current_editor is not None:
+                    self.current_editor.change_font(font_family=value, font_size=self.font_size_var.get())
+            font_family_menu = tk.OptionMenu(self.toolbar, self.font_family_var, *font_families, command=on_font_family_change)
+            font_family_menu.config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10), relief='flat', bd=0, highlightthickness=0, activebackground='#333333', activeforeground='#ffffff')
+            font_family_menu['menu'].config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10))
+            font_family_menu.pack(side='left', padx=4)
+
+            def on_font_size_change(value):
+                if self.current_editor is not None:
+                    self.current_editor.change_font(font_family=self.font_family_var.get(), font_size=int(value))
+            font_size_menu = tk.OptionMenu(self.toolbar, self.font_size_var, *[10, 12, 14, 16, 18, 20, 24, 32 , 38, 42 , 47, 50], command=on_font_size_change)
+            font_size_menu.config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10), relief='flat', bd=0, highlightthickness=0, activebackground='#333333', activeforeground='#ffffff')
+            font_size_menu['menu'].config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10))
+            font_size_menu.pack(side='left', padx=4)
+
+            insert_img_btn = tk.Button(self.toolbar, text="Insert Image", command=editor_command('upload_image'), **btn_style)
+            insert_img_btn.pack(side='left', padx=4)
+
+            insert_video_btn = tk.Button(self.toolbar, text="Insert Video", command=editor_command('insert_video_embed'), **btn_style)
+            insert_video_btn.pack(side='left', padx=4)
+
+            insert_pdf_btn = tk.Button(
+                self.toolbar, text="Insert PDF",
+                command=editor_command('insert_media', [("PDF files", "*.pdf"), ("All files", "*.*")], "📄 PDF"),
+                **btn_style
+            )
+            insert_pdf_btn.pack(side='left', padx=4)
+
+            insert_docs_btn = tk.Button(
+                self.toolbar, text="Insert Docs",
+                command=editor_command('insert_media', [("Word files", "*.doc *.docx"), ("All files", "*.*")], "📄 DOC"),
+                **btn_style
+            )
+            insert_docs_btn.pack(side='left', padx=4)
+
+            history_btn = tk.Button(self.toolbar, text="🕘 History", command=self.open_history, **btn_style)
+            history_btn.pack(side='left', padx=4)
+
+        def show_pooled(self, key, editor, show_toolbar):
+            """Raise a pooled page frame and make its editor the active one."""
+            frame = self.editor_pool[key][0]
+            self.editor_pool.move_to_end(key)
+            if show_toolbar:
+                self.toolbar.pack(fill='x', padx=8, pady=8, side='top', before=self.pages_container)
+            else:
+                self.toolbar.pack_forget()
+            frame.tkraise()
+            self.current_editor_frame = frame
+            self.current_editor = editor
+
+        def add_to_pool(self, key, frame, editor, page):
+            self.editor_pool[key] = (frame, editor, page)
+            while len(self.editor_pool) > EDITOR_POOL_SIZE:
+                old_frame, old_editor, old_page = next(iter(self.editor_pool.values()))
+                if not isinstance(old_editor, FlowchartEditor):
+                    self.autosaver.untrack(old_editor.text_area)
+                self.editor_pool.popitem(last=False)
+                old_frame.destroy()
+
+        def drop_pooled(self, folders, name=None):
+            """Destroy pooled editors for pages in the given folder dicts (optionally one name only)."""
+            folder_ids = {id(folder) for folder in folders}
+            for key in [k for k in self.editor_pool if k[0] in folder_ids and name in (None, k[1])]:
+                frame, editor, page = self.editor_pool.pop(key)
+                if not isinstance(editor, FlowchartEditor):
+                    self.autosaver.untrack(editor.text_area, save=False)
+                    if editor.journal:
+                        editor.journal.close(discard=True)
+                        editor.journal = None
+                if editor is self.current_editor:
+                    self.current_editor = self.current_editor_frame = self.current_page = None
+                    self.toolbar.pack_forget()
+                frame.destroy()
+
+        def rename_pooled(self, folder_data, old_name, new_name):
+            key = (id(folder_data), old_name)
+            if key in self.editor_pool:
+                frame, editor, page = self.editor_pool.pop(key)
+                self.editor_pool[(id(folder_data), new_name)] = (frame, editor, (folder_data, new_name))
+            if self.current_page == (folder_data, old_name):
+                self.current_page = (folder_data, new_name)
+
+        def page_snapshot(self, editor, content=None, digest=None):
+            """Return (path, content) for a pooled editor and record the path in project_data.
+
+            content and digest come from a capture_document copy; without them the page is read now.
+            """
+            for frame, pooled, (folder_data, page) in self.editor_pool.values():
+                if pooled is editor:
+                    file_path = page_store.path(folder_data[page])
+                    self.page_meta[file_path] = self.page_entry(self.folder_names(folder_data), page, file_path)[1:]
+                    if editor.journal:
+                        editor.journal.checkpoint(digest)
+                    return file_path, content if content is not None else editor.get_document()
+            raise KeyError("editor is not in the pool")
+
+        def capture_page(self, editor, ready):
+            """Copy a page for autosave between events, so big pages never stall typing."""
+            editor.capture_document(
+                lambda content, digest: ready(lambda: self.page_snapshot(editor, content, digest)))
+
+        def open_flowchart_editor(self, flowchart_data, parent_data=None):
+            key = (id(parent_data), flowchart_data)
+            if key not in self.editor_pool:
+                frame = ttk.Frame(self.pages_container)
+                frame.grid(row=0, column=0, sticky='nsew')
+                editor = FlowchartEditor(frame)
+                editor.pack(fill="both", expand=True)
+                self.add_to_pool(key, frame, editor, (parent_data, flowchart_data))
+            self.current_page = None
+            self.show_pooled(key, self.editor_pool[key][1], show_toolbar=False)
 
-                # Insert PDF button
-                def insert_media(filetypes, placeholder):
-                    file_path = tk.filedialog.askopenfilename(filetypes=filetypes)
-                    if not file_path:
-                        return
-                
-                    # Insert placeholder text (optional)
-                    editor.text_area.insert(tk.INSERT, f"[{placeholder}: {os.path.basename(file_path)}]\n")
-                
-                    try:
-                        # Open PDF and get first page
-                        media = fitz.open(file_path)
-                        page = media[0]
-                        zoom = 1.5
-                        mat = fitz.Matrix(zoom, zoom)
-                        pix = page.get_pixmap(matrix=mat)
-                
-                        # Convert pixmap to PIL Image
-                        img_data = pix.tobytes("png")  # Get raw PNG bytes
-                        image = Image.open(io.BytesIO(img_data))
-                
-                        # Optionally resize to a thumbnail
-                        image.thumbnail((300, 400))  # Keep aspect ratio
-                        tk_img = ImageTk.PhotoImage(image)
-                
-                        # Create a frame and add thumbnail inside Text widget
-                        media_frame = tk.Frame(editor.text_area, bg='#222222', bd=0)
-                        thumb_label = tk.Label(media_frame, image=tk_img, bg='#222222')
-                        thumb_label.image = tk_img  # Prevent garbage collection
-                        thumb_label.pack(side='left', padx=2, pady=2)
-                
-                        # Embed frame inside the text widget
-                        editor.text_area.window_create(tk.INSERT, window=media_frame)
-                        thumb_label.bind("<Button-1>", lambda e, path=file_path: open_file(path))
-                
-                    except Exception as e:
-                        print("Error rendering PDF:", e)
-                        # Fallback: just insert text
-                        editor.text_area.insert(tk.INSERT, "[PDF Preview not available]\n")
-
-                    download_btn = tk.Button(media_frame, text="⬇ Download", bg='#222222', fg='#00bfff', relief='flat', font=('Segoe UI', 10), cursor='hand2')
-                    download_btn.pack(side='left', padx=4)
-                    
-                    def download_media():
-                            save_path = tk.filedialog.asksaveasfilename(defaultextension=".pdf ", filetypes=[("Pdf files", "*.pdf"),("DOC" , "*.docx"), ("All files", "*.*")])
-                            if save_path:
-                                shutil.copy(file_path, save_path)
-                                messagebox.showinfo("Download", f"Document saved to:\n{save_path}")
-
-                    download_btn.config(command=download_media)
-                    
-                    def open_file(file_path):
-                        try:
-                            if os.name == 'nt':
-                                os.startfile(file_path)
-                            elif os.name == 'posix':
-                                subprocess.run(['xdg-open',file_path], check=False) 
-                            elif sys.platform.startswith('darwin'):
-                                subprocess.run(['open',file_path], check=False)
-                            else:
-                                messagebox.showerror("Error","Unsupported OS for opening files.")
-                        except Exception as e:
-                            messagebox.showerror("Error",f"Failed to open file:\n{e}")
-
-
-                    
-                insert_pdf_btn = tk.Button(
-                    toolbar, text="Insert PDF",
-                    command=lambda: insert_media(
-                        [("PDF files", "*.pdf"), ("All files", "*.*")],
-                        "📄 PDF"
-                    ),
-                    **btn_style
-                )
-                insert_pdf_btn.pack(side='left', padx=4)
-
-                # Insert Docs button
-                insert_docs_btn = tk.Button(
-                    toolbar, text="Insert Docs",
-                    command=lambda: insert_media(
-                        [("Word files", "*.doc *.docx"), ("All files", "*.*")],
-                        "📄 DOC"
-                    ),
-                    **btn_style
-                )
-                insert_docs_btn.pack(side='left', padx=4)
-                # --- End styled toolbar ---
-
-                if file_path:
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        editor.text_area.insert('1.0', content)
-                    except:
-                        pass
-                self.current_page = (folder_data, page)
-                editor.text_area.bind('<FocusOut>', lambda e: self.save_current_page())
-            elif page in folder_data.get('Projects', {}):
-                file_path = folder_data['Projects'][page]
-                if self.current_editor_frame:
-                    self.current_editor_frame.destroy()
-                    self.current_editor_frame = None
-                self.current_editor = None
-
-                frame = tk.Frame(self.editor_container, bg='#222222')
-                frame.pack(fill='both', expand=True)
-                self.current_editor_frame = frame
+        def open_editor(self, folder_data, page):
+            if page not in folder_data:
+                messagebox.showerror("Error", f"Page '{page}' not found in folder data.")
+                return
 
+            key = (id(folder_data), page)
+            if key not in self.editor_pool:
+                frame = tk.Frame(self.pages_container, bg='#222222')
+                frame.grid(row=0, column=0, sticky='nsew')
                 editor = create_text_editor(parent=frame)
-                self.current_editor = editor
-
-                toolbar = tk.Frame(frame, bg='#222222')
-                toolbar.pack(fill='x', padx=8, pady=8, side='top')
-
-                btn_style = {
-                    'bg': '#222222',
-                    'fg': '#cccccc',
-                    'activebackground': '#333333',
-                    'activeforeground': '#ffffff',
-                    'relief': 'flat',
-                    'bd': 0,
-                    'font': ('Segoe UI', 10),
-                    'highlightthickness': 0,
-                    'padx': 12,
-                    'pady': 6,
-                    'cursor': 'hand2'
-                }
-
-                heading_btn = tk.Button(toolbar, text="Heading", command=editor.make_heading, **btn_style)
-                heading_btn.pack(side='left', padx=(0, 4))
-                subheading_btn = tk.Button(toolbar, text="Subheading", command=editor.make_subheading, **btn_style)
-                subheading_btn.pack(side='left', padx=4)
-                normal_btn = tk.Button(toolbar, text="Normal", command=editor.make_normal, **btn_style)
-                normal_btn.pack(side='left', padx=4)
-
-                font_families = ['Consolas', 'Segoe UI', 'Arial', 'Courier', 'Times']
-                font_family_var = tk.StringVar(value='Consolas')
-                def on_font_family_change(value):
-                    editor.change_font(font_family=value, font_size=font_size_var.get())
-                font_family_menu = tk.OptionMenu(toolbar, font_family_var, *font_families, command=on_font_family_change)
-                font_family_menu.config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10), relief='flat', bd=0, highlightthickness=0, activebackground='#333333', activeforeground='#ffffff')
-                font_family_menu['menu'].config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10))
-                font_family_menu.pack(side='left', padx=4)
-
-                font_size_var = tk.IntVar(value=12)
-                def on_font_size_change(value):
-                    editor.change_font(font_family=font_family_var.get(), font_size=int(value))
-                font_size_menu = tk.OptionMenu(toolbar, font_size_var, *[10, 12, 14, 16, 18, 20, 24], command=on_font_size_change)
-                font_size_menu.config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10), relief='flat', bd=0, highlightthickness=0, activebackground='#333333', activeforeground='#ffffff')
-                font_size_menu['menu'].config(bg='#222222', fg='#cccccc', font=('Segoe UI', 10))
-                font_size_menu.pack(side='left', padx=4)
-
-                insert_img_btn = tk.Button(toolbar, text="Insert Image", command=editor.upload_image, **btn_style)
-                insert_img_btn.pack(side='left', padx=4)
-
-                
-
 
-                if file_path:
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        editor.text_area.insert('1.0', content)
-                    except:
-                        pass
-                self.current_page = (folder_data, page)
-                editor.text_area.bind('<FocusOut>', lambda e: self.save_current_page())
-            else:
-                messagebox.showerror("Error", f"Page '{page}' not found in folder data.")
+                editor.text_area.bind('<FocusOut>', lambda e, ed=editor: self.autosaver.save(ed.text_area))
+                self.add_to_pool(key, frame, editor, (folder_data, page))
+
+                if not is_page_id(folder_data[page]):
+                    self.adopt_page(folder_data, page)
+                file_path = page_store.path(folder_data[page])
+
+                def start_autosave(ed=editor):
+                    # Only once the page is fully loaded, and never for read-only windowed views
+                    if not ed.windowed:
+                        self.start_journal(ed, file_path, page)
+
+                try:
+                    editor.open_path(file_path, on_done=start_autosave)
+                except OSError:
+                    start_autosave()  # page file missing, start from an empty page
+                except ValueError as e:
+                    messagebox.showerror("Error", f"Could not read page '{page}':\n{e}")
+
+            self.current_page = (folder_data, page)
+            self.show_pooled(key, self.editor_pool[key][1], show_toolbar=True)
+
+        def adopt_page(self, folder_data, page):
+            """Move a page saved under its title by an older version into the page store."""
+            old_path = folder_data[page]
+            folder_data[page] = page_store.adopt(old_path)
+            entries = [self.page_entry(self.folder_names(folder_data), page, folder_data[page])]
+            def reindex():
+                if old_path:
+                    search_index.remove(page_key(old_path))
+                search_index.index_pages(entries)
+            self.indexer.submit(reindex)
+
+        def open_history(self):
+            if not self.current_editor or not self.current_page:
                 return
+            folder_data, page = self.current_page
+            editor = self.current_editor
+            self.autosaver.save(editor.text_area)  # so the newest version is what is on screen
+            HistoryPanel(self.root, page_store.path(folder_data[page]), page, editor.get_document(),
+                         lambda raw: self.restore_version(editor, raw))
+
+        def restore_version(self, editor, raw):
+            """Replace a page's content with an earlier version; the replaced text stays in the history."""
+            if not any(pooled is editor for frame, pooled, page in self.editor_pool.values()):
+                messagebox.showerror("Error", "The page was closed before the version could be restored.")
+                return
+            if editor.windowed:
+                messagebox.showerror("Error", "Large read-only pages cannot be restored.")
+                return
+            self.autosaver.save(editor.text_area)
+            # Keep the journal through the reload; it starts over on the restored text
+            journal, editor.journal = editor.journal, None
+            editor.load_document(raw)
+            editor.journal = journal
+            if journal:
+                journal.reset()
+            editor.text_area.edit_modified(True)
+
+        def start_journal(self, editor, path, page):
+            """Track a loaded page for autosave and undo, offering edits a crash left unsaved."""
+            edits, logs = pending_edits(path, state_digest(editor.text_area))
+            journal = Journal(editor, path)
+            self.autosaver.track(editor.text_area, lambda: self.page_snapshot(editor), on_saved=journal.saved,
+                                 capture=lambda ready: self.capture_page(editor, ready),
+                                 edit_listeners=editor.edit_listeners)
+            editor.journal = journal
+            if edits and not messagebox.askyesno(
+                    "Recover unsaved changes",
+                    f"'{page}' has {len(edits)} edit(s) that were not saved before the app closed.\n"
+                    "Restore them?", parent=self.root):
+                edits = []
+            journal.recover(edits, logs)
 
         def save_current_page(self):
             if not self.current_editor or not self.current_page: return
-            folder_data,page = self.current_page
-            content = self.current_editor.text_area.get('1.0','end-1c')
-            file_path = f"{page}.txt"
-            with open(file_path,'w',encoding='utf-8') as f:
-                f.write(content)
-            folder_data[page] = file_path
+            self.autosaver.save(self.current_editor.text_area)
+
+        def folder_names(self, folder_data):
+            """Names leading from the project root to a folder dict."""
+            if id(folder_data) not in self.folder_paths:
+                self.folder_paths.clear()
+                stack = [(self.project_data, [])]
+                while stack:
+                    data, names = stack.pop()
+                    self.folder_paths[id(data)] = names
+                    stack.extend((child, names + [name]) for name, child in data.items() if isinstance(child, dict))
+            return self.folder_paths.get(id(folder_data), [])
+
+        def page_entry(self, folder_names, name, value):
+            """(path, title, location, project, target) of a page, as the search index takes it."""
+            return page_entry(self.project_name, self.project_id, folder_names, name, value)
+
+        def page_entries(self, data, folder_names):
+            """Search entries of every page (not flowchart) in a folder dict and below."""
+            return page_entries(self.project_name, self.project_id, data, folder_names)
+
+        def index_written(self, path, content):
+            """Autosave listener: reindex a page with the text that was just written."""
+            meta = self.page_meta.get(path)
+            if meta is not None:
+                search_index.index_page(path, *meta, text=decode_document(content)[0])
+
+        def reindex_renamed(self, parent_data, old_name, new_name, value):
+            """Give the pages under a renamed item their new titles and locations; their files stay put."""
+            self.folder_paths.clear()
+            names = self.folder_names(parent_data)
+            name_index.rename(self.project_id, names + [old_name], new_name, value)
+            self.indexer.submit(search_index.index_pages, list(self.page_entries({new_name: value}, names)))
+
+        def reveal_path(self, names):
+            """Expand the tree down to the item at names and select it, which opens pages and flowcharts."""
+            self.reveal_token = object()
+            self.reveal_step(self.reveal_token, self.root_node, list(names), 0)
+
+        def reveal_step(self, token, item_id, names, scanned):
+            """Walk one level further; folders still loading in batches are waited for, not refilled at once.
+
+            scanned is how many children of item_id were already looked at, so the
+            wait between batches only checks the newly inserted ones.
+            """
+            if token is not self.reveal_token or not self.tree.exists(item_id):
+                return  # a newer search result took over, or the item went away
+            while names:
+                data = self.get_node_data(item_id)
+                if not isinstance(data, dict) or names[0] not in data:
+                    return
+                self.tree.item(item_id, open=True)
+                if item_id not in self.populated:
+                    self.populate_node(item_id)
+                children = self.tree.get_children(item_id)
+                child = next((c for c in children[scanned:] if self.tree.item(c, 'text') == names[0]), None)
+                if child is None:
+                    if children and self.tree.tag_has('placeholder', children[0]):
+                        # Check again once the next batch is in; the placeholder in front goes after the last one
+                        scanned = len(children) - 1
+                        self.root.after_idle(lambda: self.reveal_step(token, item_id, names, scanned))
+                    return
+                item_id, names, scanned = child, names[1:], 0
+            self.tree.see(item_id)
+            self.tree.selection_set(item_id)
+
+        def open_search(self):
+            SearchPanel(self.root, self.open_result, project=self.project_id, title=f"Search - {self.project_name}")
+
+        def open_result(self, result):
+            if result.kind == 'page':
+                self.reveal_path(result.target)
+
+        def on_close(self):
+            """Flush pending autosaves before the project window goes away."""
+            self.autosaver.close()
+            self.indexer.shutdown(wait=False, cancel=False)
+            self.root.winfo_toplevel().destroy()
 
     # Create a frame for the project manager UI
     frame = ttk.Frame(parent)
     frame.pack(fill='both', expand=True)
-    ProjectManager(frame, project_data)
+    frame.project_manager = ProjectManager(frame, project_data)
     return frame
 
 # Usage example (remove or comment out for integration):
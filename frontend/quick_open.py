@@ -0,0 +1,234 @@
+# quick_open.py
+import heapq
+import itertools
+import tkinter as tk
+from collections import namedtuple
+
+RESULT_LIMIT = 30
+# Matches scored in full per query; the rest are dropped by trigram overlap alone
+MAX_CANDIDATES = 1000
+# Fraction of the query's trigrams a name may miss and still match (typos, dropped letters)
+TYPO_ALLOWANCE = 0.5
+KIND_ICONS = {'project': '📁', 'folder': '🗂', 'page': '📄', 'flowchart': '🔀'}
+
+QuickOpenResult = namedtuple('QuickOpenResult', 'kind project names title location score')
+
+def name_grams(name):
+    """Trigrams of a name plus the one- and two-letter prefixes of its words, for short queries"""
+    text = name.lower()
+    grams = {text[i:i + 3] for i in range(len(text) - 2)}
+    for word in text.split():
+        grams.add('^' + word[:1])
+        grams.add('^' + word[:2])
+    return grams
+
+def query_grams(query):
+    if len(query) < 3:
+        return {'^' + query}
+    return {query[i:i + 3] for i in range(len(query) - 2)}
+
+def subsequence_span(query, text):
+    """Length of the shortest prefix of text holding query as a subsequence, or None"""
+    position = 0
+    for char in query:
+        position = text.find(char, position)
+        if position < 0:
+            return None
+        position += 1
+    return position
+
+class NameIndex:
+    """Trigram index over the names of every project, folder, page and flowchart.
+
+    Entries are keyed by (project id, names from the project root); the
+    project itself is the entry with no names. Posting sets map each trigram
+    to entry ids, so a query only touches entries sharing its trigrams.
+    """
+
+    def __init__(self):
+        self.ids = {}          # (project, names) -> entry id
+        self.entries = {}      # entry id -> (project, names, kind)
+        self.postings = {}     # gram -> set of entry ids
+        self.projects = {}     # project id -> project name
+        self.next_id = 0
+
+    def add(self, project, names, kind):
+        key = (project, tuple(names))
+        if key in self.ids:
+            self.remove(project, names)
+        entry = self.next_id
+        self.next_id += 1
+        self.ids[key] = entry
+        self.entries[entry] = (project, key[1], kind)
+        for gram in name_grams(self.title_of(project, key[1])):
+            self.postings.setdefault(gram, set()).add(entry)
+
+    def remove(self, project, names):
+        entry = self.ids.pop((project, tuple(names)), None)
+        if entry is None:
+            return
+        project, names, kind = self.entries.pop(entry)
+        for gram in name_grams(self.title_of(project, names)):
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.discard(entry)
+                if not posting:
+                    del self.postings[gram]
+
+    def remove_tree(self, project, names=()):
+        """Remove an entry and everything below it"""
+        names = tuple(names)
+        depth = len(names)
+        for key in [k for k in self.ids if k[0] == project and k[1][:depth] == names]:
+            self.remove(*key)
+
+    def add_tree(self, project, names, data):
+        """Index every folder, page and flowchart in a project_data dict, below names"""
+        stack = [(tuple(names), data)]
+        while stack:
+            prefix, folder = stack.pop()
+            for name, value in folder.items():
+                path = prefix + (name,)
+                if isinstance(value, dict):
+                    self.add(project, path, 'folder')
+                    stack.append((path, value))
+                else:
+                    self.add(project, path, 'flowchart' if value == "flowchart" else 'page')
+
+    def rename(self, project, names, new_name, data):
+        """Move a renamed item (and, for folders, its contents) to the new name"""
+        names = tuple(names)
+        self.remove_tree(project, names)
+        parent = names[:-1]
+        if isinstance(data, dict):
+            self.add(project, parent + (new_name,), 'folder')
+            self.add_tree(project, parent + (new_name,), data)
+        else:
+            self.add(project, parent + (new_name,), 'flowchart' if data == "flowchart" else 'page')
+
+    def set_project(self, project, name):
+        """Add or rename a project; the name is what project entries match on"""
+        if project in self.projects:
+            self.remove(project, ())
+        self.projects[project] = name
+        self.add(project, (), 'project')
+
+    def remove_project(self, project):
+        self.remove_tree(project)
+        self.projects.pop(project, None)
+
+    def title_of(self, project, names):
+        return names[-1] if names else self.projects.get(project, '')
+
+    def location_of(self, project, names):
+        if not names:
+            return "Project"
+        return ' / '.join((self.projects.get(project, ''),) + names[:-1])
+
+    def candidates(self, query):
+        """Entry ids sharing enough trigrams with the query, best overlap first"""
+        grams = [self.postings.get(gram, set()) for gram in query_grams(query)]
+        grams.sort(key=len)
+        needed = max(1, len(grams) - int(len(grams) * TYPO_ALLOWANCE))
+        if needed == len(grams):
+            found = grams[0].intersection(*grams[1:]) if len(grams) > 1 else grams[0]
+            return itertools.islice(found, MAX_CANDIDATES)
+        # Some grams may miss: any match must appear in one of the rarest lists
+        counts = {}
+        for posting in grams[:len(grams) - needed + 1]:
+            for entry in posting:
+                counts[entry] = counts.get(entry, 0) + 1
+        for posting in grams[len(grams) - needed + 1:]:
+            for entry in counts.keys() & posting:
+                counts[entry] += 1
+        matches = [entry for entry, count in counts.items() if count >= needed]
+        if len(matches) > MAX_CANDIDATES:
+            matches = heapq.nlargest(MAX_CANDIDATES, matches, key=counts.get)
+        return matches
+
+    def score(self, query, title, kind):
+        text = title.lower()
+        position = text.find(query)
+        if position == 0:
+            score = 3.0
+        elif position > 0:
+            score = 2.5 if text[position - 1] in ' _-/.' else 2.0
+        else:
+            span = subsequence_span(query, text)
+            score = len(query) / span if span else 0.5
+        # Shorter names that match are closer to what was typed
+        return score - len(text) / 1000 + (0.01 if kind == 'project' else 0)
+
+    def search(self, query, limit=RESULT_LIMIT):
+        query = ' '.join(query.lower().split())
+        if not query:
+            return []
+        scored = []
+        for entry in self.candidates(query):
+            project, names, kind = self.entries[entry]
+            scored.append((self.score(query, self.title_of(project, names), kind), entry))
+        results = []
+        for score, entry in heapq.nlargest(limit, scored):
+            project, names, kind = self.entries[entry]
+            results.append(QuickOpenResult(kind, project, names, self.title_of(project, names),
+                                           self.location_of(project, names), score))
+        return results
+
+name_index = NameIndex()
+
+class QuickOpen:
+    """Ctrl+P palette: type part of a name, pick a result with the arrows and Enter"""
+
+    def __init__(self, parent, on_open, index=name_index):
+        self.on_open = on_open
+        self.index = index
+        self.results = []
+        self.win = tk.Toplevel(parent)
+        self.win.title("Quick Open")
+        self.win.configure(bg='#2a2a2a')
+        self.win.transient(parent.winfo_toplevel())
+        top = parent.winfo_toplevel()
+        self.win.geometry(f"560x360+{top.winfo_rootx() + max(0, (top.winfo_width() - 560) // 2)}+{top.winfo_rooty() + 60}")
+
+        self.query = tk.StringVar()
+        self.entry = tk.Entry(self.win, textvariable=self.query, font=('Segoe UI', 12),
+                              bg='#1a1a1a', fg='white', insertbackground='white',
+                              relief='flat', highlightthickness=1, highlightcolor='#0078d4')
+        self.entry.pack(fill='x', padx=8, pady=8, ipady=4)
+        self.listbox = tk.Listbox(self.win, bg='#2a2a2a', fg='#cccccc', font=('Segoe UI', 10),
+                                  selectbackground='#0078d4', selectforeground='white',
+                                  relief='flat', highlightthickness=0, activestyle='none')
+        self.listbox.pack(fill='both', expand=True, padx=8, pady=(0, 8))
+
+        self.query.trace_add('write', lambda *a: self.refresh())
+        self.entry.bind('<Down>', lambda e: self.move(1))
+        self.entry.bind('<Up>', lambda e: self.move(-1))
+        self.entry.bind('<Return>', lambda e: self.open())
+        self.listbox.bind('<Double-Button-1>', lambda e: self.open())
+        self.win.bind('<Escape>', lambda e: self.win.destroy())
+        self.entry.focus_set()
+
+    def refresh(self):
+        self.results = self.index.search(self.query.get())
+        self.listbox.delete(0, 'end')
+        for result in self.results:
+            self.listbox.insert('end', f"{KIND_ICONS[result.kind]}  {result.title}    —  {result.location}")
+        if self.results:
+            self.listbox.selection_set(0)
+
+    def move(self, step):
+        if not self.results:
+            return 'break'
+        selection = self.listbox.curselection()
+        i = min(max((selection[0] if selection else 0) + step, 0), len(self.results) - 1)
+        self.listbox.selection_clear(0, 'end')
+        self.listbox.selection_set(i)
+        self.listbox.see(i)
+        return 'break'
+
+    def open(self):
+        selection = self.listbox.curselection()
+        if selection:
+            result = self.results[selection[0]]
+            self.win.destroy()
+            self.on_open(result)
@@ -0,0 +1,178 @@
+# search_index.py
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from document import decode_document
+from workspace import workspace_dir
+
+SEARCH_DB = 'search.sqlite'
+RESULT_LIMIT = 50
+SNIPPET_TOKENS = 14
+# Page text beyond this is not indexed; huge pages are read-only logs anyway
+MAX_BODY_BYTES = 4 * 1024 * 1024
+# bm25 weights of the title and body columns
+TITLE_WEIGHT, BODY_WEIGHT = 8.0, 1.0
+# Wrap matched terms in snippets; control characters never occur in page text
+HIT_START, HIT_END = '\x02', '\x03'
+# Pages written per transaction when indexing many at once
+INDEX_BATCH = 500
+# Shorter last words match whole words only; one- or two-letter prefixes hit most of the index
+MIN_PREFIX_CHARS = 3
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entries USING fts5(
+    title, body, location UNINDEXED, tokenize='unicode61 remove_diacritics 2');
+CREATE TABLE IF NOT EXISTS sources (
+    key TEXT PRIMARY KEY, entry INTEGER, kind TEXT, project TEXT, target TEXT,
+    size INTEGER, mtime_ns INTEGER);
+CREATE INDEX IF NOT EXISTS sources_entry ON sources(entry);
+CREATE INDEX IF NOT EXISTS sources_kind ON sources(kind);
+"""
+
+SearchResult = namedtuple('SearchResult', 'kind key title location project target snippet')
+
+def fts_query(text):
+    """Quote every word of free text for MATCH; the last word also matches as a prefix"""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    if len(words[-1]) >= MIN_PREFIX_CHARS:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+def page_key(path):
+    return 'page:' + os.path.abspath(path)
+
+def read_page_text(path):
+    with open(path, 'rb') as f:
+        raw = f.read(MAX_BODY_BYTES).decode('utf-8', errors='replace')
+    try:
+        return decode_document(raw)[0]
+    except ValueError:
+        return raw  # truncated header of a huge document, index what is there
+
+class SearchIndex:
+    """Full-text index of card titles and descriptions, page names and page contents.
+
+    Backed by an SQLite FTS5 table in the workspace. Every thread gets its
+    own connection; WAL lets searches run while the autosave writer updates
+    pages. Each indexed source has one row in `sources` pointing at its FTS
+    row, so updates replace a single row instead of rebuilding anything.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            if self.path is None:
+                self.path = os.path.join(workspace_dir(), SEARCH_DB)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self.local.conn = conn
+        return conn
+
+    def update(self, key, kind, title, body, location='', project='', target=None, stamp=(None, None), commit=True):
+        """Insert or replace one source; stamp is the (size, mtime_ns) of the file it came from"""
+        conn = self.connection()
+        try:
+            row = conn.execute('SELECT entry FROM sources WHERE key = ?', (key,)).fetchone()
+            if row:
+                conn.execute('DELETE FROM entries WHERE rowid = ?', (row[0],))
+            entry = conn.execute('INSERT INTO entries (title, body, location) VALUES (?, ?, ?)',
+                                 (title, body, location)).lastrowid
+            conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (key, entry, kind, project, json.dumps(target), *stamp))
+        except BaseException:
+            conn.rollback()
+            raise
+        if commit:
+            conn.commit()
+
+    def remove(self, key):
+        conn = self.connection()
+        with conn:
+            row = conn.execute('SELECT entry FROM sources WHERE key = ?', (key,)).fetchone()
+            if row:
+                conn.execute('DELETE FROM entries WHERE rowid = ?', (row[0],))
+                conn.execute('DELETE FROM sources WHERE key = ?', (key,))
+
+    def remove_kind(self, kind):
+        conn = self.connection()
+        with conn:
+            conn.execute('DELETE FROM entries WHERE rowid IN (SELECT entry FROM sources WHERE kind = ?)', (kind,))
+            conn.execute('DELETE FROM sources WHERE kind = ?', (kind,))
+
+    def remove_project(self, project, kind='page'):
+        """Drop every source of one kind belonging to a project"""
+        conn = self.connection()
+        with conn:
+            conn.execute('DELETE FROM entries WHERE rowid IN '
+                         '(SELECT entry FROM sources WHERE kind = ? AND project = ?)', (kind, project))
+            conn.execute('DELETE FROM sources WHERE kind = ? AND project = ?', (kind, project))
+
+    def index_page(self, path, title, location, project, target, text=None, commit=True):
+        """Index a page file, skipping it when it has not changed since it was last indexed.
+
+        Pages that were never saved have no file yet; only their name is indexed.
+        """
+        key = page_key(path)
+        try:
+            st = os.stat(path)
+            stamp = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            stamp = (None, None)
+        if text is None:
+            row = self.connection().execute('SELECT size, mtime_ns, title, location FROM sources '
+                                            'JOIN entries ON entries.rowid = sources.entry WHERE key = ?',
+                                            (key,)).fetchone()
+            if row and tuple(row) == (*stamp, title, location):
+                return False
+            text = read_page_text(path) if stamp[0] is not None else ''
+        self.update(key, 'page', title, text, location, project, target, stamp, commit=commit)
+        return True
+
+    def index_pages(self, pages):
+        """Bring many (path, title, location, project, target) up to date; for a background thread"""
+        changed = 0
+        for i, page in enumerate(pages, 1):
+            changed += self.index_page(*page, commit=False)
+            if i % INDEX_BATCH == 0:
+                self.connection().commit()
+        self.connection().commit()
+        return changed
+
+    def search(self, text, project=None, limit=RESULT_LIMIT):
+        """Ranked results for free text, best first; returns (results, seconds taken)"""
+        query = fts_query(text)
+        if query is None:
+            return [], 0.0
+        start = time.perf_counter()
+        sql = (f"SELECT s.kind, s.key, e.title, e.location, s.project, s.target, "
+               f"snippet(entries, -1, '{HIT_START}', '{HIT_END}', '…', {SNIPPET_TOKENS}) "
+               f"FROM entries e JOIN sources s ON s.entry = e.rowid WHERE entries MATCH ?")
+        args = [query]
+        if project is not None:
+            sql += " AND s.project = ?"
+            args.append(project)
+        sql += f" ORDER BY bm25(entries, {TITLE_WEIGHT}, {BODY_WEIGHT}) LIMIT ?"
+        args.append(limit)
+        try:
+            rows = self.connection().execute(sql, args).fetchall()
+        except sqlite3.OperationalError as e:
+            print("Search failed:", e)
+            rows = []
+        results = [SearchResult(kind, key, title, location, project, json.loads(target) if target else None, snippet)
+                   for kind, key, title, location, project, target, snippet in rows]
+        return results, time.perf_counter() - start
+
+search_index = SearchIndex()
@@ -0,0 +1,123 @@
+# search_panel.py
+import tkinter as tk
+from search_index import search_index, HIT_START, HIT_END
+from workers import WorkerPool
+
+# Quiet period after the last keystroke before a query runs
+SEARCH_DELAY_MS = 120
+
+class SearchPanel:
+    """Search window over the full-text index; results open through on_open(result)"""
+
+    def __init__(self, parent, on_open, project=None, title="Search"):
+        self.on_open = on_open
+        self.project = project
+        self.win = tk.Toplevel(parent)
+        self.win.title(title)
+        self.win.geometry("640x520")
+        self.win.configure(bg='#1a1a1a')
+
+        self.query = tk.StringVar()
+        self.entry = tk.Entry(self.win, textvariable=self.query, font=('Segoe UI', 12),
+                              bg='#2a2a2a', fg='white', insertbackground='white',
+                              relief='flat', highlightthickness=1, highlightcolor='#0078d4')
+        self.entry.pack(fill='x', padx=10, pady=(10, 4), ipady=4)
+        self.status = tk.Label(self.win, text="Type to search titles, descriptions and pages",
+                               bg='#1a1a1a', fg='#888888', font=('Segoe UI', 8), anchor='w')
+        self.status.pack(fill='x', padx=10)
+
+        self.results = tk.Text(self.win, bg='#1a1a1a', fg='#cccccc', relief='flat', wrap='word',
+                               font=('Segoe UI', 10), cursor='arrow', padx=10, pady=6,
+                               highlightthickness=0)
+        self.results.pack(fill='both', expand=True)
+        self.results.tag_configure('title', foreground='white', font=('Segoe UI', 11, 'bold'))
+        self.results.tag_configure('location', foreground='#888888', font=('Segoe UI', 8))
+        self.results.tag_configure('hit', foreground='#00bfff')
+        self.results.tag_configure('selected', background='#2a2a2a')
+        self.results.configure(state='disabled')
+
+        self.shown = []        # results currently listed
+        self.selected = None
+        self.serial = 0        # newest query; older results arriving late are dropped
+        self.pending = None
+        self.searcher = WorkerPool(self.win, threads=1, name='search')
+
+        self.query.trace_add('write', lambda *a: self.schedule_search())
+        self.entry.bind('<Down>', lambda e: self.move_selection(1))
+        self.entry.bind('<Up>', lambda e: self.move_selection(-1))
+        self.entry.bind('<Return>', lambda e: self.open_selected())
+        self.win.bind('<Escape>', lambda e: self.close())
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+        self.entry.focus_set()
+
+    def schedule_search(self):
+        if self.pending is not None:
+            self.win.after_cancel(self.pending)
+        self.pending = self.win.after(SEARCH_DELAY_MS, self.search)
+
+    def search(self):
+        self.pending = None
+        self.serial += 1
+        serial = self.serial
+        self.searcher.cancel()
+        self.searcher.submit(search_index.search, self.query.get(), self.project,
+                             callback=lambda result: self.show(serial, *result),
+                             errback=lambda e: self.status.config(text=f"Search failed: {e}"))
+
+    def show(self, serial, results, seconds):
+        if serial != self.serial:
+            return
+        self.shown = results
+        self.selected = None
+        text = self.results
+        text.configure(state='normal')
+        text.delete('1.0', 'end')
+        for i, result in enumerate(results):
+            tag = f'result{i}'
+            text.insert('end', result.title + '\n', ('title', tag))
+            text.insert('end', f"{'Project' if result.kind == 'card' else result.location}\n", ('location', tag))
+            self.insert_snippet(result.snippet, tag)
+            text.insert('end', '\n\n', tag)
+            text.tag_bind(tag, '<Button-1>', lambda e, i=i: self.select(i))
+            text.tag_bind(tag, '<Double-Button-1>', lambda e, i=i: self.open(i))
+        text.configure(state='disabled')
+        if results:
+            self.select(0)
+        if self.query.get().strip():
+            self.status.config(text=f"{len(results)} result{'s' if len(results) != 1 else ''} in {seconds * 1000:.1f} ms")
+        else:
+            self.status.config(text="Type to search titles, descriptions and pages")
+
+    def insert_snippet(self, snippet, tag):
+        """Insert a snippet with the matched terms highlighted"""
+        for i, part in enumerate(snippet.replace('\n', ' ').split(HIT_START)):
+            hit, _, rest = part.partition(HIT_END) if i else ('', '', part)
+            if hit:
+                self.results.insert('end', hit, ('hit', tag))
+            self.results.insert('end', rest, tag)
+
+    def select(self, i):
+        self.results.tag_remove('selected', '1.0', 'end')
+        self.selected = i
+        ranges = self.results.tag_ranges(f'result{i}')
+        if ranges:
+            self.results.tag_add('selected', ranges[0], ranges[-1])
+            self.results.see(ranges[0])
+
+    def move_selection(self, step):
+        if self.shown:
+            self.select(min(max((self.selected or 0) + step, 0), len(self.shown) - 1))
+        return 'break'
+
+    def open_selected(self):
+        if self.selected is not None:
+            self.open(self.selected)
+
+    def open(self, i):
+        self.on_open(self.shown[i])
+
+    def close(self):
+        if self.pending is not None:
+            self.win.after_cancel(self.pending)
+        self.searcher.shutdown(wait=False)
+        self.win.destroy()
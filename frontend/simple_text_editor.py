@@ -1,12 +1,42 @@
 # simple_text_editor.py
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
-import fitz
-import cv2
+from PIL import ImageTk
 import os
-from io import BytesIO
 import re
+import platform
+import subprocess
+from contextlib import contextmanager
+from asset_store import asset_store, copy_file
+from autosave import atomic_write
+from document import encode_document, decode_document, embed_offsets, index_key, text_index
+from thumbnails import load_thumbnail
+from syntax import TOKEN_STYLES, TokenCache, block_language, lex_block, token_cache
+from workers import WorkerPool
+from styles import COMPACT_DELAY_MS, STYLE_PREFIX, Style, StyleRegistry
+from image_embeds import ImageEmbeds
+from extraction import can_extract, load_extraction, preview_text
+from pdf_viewer import PdfViewer
+from video_index import load_index
+from video_player import VideoPlayer
+from large_file import STREAM_THRESHOLD, WINDOWED_THRESHOLD, ChunkedLoader, WindowedView
+from find_replace import FindBar
+from journal import StateDigest
+
+# Lines above and below the viewport whose code blocks get token highlighting
+SYNTAX_MARGIN_LINES = 150
+# Threads decoding image, PDF and video thumbnails for one editor
+MEDIA_THREADS = 2
+# Lines copied per turn of the event loop when a page is captured for autosave
+CAPTURE_SLICE_LINES = 2000
+
+def open_file_with_default_app(filepath):
+    if platform.system() == "Windows":
+        os.startfile(filepath)
+    elif platform.system() == "Darwin":
+        subprocess.run(['open', filepath], check=False)
+    else:
+        subprocess.run(['xdg-open', filepath], check=False)
 
 class SimpleTextEditor:
     def __init__(self, parent=None):
@@ -17,12 +47,39 @@ class SimpleTextEditor:
             self.root.title("Text Editor")
             self.root.geometry("900x700")
         self.current_file = None
-        self.embedded_media = []
+        self.loader = None      # ChunkedLoader while a large file is streaming in
+        self.windowed = None    # WindowedView when a huge file is shown read-only
+        self.progress = None
         self.embedded_widgets = []
+        # Embedded image / window name -> (kind, attrs) needed to recreate it on load
+        self.embeds = {}
+        self.embed_handlers = {
+            'image': lambda index, attrs: self.insert_image_file(self.asset_path(attrs), index, attrs),
+            'video': lambda index, attrs: self.create_video_embed(self.asset_path(attrs), index, attrs),
+            'media': lambda index, attrs: self.create_media_embed(self.asset_path(attrs), index, attrs),
+        }
+        # Off for editors whose content must not reach the shared asset store (the diary)
+        self.allow_embeds = True
         self.selected_widget = None
         self.create_ui()
         # Removed menu bar creation
-        self.text_area.bind('<KeyRelease>', self.check_code_blocks)
+        self.edit_listeners = []
+        self.install_edit_hooks()
+        self.code_scan_pending = None
+        self.edit_listeners.append(self.on_code_edit)
+        self.capture_serial = 0  # bumped by every change; a capture in progress from before it is dropped
+        self.edit_listeners.append(lambda *args: self.abandon_capture())
+        self.journal = None     # undo/redo and recovery log, attached by the page's owner
+        self.scroll_listeners = []
+        self.media_pool = None
+        self.images = ImageEmbeds(self)
+        self.syntax_pending = None
+        self.syntax_workers = None
+        self.syntax_jobs = {}      # cache key -> queued lex job
+        self.syntax_applied = {}   # block start index -> (cache key, embed offsets) of the tokens shown there
+        self.find_bar = None
+        self.text_area.configure(yscrollcommand=self.on_yscroll)
+        self.text_area.bind('<Destroy>', self.on_text_destroy, add='+')
         self.bind_hotkeys()
 
     def create_ui(self):
@@ -42,14 +99,22 @@ class SimpleTextEditor:
         )
         self.text_area.pack(fill='both', expand=True)
         self.text_area.tag_configure('code_block', background='#2d2d2d', foreground='#00ff88', font=('Courier', 11))
+        # Marks the first quote of every ''' fence; Tk keeps these in place as
+        # the text around them changes (one char, so adjacent fences never merge)
+        self.text_area.tag_configure('code_fence')
+        for tag, colour in TOKEN_STYLES.items():
+            self.text_area.tag_configure(tag, foreground=colour)
 
-        # Add tags for formatting
-        self.text_area.tag_configure('bold', font=('Consolas', 12, 'bold'))
-        self.text_area.tag_configure('italic', font=('Consolas', 12, 'italic'))
-        self.text_area.tag_configure('underline', font=('Consolas', 12, 'underline'))
-        self.text_area.tag_configure('heading', font=('Consolas', 18, 'bold'))
-        self.text_area.tag_configure('subheading', font=('Consolas', 14, 'bold'))
-        self.text_area.tag_configure('normal', font=('Consolas', 12, 'normal'))
+        # Formatting: one interned tag per font combination instead of stacked tags
+        self.style_registry = StyleRegistry(self.text_area)
+        self.compaction_pending = None
+
+    def mark_modified(self):
+        # Tag changes do not touch the Text modified flag, but they do change the document
+        self.abandon_capture()
+        self.text_area.edit_modified(True)
+        # <<Modified>> only fires when the flag flips; autosave waits for formatting to stop too
+        self.text_area.event_generate('<<Modified>>')
 
     def bind_hotkeys(self):
         # File operations
@@ -67,89 +132,128 @@ class SimpleTextEditor:
         self.text_area.bind('<Control-3>', self.make_normal)
         # Font change hotkey example (Ctrl+Shift+F)
         self.text_area.bind('<Control-Shift-F>', self.change_font)
+        # Find and replace
+        self.text_area.bind('<Control-f>', lambda e: self.show_find())
+        self.text_area.bind('<Control-h>', lambda e: self.show_find(replace=True))
+        self.text_area.bind('<Control-z>', lambda e: self.journal.undo() if self.journal else 'break')
+        self.text_area.bind('<Control-y>', lambda e: self.journal.redo() if self.journal else 'break')
+        self.text_area.bind('<Control-Z>', lambda e: self.journal.redo() if self.journal else 'break')
+        self.text_area.bind('<F3>', lambda e: self.find_bar.find_next() if self.find_bar else 'break')
+        self.text_area.bind('<Shift-F3>', lambda e: self.find_bar.find_previous() if self.find_bar else 'break')
+
+    def show_find(self, replace=False):
+        if self.find_bar is None:
+            self.find_bar = FindBar(self)
+        self.find_bar.show(replace=replace and not self.windowed)
+        return 'break'
 
     def select_all(self, event=None):
         self.text_area.tag_add('sel', '1.0', 'end-1c')
         return 'break'
 
-    def make_bold(self, event=None):
+    def restyle_selection(self, **changes):
         try:
             start, end = self.text_area.index('sel.first'), self.text_area.index('sel.last')
-            # Toggle bold: remove if present, add if not
-            if 'bold' in self.text_area.tag_names('sel.first'):
-                self.text_area.tag_remove('bold', start, end)
-            else:
-                self.text_area.tag_add('bold', start, end)
         except tk.TclError:
-            pass
+            return 'break'
+        self.style_registry.restyle(start, end, **changes)
+        self.mark_modified()
+        self.schedule_style_compaction()
         return 'break'
 
-    def make_italic(self, event=None):
+    def selection_style(self):
         try:
-            start, end = self.text_area.index('sel.first'), self.text_area.index('sel.last')
-            if 'italic' in self.text_area.tag_names('sel.first'):
-                self.text_area.tag_remove('italic', start, end)
-            else:
-                self.text_area.tag_add('italic', start, end)
+            return self.style_registry.style_at('sel.first')
         except tk.TclError:
-            pass
-        return 'break'
+            return None
+
+    def make_bold(self, event=None):
+        # Toggle bold: remove if present, add if not
+        style = self.selection_style()
+        if style is None:
+            return 'break'
+        return self.restyle_selection(weight='normal' if style.weight == 'bold' else 'bold')
+
+    def make_italic(self, event=None):
+        style = self.selection_style()
+        if style is None:
+            return 'break'
+        return self.restyle_selection(slant='roman' if style.slant == 'italic' else 'italic')
 
     def make_underline(self, event=None):
-        try:
-            start, end = self.text_area.index('sel.first'), self.text_area.index('sel.last')
-            if 'underline' in self.text_area.tag_names('sel.first'):
-                self.text_area.tag_remove('underline', start, end)
-            else:
-                self.text_area.tag_add('underline', start, end)
-        except tk.TclError:
-            pass
-        return 'break'
+        style = self.selection_style()
+        if style is None:
+            return 'break'
+        return self.restyle_selection(underline=not style.underline)
 
     def make_heading(self, event=None):
-        try:
-            start, end = self.text_area.index('sel.first'), self.text_area.index('sel.last')
-            self.text_area.tag_remove('subheading', start, end)
-            self.text_area.tag_remove('normal', start, end)
-            self.text_area.tag_add('heading', start, end)
-        except tk.TclError:
-            pass
-        return 'break'
+        return self.restyle_selection(size=18, weight='bold')
 
     def make_subheading(self, event=None):
-        try:
-            start, end = self.text_area.index('sel.first'), self.text_area.index('sel.last')
-            self.text_area.tag_remove('heading', start, end)
-            self.text_area.tag_remove('normal', start, end)
-            self.text_area.tag_add('subheading', start, end)
-        except tk.TclError:
-            pass
-        return 'break'
+        return self.restyle_selection(size=14, weight='bold')
 
     def make_normal(self, event=None):
-        try:
-            start, end = self.text_area.index('sel.first'), self.text_area.index('sel.last')
-            self.text_area.tag_remove('heading', start, end)
-            self.text_area.tag_remove('subheading', start, end)
-            self.text_area.tag_add('normal', start, end)
-        except tk.TclError:
-            pass
-        return 'break'
+        base = self.style_registry.base
+        return self.restyle_selection(family=base.family, size=base.size, weight='normal')
+
+    def schedule_style_compaction(self):
+        if self.compaction_pending is not None:
+            self.text_area.after_cancel(self.compaction_pending)
+        self.compaction_pending = self.text_area.after(COMPACT_DELAY_MS, self.compact_styles)
+
+    def compact_styles(self):
+        """Fold leftover legacy tags into style tags and drop styles nothing uses anymore"""
+        self.compaction_pending = None
+        self.abandon_capture()  # legacy tags may be rewritten under a capture in progress
+        self.style_registry.convert_legacy()
+        self.style_registry.drop_unused()
 
     # Simple file operations (you can expand to include media support)
     def new_file(self):
-        self.text_area.delete('1.0', tk.END)
+        self.reset_buffer()
         self.current_file = None
 
     def open_file(self):
-        file_path = filedialog.askopenfilename(filetypes=[("Text files","*.txt")])
+        file_path = filedialog.askopenfilename(filetypes=[("Tarizz documents","*.tdoc"), ("Text files","*.txt")])
         if file_path:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            self.text_area.delete('1.0', tk.END)
-            self.text_area.insert('1.0', content)
+            self.open_path(file_path)
             self.current_file = file_path
 
+    def open_path(self, file_path, on_done=None):
+        """Load a file, streaming it or showing it through a line window when it is large"""
+        size = os.path.getsize(file_path)
+        if size > WINDOWED_THRESHOLD:
+            self.reset_buffer()
+            self.windowed = WindowedView(self, file_path)
+        elif size > STREAM_THRESHOLD:
+            self.reset_buffer()
+            def finished():
+                self.loader = None
+                self.text_area.edit_modified(False)
+                if on_done:
+                    on_done()
+            self.loader = ChunkedLoader(self, file_path, on_done=finished)
+            return
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                self.load_document(f.read())
+        if on_done:
+            on_done()
+
+    def show_progress(self, label, fraction):
+        if self.progress is None:
+            self.progress = tk.Label(self.root, bg='#222222', fg='#cccccc', anchor='w', font=('Segoe UI', 9))
+            self.progress.pack(side='bottom', fill='x', before=self.text_area)
+            self.progress_label = label or ''
+        if label is not None:
+            self.progress_label = label
+        self.progress.config(text=f"{self.progress_label}… {fraction:.0%}")
+
+    def hide_progress(self):
+        if self.progress is not None:
+            self.progress.destroy()
+            self.progress = None
+
     def save_file(self):
         if self.current_file:
             self.write_file(self.current_file)
@@ -157,25 +261,431 @@ class SimpleTextEditor:
             self.save_as_file()
 
     def save_as_file(self):
-        file_path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text files","*.txt")])
+        file_path = filedialog.asksaveasfilename(defaultextension=".tdoc", filetypes=[("Tarizz documents","*.tdoc"), ("Text files","*.txt")])
         if file_path:
             self.write_file(file_path)
             self.current_file = file_path
 
     def write_file(self, file_path):
-        content = self.text_area.get('1.0', 'end-1c')
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        if self.windowed or self.loader:
+            messagebox.showerror("Save", "This file is still loading or too large to edit here.")
+            return
+        if file_path.endswith('.tdoc'):
+            content = self.get_document()
+        else:
+            content = self.text_area.get('1.0', 'end-1c')
+        atomic_write(file_path, content)
+
+    def get_document(self):
+        """Serialize the text, formatting tag runs and embedded media references"""
+        text_area = self.text_area
+        tags, styles = {}, {}
+        for tag, style in self.style_registry.styles.items():
+            ranges = [str(index) for index in text_area.tag_ranges(tag)]
+            if ranges:
+                tags[tag] = ranges
+                styles[tag] = list(style)
+        embeds = []
+        for key, name, index in text_area.dump('1.0', 'end-1c', image=True, window=True):
+            if name in self.embeds:
+                kind, attrs = self.embeds[name]
+                embeds.append((index, kind, attrs))
+        return encode_document(text_area.get('1.0', 'end-1c'), tags, embeds, styles)
+
+    def capture_document(self, ready):
+        """Copy the buffer for saving CAPTURE_SLICE_LINES lines per turn of the event loop.
+
+        ready(content, digest) gets a function building the get_document()
+        text, meant for a worker thread, and the journal's state digest of
+        the copied buffer. Any change before the copy is complete abandons it.
+        """
+        self.capture_serial += 1
+        serial = self.capture_serial
+        text_area = self.text_area
+        last_line = index_key(text_area.index('end-1c'))[0]
+        styles = self.style_registry.styles
+        pieces, ranges, open_tags, embeds, positions = [], {}, {}, [], []
+        digest = StateDigest()
+
+        def step(line):
+            if serial != self.capture_serial or not text_area.winfo_exists():
+                return
+            next_line = line + CAPTURE_SLICE_LINES
+            start, stop = f"{line}.0", f"{next_line}.0" if next_line <= last_line else 'end-1c'
+            text = text_area.get(start, stop)
+            pieces.append(text)
+            digest.add_text(text)
+            # Toggles sit between characters, so each lands in exactly one slice
+            for key, value, index in text_area.dump(start, stop, tag=True, image=True, window=True):
+                if key == 'tagon':
+                    if value in styles:
+                        open_tags.setdefault(value, index)
+                elif key == 'tagoff':
+                    if value in open_tags:
+                        ranges.setdefault(value, []).extend((open_tags.pop(value), index))
+                else:
+                    positions.append(index)
+                    if value in self.embeds:
+                        kind, attrs = self.embeds[value]
+                        embeds.append((index, kind, attrs))
+            if next_line <= last_line:
+                text_area.after(1, lambda: step(next_line))
+                return
+            end = text_area.index('end-1c')
+            for tag, first in open_tags.items():
+                ranges.setdefault(tag, []).extend((first, end))
+            tag_styles = {tag: list(styles[tag]) for tag in ranges}
+            ready(lambda: encode_document(''.join(pieces), ranges, embeds, tag_styles), digest.finish(positions))
+
+        step(1)
+
+    def abandon_capture(self):
+        self.capture_serial += 1
+
+    def reset_buffer(self):
+        """Empty the editor and stop any load still in progress"""
+        if self.loader:
+            self.loader.cancel()
+            self.loader = None
+        if self.windowed:
+            self.windowed.close()
+            self.windowed = None
+            self.text_area.configure(state='normal')
+        self.hide_progress()
+        if self.journal:
+            # Edits of the old buffer stay in its log; clearing is not one of them
+            self.journal.close()
+            self.journal = None
+        self.text_area.delete('1.0', tk.END)
+        for widget in self.embedded_widgets:
+            widget.destroy()
+        self.embedded_widgets = []
+        if self.media_pool is not None:
+            self.media_pool.cancel()
+        self.images.clear()
+        self.embeds = {}
+
+    def load_document(self, raw):
+        """Replace the buffer with a serialized document, applying each tag in one bulk call"""
+        text, tags, embeds, styles = decode_document(raw)
+        self.reset_buffer()
+        self.text_area.insert('1.0', text)
+        self.apply_markup(tags, embeds, styles)
+
+    def apply_markup(self, tags, embeds, styles):
+        text_area = self.text_area
+        # Ascending order: every earlier embed is already in place, so the
+        # saved index points at the same spot in the rebuilt buffer
+        for index, kind, attrs in sorted(embeds, key=lambda e: index_key(e[0])):
+            handler = self.embed_handlers.get(kind)
+            if handler:
+                try:
+                    handler(index, attrs)
+                except Exception as e:
+                    print(f"Could not restore {kind} embed:", e)
+        for tag, ranges in tags.items():
+            if not ranges:
+                continue
+            if tag.startswith(STYLE_PREFIX) and isinstance(styles.get(tag), list):
+                tag = self.style_registry.intern(Style(*styles[tag]))
+                if tag is None:
+                    continue
+            text_area.tag_add(tag, *ranges)
+        # Documents from before style interning carry stacked bold/heading/custom_font_* tags
+        self.style_registry.convert_legacy()
+        text_area.edit_modified(False)
+        self.check_code_blocks()
+
+    def install_edit_hooks(self):
+        """Route the Text widget command through Python so inserts and deletes can be observed"""
+        widget = self.text_area
+        self.text_command = widget._w + '_orig'
+        widget.tk.call('rename', widget._w, self.text_command)
+        widget.tk.createcommand(widget._w, self.dispatch_text_command)
+        # Let tkinter delete the proxy command together with the widget
+        if widget._tclCommands is None:
+            widget._tclCommands = []
+        widget._tclCommands.append(widget._w)
+
+    def dispatch_text_command(self, *args):
+        call = self.text_area.tk.call
+        command = self.text_command
+        op = args[0] if args else None
+        if op == 'insert' and len(args) >= 3 and self.edit_listeners:
+            start = call(command, 'index', args[1])
+            if call(command, 'compare', start, '==', 'end'):
+                start = call(command, 'index', 'end-1c')
+            result = call((command,) + args)
+            chars = ''.join(args[2::2])
+            end = call(command, 'index', f"{start}+{len(chars)}c")
+            if self.journal:
+                self.journal.record('insert', str(start), chars)
+            for listener in self.edit_listeners:
+                listener('insert', str(start), str(end), chars)
+            return result
+        if op == 'delete' and len(args) >= 2 and self.edit_listeners:
+            if len(args) > 3:
+                # Several ranges: delete them one by one from the back
+                pairs = [(args[i], args[i + 1] if i + 1 < len(args) else f"{args[i]}+1c") for i in range(1, len(args), 2)]
+                pairs.sort(key=lambda pair: index_key(str(call(command, 'index', pair[0]))), reverse=True)
+                for first, last in pairs:
+                    self.dispatch_text_command('delete', first, last)
+                return ''
+            start = call(command, 'index', args[1])
+            end = call(command, 'index', args[2] if len(args) == 3 else f"{args[1]}+1c")
+            if call(command, 'compare', end, '>', 'end-1c'):
+                end = call(command, 'index', 'end-1c')
+            if not call(command, 'compare', start, '<', end):
+                return ''
+            # get() leaves images and windows out, so a delete spanning one cannot be journaled
+            spans_embed = bool(call(command, 'dump', '-image', '-window', start, end))
+            if self.journal and not spans_embed:
+                self.journal.record('delete', str(start), call(command, 'get', start, end))
+            result = call(command, 'delete', start, end)
+            if self.journal and spans_embed:
+                self.journal.reset()
+            for listener in self.edit_listeners:
+                listener('delete', str(start), str(start), None)
+            return result
+        if op in ('image', 'window') and len(args) >= 3 and args[1] == 'create' and self.edit_listeners:
+            start = call(command, 'index', args[2])
+            if call(command, 'compare', start, '==', 'end'):
+                start = call(command, 'index', 'end-1c')
+            result = call((command,) + args)
+            if self.journal:
+                self.journal.reset()
+            end = call(command, 'index', f"{start}+1 indices")
+            for listener in self.edit_listeners:
+                listener('insert', str(start), str(end), None)
+            return result
+        if op == 'replace' and len(args) >= 4 and self.edit_listeners:
+            self.dispatch_text_command('delete', args[1], args[2])
+            return self.dispatch_text_command('insert', args[1], *args[3:])
+        return call((command,) + args)
+
+    @contextmanager
+    def batch_edit(self):
+        """Apply many edits as one undo step; listeners hear about the whole changed range once, afterwards"""
+        text_area = self.text_area
+        listeners = self.edit_listeners
+        journal = self.journal
+        changed = []
+
+        def record(op, start, end, chars):
+            if not changed:
+                text_area.mark_set('batch_start', start)
+                text_area.mark_set('batch_end', end)
+                text_area.mark_gravity('batch_start', 'left')
+                text_area.mark_gravity('batch_end', 'right')
+                changed.append(True)
+            else:
+                if text_area.compare(start, '<', 'batch_start'):
+                    text_area.mark_set('batch_start', start)
+                if text_area.compare(end, '>', 'batch_end'):
+                    text_area.mark_set('batch_end', end)
+
+        self.edit_listeners = [record]
+        if journal:
+            journal.begin()
+        try:
+            yield
+        finally:
+            if journal:
+                journal.end()
+            self.edit_listeners = listeners
+            if changed:
+                start, end = text_area.index('batch_start'), text_area.index('batch_end')
+                text_area.mark_unset('batch_start', 'batch_end')
+                for listener in listeners:
+                    listener('insert', start, end, None)
+
+    def on_code_edit(self, op, start, end, chars):
+        """Remember which lines changed and rescan them for fences once Tk is idle"""
+        text_area = self.text_area
+        if self.code_scan_pending is None:
+            text_area.mark_set('code_dirty_start', f"{start} linestart")
+            text_area.mark_set('code_dirty_end', f"{end} lineend")
+            text_area.mark_gravity('code_dirty_start', 'left')
+            text_area.mark_gravity('code_dirty_end', 'right')
+            self.code_scan_pending = text_area.after_idle(self.highlight_code_blocks)
+        else:
+            if text_area.compare(start, '<', 'code_dirty_start'):
+                text_area.mark_set('code_dirty_start', f"{start} linestart")
+            if text_area.compare(end, '>', 'code_dirty_end'):
+                text_area.mark_set('code_dirty_end', f"{end} lineend")
 
     def check_code_blocks(self, event=None):
-        content = self.text_area.get('1.0', tk.END)
-        self.text_area.tag_remove('code_block','1.0',tk.END)
-        for match in re.finditer(r"'''(.*?)'''", content, re.DOTALL):
-            start = f"1.0+{match.start()}c"
-            end = f"1.0+{match.end()}c"
-            self.text_area.tag_add('code_block', start, end)
+        """Rescan the whole buffer for code blocks right away"""
+        self.on_code_edit('insert', '1.0', self.text_area.index('end-1c'), None)
+        self.text_area.after_cancel(self.code_scan_pending)
+        self.highlight_code_blocks()
+
+    def highlight_code_blocks(self):
+        """Re-find fences on the dirty lines and retag only the blocks around them"""
+        self.code_scan_pending = None
+        text_area = self.text_area
+        first = text_area.index('code_dirty_start linestart')
+        last = text_area.index('code_dirty_end lineend')
+
+        old_count = len(text_area.tag_ranges('code_fence')) // 2
+        text_area.tag_remove('code_fence', first, last)
+        text = text_area.get(first, last)
+        embeds = embed_offsets(text_area, first, last)
+        fences = []
+        line, scanned = index_key(first)[0], 0
+        for match in re.finditer("'''", text):
+            # get() leaves embedded images out, so columns are mapped back past them
+            line += text.count('\n', scanned, match.start())
+            scanned = match.start()
+            line_start = text.rfind('\n', 0, match.start()) + 1
+            fences.append(text_index(f"{line}.0", line_start, match.start(), embeds))
+            fences.append(text_index(f"{line}.0", line_start, match.start() + 1, embeds, end=True))
+        if fences:
+            text_area.tag_add('code_fence', *fences)
+
+        # Pair fences in document order, exactly like the old '''(.*?)''' scan
+        ranges = [str(index) for index in text_area.tag_ranges('code_fence')]
+        region_start = text_area.tag_prevrange('code_fence', first)
+        region_start = str(region_start[0]) if region_start else '1.0'
+        if len(ranges) // 2 != old_count:
+            region_end = text_area.index('end')  # pairing shifted for everything below
+        else:
+            following = text_area.tag_nextrange('code_fence', last)
+            region_end = text_area.index(f"{following[0]}+3c") if following else text_area.index('end')
+        lo, hi = index_key(region_start), index_key(region_end)
+        blocks = []
+        for i in range(0, len(ranges) - 3, 4):
+            if index_key(ranges[i + 2]) >= lo and index_key(ranges[i]) <= hi:
+                blocks.extend((ranges[i], f"{ranges[i + 2]}+3c"))
+        text_area.tag_remove('code_block', region_start, region_end)
+        if blocks:
+            text_area.tag_add('code_block', *blocks)
+        # Token colours left behind where a block used to be
+        gap_start = region_start
+        for i in range(0, len(blocks) + 1, 2):
+            gap_end = blocks[i] if i < len(blocks) else region_end
+            if text_area.compare(gap_start, '<', gap_end):
+                for tag in TOKEN_STYLES:
+                    text_area.tag_remove(tag, gap_start, gap_end)
+            if i < len(blocks):
+                gap_start = blocks[i + 1]
+        self.schedule_syntax()
+
+    def on_yscroll(self, first, last):
+        for listener in self.scroll_listeners:
+            listener(first, last)
+        self.schedule_syntax()
+
+    def schedule_syntax(self):
+        if self.syntax_pending is None:
+            self.syntax_pending = self.text_area.after_idle(self.highlight_syntax)
+
+    def highlight_syntax(self):
+        """Colour tokens of the code blocks in and around the viewport, lexing uncached ones off-thread"""
+        self.syntax_pending = None
+        text_area = self.text_area
+        top = index_key(text_area.index('@0,0'))[0] - SYNTAX_MARGIN_LINES
+        bottom = index_key(text_area.index(f"@0,{text_area.winfo_height()}"))[0] + SYNTAX_MARGIN_LINES
+        ranges = [str(index) for index in text_area.tag_ranges('code_fence')]
+        applied = {}
+        for i in range(0, len(ranges) - 3, 4):
+            if index_key(ranges[i + 2])[0] < top:
+                continue
+            if index_key(ranges[i])[0] > bottom:
+                break
+            start = text_area.index(f"{ranges[i]}+3c")
+            end = ranges[i + 2]
+            code = text_area.get(start, end)
+            key = TokenCache.key(block_language(code), code)
+            # An image moved within unchanged code shifts the tokens after it too
+            embeds = embed_offsets(text_area, start, end)
+            if self.syntax_applied.get(start) == (key, embeds):
+                applied[start] = (key, embeds)
+                continue
+            tokens = token_cache.get(key)
+            if tokens is not None:
+                self.apply_tokens(start, end, tokens, code, embeds)
+                applied[start] = (key, embeds)
+            elif key not in self.syntax_jobs:
+                if self.syntax_workers is None:
+                    self.syntax_workers = WorkerPool(self.text_area, threads=1, name='syntax')
+                self.syntax_jobs[key] = self.syntax_workers.submit(
+                    lex_block, key[0], code, callback=lambda tokens, key=key: self.on_lexed(key, tokens))
+        self.syntax_applied = applied
+
+    def on_lexed(self, key, tokens):
+        self.syntax_jobs.pop(key, None)
+        token_cache.put(key, tokens)
+        # Applied on the next pass if the block is still on screen and unchanged
+        self.schedule_syntax()
+
+    def apply_tokens(self, start, end, tokens, code, embeds):
+        """Tag tokens lexed from code, the get() copy of start..end; embeds are its embed_offsets"""
+        text_area = self.text_area
+        line, col = index_key(start)
+        for tag in TOKEN_STYLES:
+            text_area.tag_remove(tag, start, end)
+        # Token columns leave out images and windows, which still take an index each
+        line_starts = [0]
+        if embeds:
+            for row_text in code.split('\n')[:-1]:
+                line_starts.append(line_starts[-1] + len(row_text) + 1)
+
+        def position(row, token_col, is_end):
+            if not embeds:
+                return f"{line + row}.{token_col + col if row == 0 else token_col}"
+            if row == 0:
+                return text_index(start, 0, token_col, embeds, end=is_end)
+            return text_index(f"{line + row}.0", line_starts[row], line_starts[row] + token_col, embeds, end=is_end)
+
+        by_tag = {}
+        for tag, row, token_col, end_row, end_col in tokens:
+            by_tag.setdefault(tag, []).extend((position(row, token_col, False), position(end_row, end_col, True)))
+        for tag, indices in by_tag.items():
+            text_area.tag_add(tag, *indices)
+
+    def on_text_destroy(self, event):
+        if event.widget is not self.text_area:
+            return
+        if self.journal:
+            self.journal.close()
+        # Closing the page drops queued decodes and any results still in flight
+        for pool in (self.syntax_workers, self.media_pool):
+            if pool is not None:
+                pool.shutdown(wait=False)
+
+    def media_workers(self):
+        if self.media_pool is None:
+            self.media_pool = WorkerPool(self.text_area, threads=MEDIA_THREADS, name='media')
+        return self.media_pool
+
+    def load_preview(self, label, kind, file_path, fallback, on_ready=None):
+        """Decode a thumbnail in the background and swap it into label, which shows a loading text until then"""
+        def show(img):
+            if not label.winfo_exists():
+                return
+            img_tk = ImageTk.PhotoImage(img, master=label)
+            label.image = img_tk  # Keep reference
+            # width/height were in characters for the text, reset them for the image
+            label.config(image=img_tk, text='', width=0, height=0)
+            if on_ready:
+                on_ready()
+
+        def failed(error):
+            print(f"Error rendering {kind} preview:", error)
+            if label.winfo_exists():
+                label.config(text=fallback)
+
+        self.media_workers().submit(load_thumbnail, kind, file_path, callback=show, errback=failed, owner=label)
+
+    def embeds_allowed(self):
+        if not self.allow_embeds:
+            messagebox.showinfo("Embeds", "Images and media can't be added here.")
+        return self.allow_embeds
 
     def upload_image(self, event=None):
+        if not self.embeds_allowed():
+            return 'break'
         file_path = filedialog.askopenfilename(
             filetypes=[
                 ("Image files", "*.png *.jpg *.jpeg *.gif *.bmp"),
@@ -184,26 +694,177 @@ class SimpleTextEditor:
         )
         if file_path:
             try:
-                img = Image.open(file_path)
-                img.thumbnail((300, 300))
-                img_tk = ImageTk.PhotoImage(img)
-                self.text_area.image_create(tk.INSERT, image=img_tk)
-                # Keep reference to avoid garbage collection
-                self.embedded_media.append(img_tk)
+                self.insert_image_file(file_path, tk.INSERT)
+                self.mark_modified()
             except Exception as e:
                 messagebox.showerror("Image Error", f"Failed to insert image: {e}")
         return 'break'
 
+    def insert_image_file(self, file_path, index, attrs=None):
+        name = self.images.insert(file_path, index)
+        self.record_embed(name, 'image', file_path, attrs)
+
+    def asset_path(self, attrs):
+        """File behind a saved embed: its asset store copy, or the original path for older documents"""
+        asset = attrs.get('asset')
+        if asset and asset_store.contains(asset):
+            return asset_store.path(asset)
+        return attrs['path']
+
+    def record_embed(self, name, kind, file_path, attrs=None):
+        """Remember how to recreate an embed, moving its file into the asset store in the background"""
+        asset = (attrs or {}).get('asset')
+        original = (attrs or {}).get('name') or os.path.basename(file_path)
+        if asset and asset_store.contains(asset):
+            self.embeds[name] = (kind, {'path': asset_store.path(asset), 'asset': asset, 'name': original})
+            return
+        self.embeds[name] = (kind, {'path': file_path, 'name': original})
+        if not self.allow_embeds:
+            return
+        # Embeds restored from an older document pick up their key quietly and keep it from the next save
+        inserted = attrs is None
+
+        def stored(key):
+            if name in self.embeds:
+                self.embeds[name] = (kind, {'path': asset_store.path(key), 'asset': key, 'name': original})
+                if inserted:
+                    self.mark_modified()
+
+        self.media_workers().submit(asset_store.put, file_path, callback=stored,
+                                    errback=lambda e: print(f"Could not store {file_path}:", e))
+
+    def embed_path(self, name, fallback):
+        return self.embeds.get(name, (None, {'path': fallback}))[1]['path']
+
+    def download_embed(self, name, fallback, filetypes, title):
+        attrs = self.embeds.get(name, (None, {'path': fallback}))[1]
+        source = attrs['path']
+        save_path = filedialog.asksaveasfilename(initialfile=attrs.get('name') or os.path.basename(source),
+                                                 defaultextension=os.path.splitext(source)[1], filetypes=filetypes)
+        if save_path:
+            try:
+                copy_file(source, save_path)
+                messagebox.showinfo("Download", f"{title} saved to:\n{save_path}")
+            except OSError as e:
+                messagebox.showerror("Download", f"Could not save {title.lower()}:\n{e}")
+
     def change_font(self, event=None, font_family='Consolas', font_size=12):
-        # Example: change font family and size for selected text
+        # Change font family and size for selected text
+        return self.restyle_selection(family=font_family, size=int(font_size))
+
+    def insert_video_embed(self):
+        if not self.embeds_allowed():
+            return
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Video files", "*.mp4 *.avi *.mov *.mkv *.webm"), ("All files", "*.*")]
+        )
+        if file_path:
+            self.create_video_embed(file_path, tk.INSERT)
+            self.mark_modified()
+
+    def create_video_embed(self, file_path, index, attrs=None):
+        # Create a frame for the embedded video widget
+        video_frame = tk.Frame(self.text_area, bg='#222222', bd=0)
+        # Loading text until the thumbnail arrives, "No Preview" if there is none
+        thumb_label = tk.Label(video_frame, text="Loading preview…", bg='#222222', fg='#cccccc', width=66, height=21)
+        thumb_label.pack(side='left')
+        self.load_preview(thumb_label, 'video', file_path, "No Preview")
+        # Build the keyframe index and scrubber previews ahead of the first play
+        self.media_workers().submit(load_index, file_path, owner=video_frame,
+                                    errback=lambda e: print("Could not index video:", e))
+
+        # Play button
+        play_btn = tk.Button(video_frame, text="▶ Play", bg='#00bfff', fg='white', relief='flat', font=('Segoe UI', 10, 'bold'), cursor='hand2')
+        play_btn.pack(side='left', padx=8)
+
+        # Download button
+        download_btn = tk.Button(video_frame, text="⬇ Download", bg='#222222', fg='#00bfff', relief='flat', font=('Segoe UI', 10), cursor='hand2')
+        download_btn.pack(side='left', padx=4)
+
+        def play_video():
+            try:
+                VideoPlayer(self.text_area, self.embed_path(str(video_frame), file_path), size=(1920, 800))
+            except Exception as e:
+                messagebox.showerror("Video Error", f"Could not play video:\n{e}")
+
+        def download_video():
+            self.download_embed(str(video_frame), file_path, [("Video files", "*.mp4 *.avi *.mov *.mkv *.webm"), ("All files", "*.*")], "Video")
+
+        play_btn.config(command=play_video)
+        download_btn.config(command=download_video)
+
+        self.text_area.window_create(index, window=video_frame)
+        self.embedded_widgets.append(video_frame)
+        self.record_embed(str(video_frame), 'video', file_path, attrs)
+
+    def insert_media(self, filetypes, placeholder):
+        if not self.embeds_allowed():
+            return
+        file_path = filedialog.askopenfilename(filetypes=filetypes)
+        if not file_path:
+            return
+
+        # Insert placeholder text (optional)
+        self.text_area.insert(tk.INSERT, f"[{placeholder}: {os.path.basename(file_path)}]\n")
+        self.create_media_embed(file_path, tk.INSERT)
+        self.mark_modified()
+
+    def create_media_embed(self, file_path, index, attrs=None):
+        # Create a frame and add thumbnail inside Text widget
+        media_frame = tk.Frame(self.text_area, bg='#222222', bd=0)
+        # A text label while the preview loads, and as the fallback, so the embed always takes a single index
+        is_pdf = file_path.lower().endswith('.pdf')
+        thumb_label = tk.Label(media_frame, text="[Loading preview…]", bg='#222222', fg='#cccccc',
+                               justify='left', anchor='w', wraplength=420)
+        thumb_label.pack(side='left', padx=2, pady=2)
+        if is_pdf:
+            self.load_preview(thumb_label, 'pdf', file_path, "[PDF Preview not available]",
+                              on_ready=lambda: thumb_label.bind("<Button-1>", lambda e: self.open_pdf_viewer(self.embed_path(str(media_frame), file_path))))
+        elif can_extract(file_path):
+            # DOCX previews show the start of the text, extracted once per file version;
+            # PDFs show a rendered page and are only extracted when something asks for their text
+            self.media_workers().submit(
+                load_extraction, file_path, owner=media_frame,
+                callback=lambda result: self.show_text_preview(thumb_label, file_path, result),
+                errback=lambda e: self.on_extraction_failed(thumb_label, file_path, e))
+        else:
+            thumb_label.config(text=f"[{os.path.basename(file_path)}: preview not available]")
+
+        download_btn = tk.Button(media_frame, text="⬇ Download", bg='#222222', fg='#00bfff', relief='flat', font=('Segoe UI', 10), cursor='hand2')
+        download_btn.pack(side='left', padx=4)
+
+        def download_media():
+            self.download_embed(str(media_frame), file_path, [("Pdf files", "*.pdf"), ("DOC", "*.docx"), ("All files", "*.*")], "Document")
+
+        download_btn.config(command=download_media)
+
+        # Embed frame inside the text widget
+        self.text_area.window_create(index, window=media_frame)
+        self.embedded_widgets.append(media_frame)
+        self.record_embed(str(media_frame), 'media', file_path, attrs)
+
+    def show_text_preview(self, label, file_path, result):
+        if not label.winfo_exists():
+            return
+        label.config(text=f"📄 {os.path.basename(file_path)}\n{preview_text(result)}", cursor='hand2')
+        label.bind("<Button-1>", lambda e: self.open_external(file_path))
+
+    def on_extraction_failed(self, label, file_path, error):
+        print(f"Could not extract text from {file_path}:", error)
+        if label.winfo_exists():
+            label.config(text=f"[{os.path.basename(file_path)}: preview not available]")
+
+    def open_pdf_viewer(self, file_path):
         try:
-            start, end = self.text_area.index('sel.first'), self.text_area.index('sel.last')
-            tag_name = f"custom_font_{font_family}_{font_size}"
-            self.text_area.tag_configure(tag_name, font=(font_family, font_size))
-            self.text_area.tag_add(tag_name, start, end)
-        except tk.TclError:
-            pass
-        return 'break'
+            PdfViewer(self.text_area, file_path, open_external=self.open_external)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to open PDF:\n{e}")
+
+    def open_external(self, file_path):
+        try:
+            open_file_with_default_app(file_path)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to open file:\n{e}")
 
 def create_text_editor(parent=None):
     """Function to create a TextEditor, optionally embedded in a frame"""
@@ -0,0 +1,117 @@
+# styles.py
+from collections import namedtuple
+
+Style = namedtuple('Style', 'family size weight slant underline')
+
+BASE_STYLE = Style('Consolas', 12, 'normal', 'roman', False)
+STYLE_PREFIX = 'style_'
+# Idle time after the last formatting change before unused style tags are dropped
+COMPACT_DELAY_MS = 2000
+
+def font_for(style):
+    font = [style.family, style.size, style.weight, style.slant]
+    if style.underline:
+        font.append('underline')
+    return tuple(font)
+
+# Changes made by the tags older documents stacked on top of each other
+LEGACY_TAGS = {
+    'bold': dict(weight='bold'),
+    'italic': dict(slant='italic'),
+    'underline': dict(underline=True),
+    'heading': dict(size=18, weight='bold'),
+    'subheading': dict(size=14, weight='bold'),
+    'normal': dict(family=BASE_STYLE.family, size=BASE_STYLE.size, weight='normal'),
+}
+LEGACY_FONT_PREFIX = 'custom_font_'
+
+def legacy_changes(tag):
+    if tag in LEGACY_TAGS:
+        return LEGACY_TAGS[tag]
+    if tag.startswith(LEGACY_FONT_PREFIX):
+        family, _, size = tag[len(LEGACY_FONT_PREFIX):].rpartition('_')
+        if family and size.isdigit():
+            return dict(family=family, size=int(size))
+    return None
+
+class StyleRegistry:
+    """Interns every distinct font combination of a Text widget into exactly one tag"""
+
+    def __init__(self, text_area, base=BASE_STYLE):
+        self.text_area = text_area
+        self.base = base
+        self.tags = {}     # Style -> tag
+        self.styles = {}   # tag -> Style
+        self.counter = 0
+
+    def intern(self, style):
+        """Tag for style, or None for the widget's own font"""
+        if style == self.base:
+            return None
+        tag = self.tags.get(style)
+        if tag is None:
+            self.counter += 1
+            tag = f"{STYLE_PREFIX}{self.counter}"
+            self.text_area.tag_configure(tag, font=font_for(style))
+            # Code block and token tags keep priority over prose styles
+            self.text_area.tag_lower(tag)
+            self.tags[style] = tag
+            self.styles[tag] = style
+        return tag
+
+    def style_tag_at(self, index):
+        for tag in self.text_area.tag_names(index):
+            if tag in self.styles:
+                return tag
+        return None
+
+    def style_at(self, index):
+        return self.styles.get(self.style_tag_at(index), self.base)
+
+    def runs(self, start, end):
+        """Yield (run_start, run_end, tag) for the style runs between two indices"""
+        text_area = self.text_area
+        current = self.style_tag_at(start)
+        position = text_area.index(start)
+        for key, tag, index in text_area.dump(start, end, tag=True):
+            if tag not in self.styles:
+                continue
+            if text_area.compare(position, '<', index):
+                yield position, index, current
+                position = index
+            current = tag if key == 'tagon' else None
+        end = text_area.index(end)
+        if text_area.compare(position, '<', end):
+            yield position, end, current
+
+    def restyle(self, start, end, **changes):
+        """Apply field changes to every run in the range, keeping one style tag per character"""
+        text_area = self.text_area
+        for run_start, run_end, tag in list(self.runs(start, end)):
+            style = self.styles.get(tag, self.base)
+            new_tag = self.intern(style._replace(**changes))
+            if new_tag == tag:
+                continue
+            if tag is not None:
+                text_area.tag_remove(tag, run_start, run_end)
+            if new_tag is not None:
+                text_area.tag_add(new_tag, run_start, run_end)
+
+    def drop_unused(self):
+        """Delete style tags that no longer cover any text"""
+        for tag in list(self.styles):
+            if not self.text_area.tag_nextrange(tag, '1.0'):
+                self.text_area.tag_delete(tag)
+                del self.tags[self.styles.pop(tag)]
+
+    def convert_legacy(self):
+        """Fold stacked tags from older documents into interned style tags"""
+        text_area = self.text_area
+        for tag in text_area.tag_names():
+            changes = legacy_changes(tag)
+            if changes is None:
+                continue
+            ranges = text_area.tag_ranges(tag)
+            text_area.tag_delete(tag)
+            for i in range(0, len(ranges), 2):
+                self.restyle(ranges[i], ranges[i + 1], **changes)
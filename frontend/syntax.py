@@ -0,0 +1,137 @@
+# syntax.py
+import hashlib
+import re
+from collections import OrderedDict
+
+try:
+    from pygments.lexers import get_lexer_by_name
+    from pygments.token import Token
+    from pygments.util import ClassNotFound
+except ImportError:  # highlighting falls back to the small regex lexers below
+    get_lexer_by_name = None
+
+DEFAULT_LANGUAGE = 'python'
+TOKEN_CACHE_SIZE = 512
+
+# Tag name -> foreground colour used inside code blocks
+TOKEN_STYLES = {
+    'syn_keyword': '#c586c0',
+    'syn_builtin': '#4ec9b0',
+    'syn_function': '#dcdcaa',
+    'syn_string': '#ce9178',
+    'syn_comment': '#6a9955',
+    'syn_number': '#b5cea8',
+    'syn_operator': '#d4d4d4',
+}
+
+FALLBACK_KEYWORDS = {
+    'python': 'False None True and as assert async await break class continue def del elif else except '
+              'finally for from global if import in is lambda nonlocal not or pass raise return try while with yield',
+    'javascript': 'async await break case catch class const continue default delete do else export extends '
+                  'false finally for function if import in instanceof let new null return switch this throw '
+                  'true try typeof undefined var void while yield',
+    'c': 'auto break case char const continue default do double else enum extern float for goto if int long '
+         'register return short signed sizeof static struct switch typedef union unsigned void volatile while',
+}
+FALLBACK_KEYWORDS['js'] = FALLBACK_KEYWORDS['javascript']
+FALLBACK_KEYWORDS['cpp'] = FALLBACK_KEYWORDS['c'] + ' bool class delete false namespace new private protected public template this throw true try catch using virtual'
+FALLBACK_KEYWORDS['java'] = FALLBACK_KEYWORDS['cpp'] + ' boolean extends final implements import interface package super'
+
+FALLBACK_PATTERNS = [
+    ('syn_comment', r'#[^\n]*|//[^\n]*|/\*.*?\*/'),
+    ('syn_string', r'"(?:\\.|[^"\\\n])*"|`(?:\\.|[^`\\])*`|\'(?:\\.|[^\'\\\n])*\''),
+    ('syn_number', r'\b(?:0[xX][0-9a-fA-F]+|\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)\b'),
+    ('syn_function', r'\b[A-Za-z_]\w*(?=\s*\()'),
+    ('word', r'\b[A-Za-z_]\w*\b'),
+]
+FALLBACK_REGEX = re.compile('|'.join(f"(?P<{name}>{pattern})" for name, pattern in FALLBACK_PATTERNS), re.DOTALL)
+
+LANGUAGE_LINE = re.compile(r'([A-Za-z0-9_+#.-]+)[ \t]*(?:\n|$)')
+
+def block_language(code):
+    """Language named right after the opening fence ('''python), or the default"""
+    match = LANGUAGE_LINE.match(code)
+    return match.group(1).lower() if match else DEFAULT_LANGUAGE
+
+def token_class(ttype):
+    if ttype in Token.Comment:
+        return 'syn_comment'
+    if ttype in Token.Literal.String:
+        return 'syn_string'
+    if ttype in Token.Literal.Number:
+        return 'syn_number'
+    if ttype in Token.Keyword or ttype in Token.Operator.Word:
+        return 'syn_keyword'
+    if ttype in Token.Name.Builtin:
+        return 'syn_builtin'
+    if ttype in Token.Name.Function or ttype in Token.Name.Class:
+        return 'syn_function'
+    if ttype in Token.Operator:
+        return 'syn_operator'
+    return None
+
+def spans_to_positions(code, spans):
+    """Turn (tag, start, end) character offsets into (tag, row, col, end_row, end_col)"""
+    line_starts = [0]
+    line_starts.extend(m.end() for m in re.finditer('\n', code))
+    tokens = []
+    row = 0
+    for tag, start, end in spans:
+        while row + 1 < len(line_starts) and line_starts[row + 1] <= start:
+            row += 1
+        end_row = row
+        while end_row + 1 < len(line_starts) and line_starts[end_row + 1] <= end:
+            end_row += 1
+        tokens.append((tag, row, start - line_starts[row], end_row, end - line_starts[end_row]))
+    return tokens
+
+def lex_block(language, code):
+    """Tokenize one code block; runs on a worker thread"""
+    spans = []
+    lexer = None
+    if get_lexer_by_name is not None:
+        try:
+            lexer = get_lexer_by_name(language, stripnl=False, ensurenl=False, stripall=False)
+        except ClassNotFound:
+            lexer = None
+    if lexer is not None:
+        for start, ttype, value in lexer.get_tokens_unprocessed(code):
+            tag = token_class(ttype)
+            if tag and value:
+                spans.append((tag, start, start + len(value)))
+    else:
+        keywords = set(FALLBACK_KEYWORDS.get(language, FALLBACK_KEYWORDS['python']).split())
+        for match in FALLBACK_REGEX.finditer(code):
+            tag = match.lastgroup
+            if tag == 'word':
+                if match.group() not in keywords:
+                    continue
+                tag = 'syn_keyword'
+            spans.append((tag, match.start(), match.end()))
+    return spans_to_positions(code, spans)
+
+class TokenCache:
+    """LRU of lexed blocks keyed by language and a hash of the block text"""
+
+    def __init__(self, size=TOKEN_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def key(language, code):
+        return language, hashlib.blake2b(code.encode('utf-8'), digest_size=16).digest()
+
+    def get(self, key):
+        tokens = self.entries.get(key)
+        if tokens is not None:
+            self.entries.move_to_end(key)
+        return tokens
+
+    def put(self, key, tokens):
+        self.entries[key] = tokens
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+# Shared by every editor so switching pages reuses earlier lexing work
+token_cache = TokenCache()
@@ -0,0 +1,141 @@
+# test_backup.py
+import json
+import os
+import shutil
+import zipfile
+import pytest
+
+import backup
+from asset_store import asset_store
+from backup import restore_backup, write_backup
+from diary_vault import diary_vault
+from document import encode_document
+from page_store import new_page_id, page_store
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """A fresh TARIZZ_HOME; the stores pick their folders up from it"""
+    monkeypatch.setenv('TARIZZ_HOME', str(tmp_path / 'home'))
+    for store in (page_store, asset_store, diary_vault):
+        monkeypatch.setattr(store, 'root', None)
+    return tmp_path
+
+def write_page(text, assets=()):
+    page_id = new_page_id()
+    path = page_store.path(page_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    embeds = [(f"1.{i}", 'image', {'asset': key, 'name': key}) for i, key in enumerate(assets)]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(encode_document(text, embeds=embeds))
+    return page_id
+
+def read_page(page_id):
+    with open(page_store.path(page_id), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def put_asset(folder, data, extension='.png'):
+    source = folder / ('source' + extension)
+    source.write_bytes(data)
+    return asset_store.put(str(source))
+
+def card(project_id, title, pages):
+    return {'project_id': project_id, 'title': title, 'description': '', 'project_data': pages}
+
+def wipe_workspace(workspace):
+    shutil.rmtree(workspace / 'home')
+
+def test_incremental_chain_round_trip(workspace):
+    image = put_asset(workspace, b'\x89PNG first image')
+    first, second = write_page('first page', [image]), write_page('second page')
+    cards = [card('a' * 32, 'Alpha', {'Notes': {'One': first}, 'Two': second})]
+    full = str(workspace / 'full.tzbackup')
+    write_backup(full, cards)
+
+    with open(page_store.path(second), 'a', encoding='utf-8') as f:
+        f.write(' edited')
+    third = write_page('third page')
+    cards[0]['project_data']['Three'] = third
+    incremental = str(workspace / 'incremental.tzbackup')
+    manifest, added = write_backup(incremental, cards)
+    assert manifest['base'] == 'full.tzbackup'
+    assert added == 2
+    assert manifest['files'][f"pages/{first[:2]}/{first}.tdoc"]['in'] == 'full.tzbackup'
+    expected = {page_id: read_page(page_id) for page_id in (first, second, third)}
+
+    wipe_workspace(workspace)
+    restored = restore_backup(incremental)
+    assert restored == cards
+    for page_id, content in expected.items():
+        assert read_page(page_id) == content
+    assert asset_store.contains(image)
+
+def test_missing_base_archive(workspace):
+    cards = [card('a' * 32, 'Alpha', {'One': write_page('one')})]
+    write_backup(str(workspace / 'full.tzbackup'), cards)
+    cards[0]['project_data']['Two'] = write_page('two')
+    write_backup(str(workspace / 'incremental.tzbackup'), cards)
+    os.remove(workspace / 'full.tzbackup')
+    wipe_workspace(workspace)
+    with pytest.raises(FileNotFoundError):
+        restore_backup(str(workspace / 'incremental.tzbackup'))
+
+def test_archive_in_use_by_the_chain_is_not_overwritten(workspace):
+    cards = [card('a' * 32, 'Alpha', {'One': write_page('one')})]
+    write_backup(str(workspace / 'full.tzbackup'), cards)
+    write_backup(str(workspace / 'incremental.tzbackup'), cards)
+    with pytest.raises(ValueError):
+        write_backup(str(workspace / 'full.tzbackup'), cards)
+
+def test_single_project_restore(workspace):
+    alpha, beta = write_page('alpha page'), write_page('beta page')
+    cards = [card('a' * 32, 'Alpha', {'Page': alpha}), card('b' * 32, 'Beta', {'Page': beta})]
+    path = str(workspace / 'full.tzbackup')
+    write_backup(path, cards)
+    wipe_workspace(workspace)
+    assert restore_backup(path, ['b' * 32]) == [cards[1]]
+    assert read_page(beta).endswith('beta page')
+    assert not os.path.exists(page_store.path(alpha))
+
+def forge(path, project, extra=None):
+    """Rewrite an archive with a project entry (and files) the writer would never produce"""
+    forged = path + '.forged'
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(forged, 'w') as target:
+        for info in source.infolist():
+            if not info.filename.startswith('projects/') and info.filename not in (extra or {}):
+                target.writestr(info, source.read(info))
+        target.writestr(f"projects/{project['project_id']}.json", json.dumps(project))
+        for name, data in (extra or {}).items():
+            target.writestr(name, data)
+    os.replace(forged, path)
+
+@pytest.mark.parametrize('member', [
+    'pages/../../evil.tdoc',
+    '../evil.txt',
+    'pages/aa/../../../evil.tdoc',
+    '/tmp/evil.tdoc',
+    'projects/evil.json',
+])
+def test_forged_member_names_are_refused(workspace, member):
+    page_id = write_page('page')
+    path = str(workspace / 'full.tzbackup')
+    manifest, added = write_backup(path, [card('a' * 32, 'Alpha', {'Page': page_id})])
+    manifest['files'][member] = {'sha256': '0' * 64, 'size': 4, 'mtime_ns': 0, 'in': 'full.tzbackup'}
+    project = {'project_id': 'a' * 32, 'title': 'Alpha', 'description': '',
+               'project_data': {'Page': page_id}, 'pages': [member], 'assets': []}
+    forge(path, project, {member: b'evil', backup.MANIFEST: json.dumps(manifest)})
+    wipe_workspace(workspace)
+    with pytest.raises(ValueError):
+        restore_backup(path)
+    assert not list(workspace.rglob('evil*'))
+
+@pytest.mark.parametrize('project_data', [
+    {'Page': '/etc/passwd'},
+    {'Folder': {'Page': '../evil.tdoc'}},
+])
+def test_forged_project_trees_are_refused(workspace, project_data):
+    path = str(workspace / 'full.tzbackup')
+    write_backup(path, [card('a' * 32, 'Alpha', {'Page': write_page('page')})])
+    forge(path, {'project_id': 'a' * 32, 'title': 'Alpha', 'description': '',
+                 'project_data': project_data, 'pages': [], 'assets': []})
+    with pytest.raises(ValueError):
+        restore_backup(path)
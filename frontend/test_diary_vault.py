@@ -0,0 +1,67 @@
+# test_diary_vault.py
+import os
+import pytest
+
+pytest.importorskip('cryptography')
+
+import diary_vault
+from diary_vault import CHUNK_SIZE, ENTRY_MAGIC, RECORD_SIZE, DiaryVault
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    # A cheap scrypt so each test unlocks in milliseconds
+    monkeypatch.setattr(diary_vault, 'SCRYPT_N', 2 ** 10)
+    vault = DiaryVault(str(tmp_path))
+    vault.create('correct horse')
+    return vault
+
+def sample(size):
+    return bytes(i % 251 for i in range(size))
+
+def test_read_bytes_ranges(vault):
+    data = sample(3 * CHUNK_SIZE + 123)
+    vault.write_bytes('a' * 32, data)
+    ranges = [(0, None), (0, 1), (5, 10), (CHUNK_SIZE - 3, CHUNK_SIZE + 3),
+              (CHUNK_SIZE, 2 * CHUNK_SIZE), (2 * CHUNK_SIZE + 7, None),
+              (len(data) - 1, len(data)), (len(data), None), (10, len(data) + 50)]
+    for start, end in ranges:
+        assert vault.read_bytes('a' * 32, start, end) == data[start:end]
+
+def test_empty_entry(vault):
+    vault.write_bytes('b' * 32, b'')
+    assert vault.read_bytes('b' * 32) == b''
+
+def test_append_across_chunks(vault):
+    entry_id = 'c' * 32
+    data = sample(CHUNK_SIZE - 10)
+    vault.write_bytes(entry_id, data)
+    for size in (5, 40, 2 * CHUNK_SIZE):
+        more = sample(size)[::-1]
+        vault.append_bytes(entry_id, more)
+        data += more
+    assert vault.read_bytes(entry_id) == data
+    assert vault.read_bytes(entry_id, CHUNK_SIZE - 20, CHUNK_SIZE + 20) == data[CHUNK_SIZE - 20:CHUNK_SIZE + 20]
+
+def test_dropped_final_chunk_is_detected(vault):
+    entry_id = 'd' * 32
+    vault.write_bytes(entry_id, sample(2 * CHUNK_SIZE + 1))
+    path = vault.path(entry_id)
+    with open(path, 'r+b') as f:
+        f.truncate(len(ENTRY_MAGIC) + 2 * RECORD_SIZE)
+    with pytest.raises(ValueError):
+        vault.read_bytes(entry_id)
+
+def test_chunks_are_bound_to_their_entry(vault):
+    vault.write_bytes('e' * 32, b'secret')
+    os.makedirs(os.path.dirname(vault.path('f' * 32)), exist_ok=True)
+    os.replace(vault.path('e' * 32), vault.path('f' * 32))
+    with pytest.raises(ValueError):
+        vault.read_bytes('f' * 32)
+
+def test_wrong_password(vault):
+    vault.lock()
+    with pytest.raises(ValueError):
+        vault.unlock('wrong horse')
+    assert not vault.unlocked
+    vault.unlock('correct horse')
+    assert vault.unlocked
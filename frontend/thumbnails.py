@@ -0,0 +1,155 @@
+# thumbnails.py
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+import cv2
+import fitz
+from PIL import Image
+from workspace import workspace_dir
+
+THUMBNAIL_SIZE = (300, 300)
+PDF_THUMBNAIL_SIZE = (300, 400)
+VIDEO_THUMBNAIL_SIZE = (360, 240)
+# Encoded thumbnails kept in memory, shared by all editors
+THUMBNAIL_CACHE_BYTES = 32 * 1024 * 1024
+# Bump when rendering changes so stale files on disk are not reused
+THUMBNAIL_VERSION = 1
+
+def decode_image(path, max_size=THUMBNAIL_SIZE):
+    """Decode path no larger than needed for a max_size thumbnail"""
+    img = Image.open(path)
+    if img.format == 'JPEG':
+        # Let the JPEG decoder scale by 1/2, 1/4 or 1/8 instead of decoding full size
+        img.draft(img.mode, max_size)
+    else:
+        factor = min(img.width // max_size[0], img.height // max_size[1])
+        if factor >= 2:
+            if img.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+                img = img.convert('RGBA')
+            img = img.reduce(factor)
+    img.thumbnail(max_size)
+    return img
+
+# MuPDF is not safe to drive from several threads at once
+pdf_lock = threading.Lock()
+
+def render_pdf_page(path, max_size=PDF_THUMBNAIL_SIZE):
+    """First page of a PDF, rendered straight at thumbnail scale"""
+    with pdf_lock, fitz.open(path) as doc:
+        page = doc[0]
+        zoom = min(max_size[0] / page.rect.width, max_size[1] / page.rect.height)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+
+def render_video_frame(path, max_size=VIDEO_THUMBNAIL_SIZE):
+    """First frame of a video"""
+    cap = cv2.VideoCapture(path)
+    try:
+        ret, frame = cap.read()
+    finally:
+        cap.release()
+    if not ret:
+        raise ValueError(f"No frame could be read from {path}")
+    img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    img.thumbnail(max_size)
+    return img
+
+RENDERERS = {
+    'image': (decode_image, THUMBNAIL_SIZE),
+    'pdf': (render_pdf_page, PDF_THUMBNAIL_SIZE),
+    'video': (render_video_frame, VIDEO_THUMBNAIL_SIZE),
+}
+
+def thumbnail_key(kind, path):
+    """Identity of a rendered thumbnail: the source file as it is now plus how it was rendered"""
+    st = os.stat(path)
+    return kind, os.path.abspath(path), st.st_size, st.st_mtime_ns, RENDERERS[kind][1], THUMBNAIL_VERSION
+
+class ThumbnailCache:
+    """LRU of PNG-encoded thumbnails, bounded by total encoded size; shared by the media workers"""
+
+    def __init__(self, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self.lock:
+            if key in self.entries:
+                self.total -= len(self.entries.pop(key))
+            self.entries[key] = data
+            self.total += len(data)
+            while self.total > self.max_bytes and len(self.entries) > 1:
+                self.total -= len(self.entries.popitem(last=False)[1])
+
+class ThumbnailStore:
+    """PNG thumbnails on disk under the workspace, one file per key"""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+
+    def path_for(self, key):
+        if self.directory is None:
+            self.directory = workspace_dir('thumbnails')
+        digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + '.png')
+
+    def get(self, key):
+        try:
+            with open(self.path_for(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        # Temp file and rename so a crash never leaves a truncated PNG; a lost
+        # thumbnail is simply rendered again, so no fsync
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print("Could not store thumbnail:", e)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+memory_cache = ThumbnailCache()
+disk_cache = ThumbnailStore()
+
+def load_thumbnail(kind, path):
+    """Ready-to-display PIL thumbnail of path; rendered only when neither cache has it.
+    Creates no Tk objects, so it can run on a worker thread."""
+    key = thumbnail_key(kind, path)
+    data = memory_cache.get(key)
+    if data is None:
+        data = disk_cache.get(key)
+        if data is not None:
+            memory_cache.put(key, data)
+    if data is not None:
+        img = Image.open(BytesIO(data))
+        img.load()
+        return img
+    render, max_size = RENDERERS[kind]
+    img = render(path, max_size)
+    out = BytesIO()
+    img.save(out, format='PNG', compress_level=1)
+    data = out.getvalue()
+    memory_cache.put(key, data)
+    disk_cache.put(key, data)
+    return img
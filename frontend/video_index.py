@@ -0,0 +1,191 @@
+# video_index.py
+import bisect
+import hashlib
+import json
+import os
+import struct
+import cv2
+import numpy as np
+from autosave import atomic_write
+from workspace import workspace_dir
+
+# Bump when the index layout changes so older cache files are rebuilt
+INDEX_VERSION = 1
+# Hover previews: at most this many tiles of SPRITE_TILE_WIDTH pixels, SPRITE_COLUMNS per row
+SPRITE_TILES = 60
+SPRITE_TILE_WIDTH = 160
+SPRITE_COLUMNS = 10
+SPRITE_QUALITY = 80
+
+MP4_EXTENSIONS = ('.mp4', '.m4v', '.mov', '.3gp')
+# Boxes on the path moov/trak/mdia/minf/stbl that only hold other boxes
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+def iter_boxes(f, start, end):
+    """Yield (type, payload_start, box_end) for the ISO-BMFF boxes between two offsets"""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        size, kind = struct.unpack('>I4s', f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header:
+            return
+        yield kind, position + header, position + size
+        position += size
+
+def find_boxes(f, start, end, path):
+    """Payload ranges of every box reached by a path such as [b'moov', b'trak']"""
+    ranges = [(start, end)]
+    for kind in path:
+        ranges = [(s, e) for rs, re_ in ranges for k, s, e in iter_boxes(f, rs, re_) if k == kind]
+    return ranges
+
+def read_table(f, start, entry_format):
+    """Entries of a full box holding a counted table (stts, stss)"""
+    f.seek(start + 4)  # version and flags
+    count = struct.unpack('>I', f.read(4))[0]
+    size = struct.calcsize(entry_format)
+    data = f.read(count * size)
+    return [entry for entry in struct.iter_unpack(entry_format, data[:len(data) - len(data) % size])]
+
+def parse_mp4(path):
+    """(timescale, stts runs, 0-based keyframes or None if every frame is one) of the first video track"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        for trak_start, trak_end in find_boxes(f, 0, size, [b'moov', b'trak']):
+            mdia = find_boxes(f, trak_start, trak_end, [b'mdia'])
+            if not mdia:
+                continue
+            mdia_start, mdia_end = mdia[0]
+            hdlr = find_boxes(f, mdia_start, mdia_end, [b'hdlr'])
+            if not hdlr:
+                continue
+            f.seek(hdlr[0][0] + 8)  # version/flags and pre_defined
+            if f.read(4) != b'vide':
+                continue
+            mdhd = find_boxes(f, mdia_start, mdia_end, [b'mdhd'])
+            f.seek(mdhd[0][0])
+            version = f.read(1)[0]
+            f.seek(mdhd[0][0] + (20 if version == 1 else 12))
+            timescale = struct.unpack('>I', f.read(4))[0]
+            stbl = find_boxes(f, mdia_start, mdia_end, [b'minf', b'stbl'])
+            if not stbl:
+                continue
+            stts = find_boxes(f, *stbl[0], [b'stts'])
+            stss = find_boxes(f, *stbl[0], [b'stss'])
+            runs = read_table(f, stts[0][0], '>II') if stts else []
+            keyframes = [sample - 1 for (sample,) in read_table(f, stss[0][0], '>I')] if stss else None
+            return timescale, runs, keyframes
+    return None
+
+def cache_paths(path):
+    """Index and sprite sheet files for the current version of a video"""
+    st = os.stat(path)
+    key = repr((os.path.abspath(path), st.st_size, st.st_mtime_ns, INDEX_VERSION))
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+    directory = workspace_dir('video_index')
+    return os.path.join(directory, digest + '.json'), os.path.join(directory, digest + '.jpg')
+
+def build_index(path, sprite_path):
+    """Read keyframes and timing, then sample the sprite sheet of hover previews"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 360
+        keyframes = None
+        source = 'none'
+        mp4 = None
+        if path.lower().endswith(MP4_EXTENSIONS):
+            try:
+                mp4 = parse_mp4(path)
+            except (OSError, struct.error, IndexError) as e:
+                print(f"Could not read MP4 tables of {path}:", e)
+        if mp4:
+            timescale, runs, keyframes = mp4
+            samples = sum(count for count, delta in runs)
+            duration = sum(count * delta for count, delta in runs) / max(timescale, 1)
+            if samples and duration > 0:
+                frame_count, fps = samples, samples / duration
+            keyframes = keyframes if keyframes is not None else list(range(frame_count))
+            source = 'stss'
+        index = {
+            'version': INDEX_VERSION,
+            'fps': fps,
+            'frame_count': frame_count,
+            'duration': frame_count / fps if fps else 0,
+            'size': [width, height],
+            # Only MP4-family files have their sync-sample table read; for other containers
+            # (AVI, MKV, WebM) this stays None, seeks go straight to the frame and OpenCV
+            # finds the keyframe, and the scrubber seeks on release instead of while dragging
+            'keyframes': keyframes,
+            'keyframe_source': source,
+            'sprite': build_sprite(cap, sprite_path, frame_count, fps, width, height, keyframes),
+        }
+    finally:
+        cap.release()
+    return index
+
+def build_sprite(cap, sprite_path, frame_count, fps, width, height, keyframes):
+    """Tile evenly spaced frames into one JPEG; keyframes are preferred as they decode on their own"""
+    if frame_count <= 0:
+        return None
+    tiles = min(SPRITE_TILES, frame_count)
+    tile_width = SPRITE_TILE_WIDTH
+    tile_height = max(2, round(SPRITE_TILE_WIDTH * height / width))
+    rows = (tiles + SPRITE_COLUMNS - 1) // SPRITE_COLUMNS
+    sheet = np.zeros((rows * tile_height, SPRITE_COLUMNS * tile_width, 3), np.uint8)
+    times = []
+    for i in range(tiles):
+        frame_index = int((i + 0.5) * frame_count / tiles)
+        if keyframes:
+            frame_index = keyframe_before(keyframes, frame_index)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        ok, frame = cap.read()
+        if not ok:
+            break
+        row, column = divmod(i, SPRITE_COLUMNS)
+        sheet[row * tile_height:(row + 1) * tile_height, column * tile_width:(column + 1) * tile_width] = \
+            cv2.resize(frame, (tile_width, tile_height), interpolation=cv2.INTER_AREA)
+        times.append(frame_index / fps)
+    if not times:
+        return None
+    ok, encoded = cv2.imencode('.jpg', sheet, [cv2.IMWRITE_JPEG_QUALITY, SPRITE_QUALITY])
+    if not ok:
+        return None
+    atomic_write(sprite_path, encoded.tobytes())
+    return {'file': os.path.basename(sprite_path), 'columns': SPRITE_COLUMNS,
+            'tile': [tile_width, tile_height], 'times': times}
+
+def load_index(path):
+    """Cached index of a video, built on first use; runs on a worker thread"""
+    index_path, sprite_path = cache_paths(path)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') == INDEX_VERSION:
+            return resolve_sprite(index, index_path)
+    except (OSError, ValueError):
+        pass
+    index = build_index(path, sprite_path)
+    # Written after the sprite, so an index on disk always has its sheet
+    atomic_write(index_path, json.dumps(index))
+    return resolve_sprite(index, index_path)
+
+def resolve_sprite(index, index_path):
+    if index.get('sprite'):
+        index['sprite']['path'] = os.path.join(os.path.dirname(index_path), index['sprite']['file'])
+    return index
+
+def keyframe_before(keyframes, frame):
+    """Last keyframe at or before frame"""
+    i = bisect.bisect_right(keyframes, frame) - 1
+    return keyframes[max(i, 0)]
@@ -0,0 +1,403 @@
+# video_player.py
+import queue
+import threading
+import time
+import tkinter as tk
+import cv2
+from PIL import Image, ImageTk
+from video_index import keyframe_before, load_index
+from workers import WorkerPool
+
+# Decoded frames buffered ahead of the display clock
+FRAME_QUEUE_SIZE = 8
+# Used when the container does not report a usable frame rate
+FALLBACK_FPS = 30.0
+# Frames later than this many frame intervals are skipped by the decoder
+LATE_FRAMES = 2
+END_OF_STREAM = object()
+SCRUBBER_HEIGHT = 14
+
+def fit_size(width, height, box_width, box_height):
+    """Largest size with the video's aspect ratio that fits the box"""
+    scale = min(box_width / width, box_height / height)
+    return max(2, int(width * scale)), max(2, int(height * scale))
+
+def format_time(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+class VideoEngine:
+    """Decodes a video on its own thread into a bounded queue of display-ready RGB frames.
+
+    Frames are timed against a clock driven by CAP_PROP_FPS; when the decoder
+    falls behind that clock it grabs frames without converting them. Queue
+    items are (generation, frame index, RGB array); a seek starts a new
+    generation so frames decoded before it are ignored.
+    """
+
+    def __init__(self, path, queue_size=FRAME_QUEUE_SIZE):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Could not open video {path}")
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if 0 < fps < 1000 else FALLBACK_FPS
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 360
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.keyframes = None   # from the video index once it is ready
+        self.frames = queue.Queue(maxsize=queue_size)
+        # Written by the UI thread on resize, read by the decoder; a tuple swap is atomic
+        self.target_size = (self.width, self.height)
+        self.started_at = None
+        self.paused_at = None   # media time the clock is frozen at
+        self.hold = None        # (generation, media time) shown while the decoder seeks
+        self.generation = 0
+        self.seek_request = None
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.decoded = 0
+        self.skipped = 0
+        self.thread = threading.Thread(target=self.decode_loop, name='video-decode', daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.thread.start()
+
+    def clock(self):
+        """Media time in seconds that should be on screen now"""
+        if self.paused_at is not None:
+            return self.paused_at
+        hold = self.hold
+        if hold is not None:
+            return hold[1]
+        if self.started_at is None:
+            return 0.0
+        return time.perf_counter() - self.started_at
+
+    def frame_time(self, index):
+        return index / self.fps
+
+    @property
+    def duration(self):
+        return self.frame_count / self.fps
+
+    @property
+    def paused(self):
+        return self.paused_at is not None
+
+    def pause(self):
+        if self.paused_at is None:
+            self.paused_at = self.clock()
+
+    def resume(self):
+        if self.paused_at is not None:
+            self.started_at = time.perf_counter() - self.paused_at
+            self.paused_at = None
+
+    def seek(self, frame, accurate=True):
+        """Jump to frame; approximate seeks land on the keyframe before it and need no extra decoding"""
+        if self.frame_count:
+            frame = min(frame, self.frame_count - 1)
+        frame = max(0, frame)
+        if not accurate and self.keyframes:
+            frame = keyframe_before(self.keyframes, frame)
+        with self.lock:
+            self.generation += 1
+            self.seek_request = (self.generation, frame, accurate)
+            if self.paused_at is not None:
+                self.paused_at = self.frame_time(frame)
+            else:
+                self.hold = (self.generation, self.frame_time(frame))
+        self.drain()
+        self.wake.set()
+        return frame
+
+    def take_seek(self):
+        with self.lock:
+            request, self.seek_request = self.seek_request, None
+            return request
+
+    def position(self, generation, frame, accurate):
+        """Move the capture to frame, decoding forward from the nearest keyframe when accurate"""
+        start = keyframe_before(self.keyframes, frame) if self.keyframes else frame
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        if accurate:
+            for _ in range(frame - start):
+                if self.seek_request is not None or not self.cap.grab():
+                    break
+        with self.lock:
+            if self.hold is not None and self.hold[0] == generation:
+                # Restart the clock at the frame the decoder actually reached
+                self.started_at = time.perf_counter() - self.frame_time(frame)
+                self.hold = None
+
+    def put(self, item):
+        while not self.stopped.is_set() and self.seek_request is None:
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decode_loop(self):
+        index = 0
+        generation = 0
+        at_end = False
+        try:
+            while not self.stopped.is_set():
+                request = self.take_seek()
+                if request is not None:
+                    generation, index, accurate = request
+                    self.position(generation, index, accurate)
+                    at_end = False
+                    continue
+                if at_end:
+                    # Wait for a seek back into the video
+                    self.wake.wait(0.1)
+                    self.wake.clear()
+                    continue
+                if not self.cap.grab():
+                    at_end = True
+                    self.put((generation, index, END_OF_STREAM))
+                    continue
+                if self.clock() - self.frame_time(index) > LATE_FRAMES / self.fps:
+                    self.skipped += 1
+                    index += 1
+                    continue
+                ok, frame = self.cap.retrieve()
+                if not ok:
+                    at_end = True
+                    self.put((generation, index, END_OF_STREAM))
+                    continue
+                width, height = self.target_size
+                if (width, height) != (frame.shape[1], frame.shape[0]):
+                    shrinking = width < frame.shape[1]
+                    frame = cv2.resize(frame, (width, height),
+                                       interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR)
+                # Convert after resizing, on fewer pixels
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                self.decoded += 1
+                self.put((generation, index, frame))
+                index += 1
+        finally:
+            self.cap.release()
+
+    def drain(self):
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                break
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+        # Unblock a decoder waiting on a full queue
+        self.drain()
+
+class VideoPlayer:
+    """Player window showing frames from a VideoEngine on time, dropping the ones it is too late for.
+
+    Below the picture sit a play/pause button and a scrubber. Dragging seeks
+    to keyframes instantly, releasing decodes forward to the exact frame, and
+    hovering shows a preview from the video index's sprite sheet.
+    """
+
+    def __init__(self, parent, path, size=(1280, 720)):
+        self.engine = VideoEngine(path)
+        self.win = tk.Toplevel(parent)
+        self.win.title("Video Player")
+        self.win.geometry(f"{size[0]}x{size[1]}")
+        self.win.configure(bg='black')
+
+        controls = tk.Frame(self.win, bg='#222222')
+        controls.pack(side='bottom', fill='x')
+        self.controls = controls
+        self.play_btn = tk.Button(controls, text="⏸", width=3, bg='#222222', fg='#00bfff', relief='flat',
+                                  font=('Segoe UI', 11, 'bold'), cursor='hand2', command=self.toggle_pause)
+        self.play_btn.pack(side='left', padx=4, pady=2)
+        self.time_label = tk.Label(controls, text="0:00 / " + format_time(self.engine.duration),
+                                   bg='#222222', fg='#cccccc', font=('Segoe UI', 9))
+        self.time_label.pack(side='right', padx=6)
+        self.scrubber = tk.Canvas(controls, height=SCRUBBER_HEIGHT, bg='#333333', highlightthickness=0, cursor='hand2')
+        self.scrubber.pack(side='left', fill='x', expand=True, padx=4)
+        self.progress = self.scrubber.create_rectangle(0, 0, 0, SCRUBBER_HEIGHT, fill='#00bfff', width=0)
+        self.preview = tk.Label(self.win, bg='#222222', bd=1, relief='solid')
+        self.preview_tiles = {}   # tile number -> PhotoImage
+        self.sprite = None
+        self.sprite_image = None
+        self.dragged = None   # frame under the pointer while dragging without a keyframe index
+
+        self.label = tk.Label(self.win, bg='black')
+        self.label.pack(fill='both', expand=True)
+        self.photo = None     # reused while the frame size stays the same
+        self.next_frame = None
+        self.shown = 0
+        self.dropped = 0
+        self.finished = False
+        self.pending = None
+        self.label.bind('<Configure>', self.on_resize)
+        self.scrubber.bind('<Button-1>', self.on_scrub)
+        self.scrubber.bind('<B1-Motion>', self.on_scrub)
+        self.scrubber.bind('<ButtonRelease-1>', self.on_scrub_release)
+        self.scrubber.bind('<Motion>', self.on_hover)
+        self.scrubber.bind('<Leave>', lambda e: self.preview.place_forget())
+        self.win.bind('<space>', lambda e: self.toggle_pause())
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Keyframes and previews arrive from the cached index, built in the background on first play
+        self.indexer = WorkerPool(self.win, threads=1, name='video-index')
+        self.indexer.submit(load_index, path, callback=self.on_index,
+                            errback=lambda e: print("Could not index video:", e))
+
+        self.engine.target_size = fit_size(self.engine.width, self.engine.height, *size)
+        self.engine.start()
+        self.pending = self.win.after(1, self.tick)
+
+    def on_index(self, index):
+        if index.get('keyframes'):
+            self.engine.keyframes = index['keyframes']
+        if index.get('frame_count'):
+            self.engine.frame_count = index['frame_count']
+        self.sprite = index.get('sprite')
+
+    def on_resize(self, event):
+        if event.width > 1 and event.height > 1:
+            self.engine.target_size = fit_size(self.engine.width, self.engine.height, event.width, event.height)
+
+    def tick(self):
+        """Show the newest frame that is due, counting any older due frames as dropped"""
+        self.pending = None
+        now = self.engine.clock()
+        generation = self.engine.generation
+        due = None
+        while True:
+            if self.next_frame is None:
+                try:
+                    self.next_frame = self.engine.frames.get_nowait()
+                except queue.Empty:
+                    break
+            if self.next_frame[0] != generation:
+                self.next_frame = None  # decoded before the last seek
+                continue
+            if self.next_frame[2] is END_OF_STREAM:
+                self.finished = True
+                break
+            if self.engine.frame_time(self.next_frame[1]) > now:
+                break
+            if due is not None:
+                self.dropped += 1
+            due, self.next_frame = self.next_frame, None
+        if due is not None:
+            self.show(due[2])
+        if self.dragged is None:
+            self.update_scrubber(now)
+        if self.finished:
+            self.play_btn.config(text="▶")
+            return
+        if self.next_frame is not None and not self.engine.paused:
+            delay = self.engine.frame_time(self.next_frame[1]) - self.engine.clock()
+        else:
+            delay = 0.5 / self.engine.fps
+        self.pending = self.win.after(max(1, int(delay * 1000)), self.tick)
+
+    def schedule_tick(self):
+        if self.pending is None:
+            self.pending = self.win.after(1, self.tick)
+
+    def show(self, frame):
+        img = Image.fromarray(frame)
+        if self.photo is None or (self.photo.width(), self.photo.height()) != img.size:
+            self.photo = ImageTk.PhotoImage(img, master=self.win)
+            self.label.config(image=self.photo)
+        else:
+            self.photo.paste(img)
+        self.shown += 1
+
+    def update_scrubber(self, now):
+        duration = self.engine.duration
+        if duration <= 0:
+            return
+        width = self.scrubber.winfo_width()
+        self.scrubber.coords(self.progress, 0, 0, width * min(now / duration, 1.0), SCRUBBER_HEIGHT)
+        self.time_label.config(text=f"{format_time(now)} / {format_time(duration)}")
+
+    def scrub_frame(self, x):
+        fraction = min(max(x / max(self.scrubber.winfo_width(), 1), 0.0), 1.0)
+        return int(fraction * self.engine.frame_count)
+
+    def seek(self, frame, accurate):
+        self.engine.seek(frame, accurate)
+        self.next_frame = None
+        self.finished = False
+        if not self.engine.paused:
+            self.play_btn.config(text="⏸")
+        self.schedule_tick()
+
+    def on_scrub(self, event):
+        if self.engine.frame_count:
+            frame = self.scrub_frame(event.x)
+            if self.engine.keyframes:
+                self.seek(frame, accurate=False)
+            else:
+                # No keyframe index (not an MP4): every seek decodes up to the frame, so only
+                # the bar follows the pointer and the seek happens on release
+                self.dragged = frame
+                self.update_scrubber(self.engine.frame_time(frame))
+        self.on_hover(event)
+
+    def on_scrub_release(self, event):
+        self.dragged = None
+        if self.engine.frame_count:
+            self.seek(self.scrub_frame(event.x), accurate=True)
+
+    def toggle_pause(self):
+        if self.finished:
+            self.seek(0, accurate=True)
+            self.engine.resume()
+        elif self.engine.paused:
+            self.engine.resume()
+        else:
+            self.engine.pause()
+        self.play_btn.config(text="▶" if self.engine.paused else "⏸")
+
+    def on_hover(self, event):
+        """Preview the frame under the pointer from the sprite sheet"""
+        sprite = self.sprite
+        if not sprite or not self.engine.frame_count:
+            return
+        when = self.engine.frame_time(self.scrub_frame(event.x))
+        times = sprite['times']
+        tile = min(range(len(times)), key=lambda i: abs(times[i] - when))
+        photo = self.preview_tiles.get(tile)
+        if photo is None:
+            try:
+                if self.sprite_image is None:
+                    self.sprite_image = Image.open(sprite['path'])
+                    self.sprite_image.load()
+            except OSError:
+                self.sprite = None
+                return
+            width, height = sprite['tile']
+            row, column = divmod(tile, sprite['columns'])
+            box = (column * width, row * height, (column + 1) * width, (row + 1) * height)
+            photo = ImageTk.PhotoImage(self.sprite_image.crop(box), master=self.win)
+            self.preview_tiles[tile] = photo
+        self.preview.config(image=photo)
+        x = self.scrubber.winfo_x() + event.x
+        self.preview.place(x=x, y=self.controls.winfo_y() - 4, anchor='s')
+        self.preview.lift()
+
+    @property
+    def total_dropped(self):
+        return self.dropped + self.engine.skipped
+
+    def close(self):
+        if self.pending is not None:
+            self.win.after_cancel(self.pending)
+            self.pending = None
+        self.engine.stop()
+        self.indexer.shutdown(wait=False)
+        self.win.destroy()
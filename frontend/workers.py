@@ -0,0 +1,119 @@
+# workers.py
+import queue
+import threading
+
+# How often the Tk main loop checks for finished jobs while any are pending
+POLL_INTERVAL_MS = 30
+
+class Job:
+    """A unit of background work; callbacks run on the Tk main loop"""
+
+    def __init__(self, func, args, callback=None, errback=None, owner=None):
+        self.func = func
+        self.args = args
+        self.callback = callback
+        self.errback = errback
+        self.owner = owner
+        self.cancelled = False
+
+    def cancel(self):
+        """Skip the job if it has not started and drop its result otherwise"""
+        self.cancelled = True
+
+class WorkerPool:
+    """Runs jobs on daemon threads and hands results back to Tk through a queue"""
+
+    def __init__(self, widget, threads=1, name='worker'):
+        self.widget = widget
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = 0  # only touched on the main thread
+        self.live = set()  # submitted jobs whose results have not been handed back yet
+        self.polling = False
+        self.closed = False
+        self.threads = []
+        for i in range(threads):
+            thread = threading.Thread(target=self.work, name=f"{name}-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, func, *args, callback=None, errback=None, owner=None):
+        """Queue func(*args); must be called from the main thread"""
+        job = Job(func, args, callback, errback, owner)
+        if self.closed:
+            job.cancel()
+            return job
+        self.pending += 1
+        self.live.add(job)
+        self.jobs.put(job)
+        self.schedule_poll()
+        return job
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                if job.cancelled:
+                    self.results.put((job, None, None))
+                    continue
+                try:
+                    self.results.put((job, job.func(*job.args), None))
+                except Exception as e:
+                    self.results.put((job, None, e))
+            finally:
+                self.jobs.task_done()
+
+    def schedule_poll(self):
+        if self.polling:
+            return
+        try:
+            self.widget.after(POLL_INTERVAL_MS, self.poll)
+            self.polling = True
+        except Exception:
+            pass  # widget already destroyed, results are dropped
+
+    def poll(self):
+        self.polling = False
+        while True:
+            try:
+                job, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            self.live.discard(job)
+            if job.cancelled:
+                continue
+            if error is not None:
+                if job.errback:
+                    job.errback(error)
+                else:
+                    print(f"Background job {getattr(job.func, '__name__', job.func)} failed:", error)
+            elif job.callback:
+                job.callback(result)
+        if self.pending > 0:
+            self.schedule_poll()
+
+    def cancel(self, owner=None):
+        """Cancel every outstanding job, or only those submitted with the given owner"""
+        for job in self.live:
+            if owner is None or job.owner is owner:
+                job.cancel()
+
+    def wait(self):
+        """Block until every queued job has run"""
+        self.jobs.join()
+
+    def shutdown(self, wait=True, cancel=True):
+        """Stop the threads once the queue drains; by default outstanding jobs are cancelled first"""
+        if self.closed:
+            return
+        self.closed = True
+        if cancel:
+            self.cancel()
+        for _ in self.threads:
+            self.jobs.put(None)
+        if wait:
+            for thread in self.threads:
+                thread.join()
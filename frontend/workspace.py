@@ -0,0 +1,13 @@
+# workspace.py
+import os
+
+# Per-user folder for caches and indexes; TARIZZ_HOME overrides the default
+WORKSPACE_ENV = 'TARIZZ_HOME'
+DEFAULT_WORKSPACE = os.path.join('~', '.tarizz')
+
+def workspace_dir(*parts):
+    """Path of a folder inside the workspace, created on first use"""
+    root = os.environ.get(WORKSPACE_ENV) or os.path.expanduser(DEFAULT_WORKSPACE)
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path